@@ -1,38 +1,68 @@
 import os
 import logging
 import datetime
-import time
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+import uuid
+import click
+from contextlib import contextmanager
+from flask import (
+    Flask, Response, render_template, request, redirect, url_for, flash, jsonify,
+    send_file, abort, stream_with_context, make_response, session
+)
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from models import db, User, Lead, LeadState
-from email_service import send_prospect_confirmation_email, send_attorney_notification_email
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, User, Lead, LeadResume, LeadState
+from migrations import upgrade_schema
+from engine_factory import engine_options, pool_status
+from resume_storage import (
+    store_stream, resolve_path, collect_garbage, storage_report,
+    migrate_legacy_files, resume_etag, resume_media_type, resume_download_name,
+    UploadTooLarge, MAX_UPLOAD_SIZE, MAX_REQUEST_SIZE, RESUME_CACHE_MAX_AGE
+)
+from http_cache import weak_etag, http_date, is_not_modified, REVALIDATE
+import lead_changes  # registers the hook that stamps the lead change feed
+from lead_bulk import bulk_update_leads, BulkSelectionTooBroad, MAX_BULK_IDS
+from lead_leases import claim_next_lead, lease_holder, end_lease
+from lead_cache import invalidate_leads
+from lead_events import publish_lead_event, LEAD_UPDATED
+from lead_intake import add_submission
+from lead_merge import merge_duplicates, merge_window, resume_versions, LEAD_MERGE_WINDOW_DAYS
+from lead_export import iter_export, export_filename, EXPORT_FORMATS
+from lead_queries import filter_leads, parse_state, parse_datetime, projection_options
+from lead_search import search_leads
+from pagination import keyset_page, InvalidCursor, DASHBOARD_PAGE_SIZE
+from lead_counters import CounterReconciler, get_counts, record_transition, reconcile
+from resume_text import ResumeTextExtractor, backfill_extraction
+from outbox import OutboxWorkerPool, OUTBOX_WORKERS, purge_sent
+from lead_events import PostgresEventListener
+from login_throttle import login_retry_after, TRUSTED_PROXY_HOPS
+from user_cache import Principal, user_cache, session_key, USER_EVENTS_CHANNEL
+from idempotency import (
+    claim_key, release_key, commit_submission, request_fingerprint, submission_id_for, purge_expired_keys,
+    IdempotencyConflict, IdempotencyInProgress, SUBMIT_FORM_SCOPE, MAX_IDEMPOTENCY_KEY_LENGTH
+)
+from submission_journal import JournalReplayer, submission_journal, replay, DATABASE_UNAVAILABLE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Create upload directory if it doesn't exist
-upload_dir = os.path.join(os.getcwd(), "uploads")
-if not os.path.exists(upload_dir):
-    os.makedirs(upload_dir)
-
 # Create app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
+# Reject request bodies far beyond the resume cap before they are read
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_SIZE
+
+# Take the client address from X-Forwarded-For as set by the trusted proxies only,
+# so login throttling counts real clients rather than the proxy or forged headers
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
 # Configure database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,  # Detect stale connections
-    "pool_recycle": 300,    # Recycle connections every 5 minutes
-    "connect_args": {
-        "connect_timeout": 10,  # Connection timeout in seconds
-        "keepalives": 1,        # Enable keepalives
-        "keepalives_idle": 30   # Seconds between keepalives
-    }
-}
+# Same pool sizing, LIFO reuse and timeouts as the API's engines (see config.Settings)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
 
 # Initialize extensions
 db.init_app(app)
@@ -42,11 +72,24 @@ login_manager.login_view = "login"
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Served from the user cache; changes to the user evict it
+    key = session_key(user_id)
+    principal = user_cache.get(key)
+    if principal is None:
+        generation = user_cache.generation
+        user = User.query.get(int(user_id))
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        user_cache.put(key, principal, generation=generation)
+    # A deactivated user's session is anonymous from their next request on
+    if not principal.is_active:
+        return None
+    return principal
 
-# Create database tables
+# Create database tables, and add what newer models need to existing ones
 with app.app_context():
-    db.create_all()
+    upgrade_schema(db.engine)
     
     # Create a default admin user if none exists
     if not User.query.filter_by(email="admin@example.com").first():
@@ -59,103 +102,140 @@ with app.app_context():
         db.session.add(admin_user)
         db.session.commit()
 
+@contextmanager
+def _app_session():
+    """Session for background workers running outside of a request."""
+    with app.app_context():
+        yield db.session
+
+# Evict users changed by other processes from the user cache
+with app.app_context():
+    user_change_listener = PostgresEventListener(db.engine, user_cache.handle_notification, USER_EVENTS_CHANNEL)
+
+# Deliver queued emails in the background
+outbox_pool = OutboxWorkerPool(_app_session)
+
+# Keep the dashboard counters honest
+counter_reconciler = CounterReconciler(_app_session)
+
+# Extract resume text for search in a separate process pool
+resume_text_extractor = ResumeTextExtractor(_app_session)
+
+# Replay submissions journaled while the database was unavailable
+journal_replayer = JournalReplayer(_app_session)
+
+def start_background_workers():
+    """
+    Start the listeners and workers a serving process runs.
+
+    Called by the server entrypoint (main.py) rather than on import, so
+    ``flask`` CLI commands and scripts importing the app start none of them.
+    """
+    user_change_listener.start()
+    if OUTBOX_WORKERS > 0:
+        outbox_pool.start()
+    counter_reconciler.start()
+    resume_text_extractor.start()
+    journal_replayer.start()
+
+# Lead columns the dashboard table shows; notes and the rest stay unloaded
+DASHBOARD_FIELDS = ("first_name", "last_name", "email", "state")
+
+# Shown for a new submission and for a repeat of one already made
+SUBMITTED_MESSAGE = "Thank you! Your information has been submitted successfully. Check your email for confirmation."
+
 # Routes
 @app.route("/")
 def index():
     """Render the lead submission form."""
-    return render_template("lead_form.html")
+    # A fresh key per rendered form; submitting the same form twice replays the first result
+    return render_template("lead_form.html", idempotency_key=uuid.uuid4().hex)
 
 @app.route("/submit_lead", methods=["POST"])
 def submit_lead():
     """Process lead submission."""
-    saved_file = None
+    reserved_key = None
     try:
         first_name = request.form.get("first_name")
         last_name = request.form.get("last_name")
         email = request.form.get("email")
         resume = request.files.get("resume")
+        idempotency_key = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key")
         
         # Validate input
         if not (first_name and last_name and email and resume):
             flash("All fields are required", "danger")
             return redirect(url_for("index"))
+        if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            flash("Invalid form submission. Please reload the page and try again.", "danger")
+            return redirect(url_for("index"))
         
-        # Save the resume file
-        filename = secure_filename(f"{first_name}_{last_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}{os.path.splitext(resume.filename)[1]}")
-        file_path = os.path.join(upload_dir, filename)
-        resume.save(file_path)
-        saved_file = file_path
-        
-        # Create a new lead
-        new_lead = Lead(
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            resume_path=filename,
-            state=LeadState.PENDING
-        )
-        
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
+        # A repeat of a submitted form (double click, browser retry) gets the
+        # original answer without storing the resume or sending emails again
+        if idempotency_key:
+            fingerprint = request_fingerprint(first_name, last_name, email.lower(), resume.filename)
             try:
-                db.session.add(new_lead)
-                db.session.commit()
-                
-                # Send email to prospect
-                prospect_email_sent = send_prospect_confirmation_email(
-                    email,
-                    first_name,
-                    last_name
-                )
-                
-                if prospect_email_sent:
-                    app.logger.info(f"Confirmation email sent to {email}")
-                else:
-                    app.logger.warning(f"Failed to send confirmation email to {email}")
-                
-                # Send notification email to attorney
-                attorney_email_sent = send_attorney_notification_email(
-                    first_name,
-                    last_name,
-                    email,
-                    file_path
-                )
-                
-                if attorney_email_sent:
-                    app.logger.info("Notification email sent to attorney")
-                else:
-                    app.logger.warning("Failed to send notification email to attorney")
-                
-                app.logger.info(f"Lead created successfully for {email}")
-                flash("Thank you! Your information has been submitted successfully. Check your email for confirmation.", "success")
+                if claim_key(db.session, SUBMIT_FORM_SCOPE, idempotency_key, fingerprint) is not None:
+                    flash(SUBMITTED_MESSAGE, "success")
+                    return redirect(url_for("index"))
+                reserved_key = idempotency_key
+            except IdempotencyInProgress:
+                flash("Your application is already being processed.", "info")
+                return redirect(url_for("index"))
+            except IdempotencyConflict:
+                flash("This form was already used for another application. Please reload the page and try again.", "danger")
                 return redirect(url_for("index"))
-            
-            except Exception as db_error:
-                retry_count += 1
+            except DATABASE_UNAVAILABLE:
+                # Journaled below under the key's submission id, which replays exactly once
                 db.session.rollback()
-                app.logger.error(f"Database error on attempt {retry_count}: {str(db_error)}")
-                
-                if retry_count >= max_retries:
-                    raise db_error
-                
-                # Wait a moment before retrying
-                time.sleep(1)
+        
+        # Store the resume under its content hash, reusing an identical earlier upload
+        try:
+            stored = store_stream(resume.stream, os.path.splitext(resume.filename)[1], MAX_UPLOAD_SIZE)
+        except UploadTooLarge as e:
+            if reserved_key:
+                release_key(db.session, SUBMIT_FORM_SCOPE, reserved_key)
+            flash(str(e), "danger")
+            return redirect(url_for("index"))
+        
+        submission_id = submission_id_for(SUBMIT_FORM_SCOPE, idempotency_key)
+        try:
+            # A repeat applicant's resume becomes a new version of their recent lead
+            lead = commit_submission(
+                db.session, submission_id,
+                lambda session: add_submission(session, first_name, last_name, email, stored, submission_id=submission_id),
+                SUBMIT_FORM_SCOPE, reserved_key
+            )
+            app.logger.info(f"Submission from {email} recorded on lead {lead.id}")
+        except DATABASE_UNAVAILABLE as db_error:
+            # Accept the submission anyway: it is journaled on local disk and
+            # the journal replayer creates the lead once the database is back.
+            # A held key stays locked for a while; a later repeat maps onto the same lead.
+            app.logger.error(f"Database unavailable, journaling submission {submission_id}: {str(db_error)}")
+            submission_journal.append(submission_id, first_name, last_name, email, stored)
+            db.session.rollback()
+            reserved_key = None
+        
+        flash(SUBMITTED_MESSAGE, "success")
+        return redirect(url_for("index"))
     
     except Exception as e:
         app.logger.error(f"Error in submit_lead: {str(e)}")
-        # Clean up saved file if database operation failed
-        if saved_file and os.path.exists(saved_file):
-            try:
-                os.remove(saved_file)
-                app.logger.info(f"Removed uploaded file after error: {saved_file}")
-            except Exception as file_error:
-                app.logger.error(f"Failed to remove file: {str(file_error)}")
+        db.session.rollback()
+        if reserved_key:
+            release_key(db.session, SUBMIT_FORM_SCOPE, reserved_key)
+        # The stored resume may be shared with other leads, so it is not removed
+        # here; the resume garbage collector deletes it if nothing references it.
         
         flash(f"We're sorry, but your application couldn't be processed at this time. Please try again later.", "danger")
         return redirect(url_for("index"))
 
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    """Handle uploads rejected by MAX_CONTENT_LENGTH."""
+    flash(f"Your resume exceeds the maximum upload size of {MAX_UPLOAD_SIZE // (1024 * 1024)} MB", "danger")
+    return redirect(url_for("index"))
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     """Handle user login."""
@@ -163,6 +243,12 @@ def login():
         email = request.form.get("email")
         password = request.form.get("password")
         
+        # Throttle bursts per address and account before hashing anything
+        retry_after = login_retry_after(email, request.remote_addr)
+        if retry_after:
+            flash(f"Too many login attempts. Try again in {retry_after} seconds.", "danger")
+            return render_template("login.html"), 429
+        
         user = User.query.filter_by(email=email).first()
         
         if user and check_password_hash(user.password, password):
@@ -186,15 +272,145 @@ def logout():
 @login_required
 def dashboard():
     """Render the lead management dashboard."""
-    leads = Lead.query.order_by(Lead.created_at.desc()).all()
-    return render_template("dashboard.html", leads=leads, LeadState=LeadState)
+    filters = {
+        key: request.args.get(key)
+        for key in ("q", "resumes", "state", "created_after", "created_before")
+        if request.args.get(key)
+    }
+    try:
+        state = parse_state(filters.get("state"))
+        created_after = parse_datetime(filters.get("created_after"))
+        created_before = parse_datetime(filters.get("created_before"))
+        query = filter_leads(
+            Lead.query.options(*projection_options(DASHBOARD_FIELDS)),
+            state=state,
+            created_after=created_after,
+            created_before=created_before
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard"))
+    
+    next_url = None
+    if filters.get("q"):
+        # Ranked full-text search, paged by offset
+        offset = request.args.get("offset", 0, type=int)
+        leads, next_offset = search_leads(
+            db.session, filters["q"], state, DASHBOARD_PAGE_SIZE, offset,
+            resumes=bool(filters.get("resumes")),
+            options=projection_options(DASHBOARD_FIELDS),
+            created_after=created_after,
+            created_before=created_before
+        )
+        paged = offset > 0
+        if next_offset is not None:
+            next_url = url_for("dashboard", offset=next_offset, **filters)
+    else:
+        cursor = request.args.get("cursor")
+        try:
+            leads, next_cursor = keyset_page(query, cursor, DASHBOARD_PAGE_SIZE)
+        except InvalidCursor:
+            return redirect(url_for("dashboard", **filters))
+        paged = bool(cursor)
+        if next_cursor:
+            next_url = url_for("dashboard", cursor=next_cursor, **filters)
+    
+    counts = get_counts(db.session)
+    return render_template(
+        "dashboard.html",
+        leads=leads,
+        counts=counts,
+        total=sum(counts.values()),
+        filters=filters,
+        first_url=url_for("dashboard", **filters) if paged else None,
+        next_url=next_url,
+        LeadState=LeadState
+    )
+
+@app.route("/leads/export")
+@login_required
+def export_leads():
+    """Stream the leads matching the dashboard filters as CSV or NDJSON."""
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    try:
+        state = parse_state(request.args.get("state"))
+        created_after = parse_datetime(request.args.get("created_after"))
+        created_before = parse_datetime(request.args.get("created_before"))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard"))
+    
+    # stream_with_context keeps the request, and so db.session, alive while streaming
+    rows = iter_export(db.session, fmt, state, created_after, created_before)
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(fmt)}"'}
+    )
 
 @app.route("/lead/<int:lead_id>")
 @login_required
 def view_lead(lead_id):
     """View a specific lead."""
+    version = db.session.query(Lead.change_seq, Lead.updated_at).filter(Lead.id == lead_id).first()
+    if version is None:
+        abort(404)
+    
+    # The page also shows the navbar for the current user and any pending
+    # flash messages, so those are part of its validator.
+    etag = weak_etag(
+        "lead-page", lead_id, version.change_seq,
+        int(version.updated_at.timestamp() * 1000000), current_user.id
+    )
+    if not session.get("_flashes") and is_not_modified(request.headers, etag, version.updated_at):
+        response = app.response_class(status=304)
+    else:
+        lead = Lead.query.get_or_404(lead_id)
+        response = make_response(render_template(
+            "lead_details.html", lead=lead, LeadState=LeadState,
+            resume_versions=resume_versions(db.session, lead_id)
+        ))
+    
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(version.updated_at)
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+@app.route("/lead/<int:lead_id>/resume")
+@login_required
+def lead_resume(lead_id):
+    """Download a lead's resume, with Range and If-None-Match support."""
     lead = Lead.query.get_or_404(lead_id)
-    return render_template("lead_details.html", lead=lead, LeadState=LeadState)
+    return _send_resume(lead, lead.resume_path)
+
+@app.route("/lead/<int:lead_id>/resume/<int:version>")
+@login_required
+def lead_resume_version(lead_id, version):
+    """Download one version of a repeat applicant's resume."""
+    lead = Lead.query.get_or_404(lead_id)
+    resume = LeadResume.query.filter_by(lead_id=lead_id, version=version).first_or_404()
+    return _send_resume(lead, resume.resume_path)
+
+def _send_resume(lead, resume_path):
+    path = resolve_path(resume_path)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    # conditional=True handles Range and If-None-Match; the file is passed to
+    # the server's file wrapper so gunicorn can use sendfile.
+    response = send_file(
+        path,
+        mimetype=resume_media_type(path),
+        download_name=resume_download_name(lead, path),
+        conditional=True,
+        etag=resume_etag(resume_path, path),
+        max_age=RESUME_CACHE_MAX_AGE
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 @app.route("/lead/<int:lead_id>/update", methods=["POST"])
 @login_required
@@ -202,10 +418,19 @@ def update_lead(lead_id):
     """Update a lead's state and notes."""
     lead = Lead.query.get_or_404(lead_id)
     
+    # A lead another attorney has claimed stays theirs until the lease ends
+    holder = lease_holder(lead)
+    if holder is not None and holder != current_user.id:
+        flash("This lead is being worked on by another attorney", "warning")
+        return redirect(url_for("view_lead", lead_id=lead_id))
+    
     # Update lead state if provided
     state = request.form.get("state")
     if state and state in [e.name for e in LeadState]:
+        record_transition(db.session, lead.state, LeadState[state])
         lead.state = LeadState[state]
+        if lead.state != LeadState.PENDING:
+            end_lease(lead)
     
     # Update notes if provided
     notes = request.form.get("notes")
@@ -215,11 +440,149 @@ def update_lead(lead_id):
     # Update the lead
     lead.updated_by = current_user.id
     lead.updated_at = datetime.datetime.utcnow()
+    publish_lead_event(db.session, LEAD_UPDATED, lead)
+    invalidate_leads(db.session, lead.id)
     
     db.session.commit()
     flash("Lead updated successfully", "success")
     
     return redirect(url_for("view_lead", lead_id=lead_id))
 
+@app.route("/leads/claim", methods=["POST"])
+@login_required
+def claim_lead():
+    """Lease the oldest unassigned pending lead to the current user and open it."""
+    lead = claim_next_lead(db.session, current_user.id)
+    if lead is None:
+        db.session.rollback()
+        flash("No pending leads are waiting", "info")
+        return redirect(url_for("dashboard"))
+    db.session.commit()
+    return redirect(url_for("view_lead", lead_id=lead.id))
+
+@app.route("/leads/bulk_update", methods=["POST"])
+@login_required
+def bulk_update():
+    """Move the leads selected on the dashboard to a new state in one statement."""
+    lead_ids = request.form.getlist("lead_ids", type=int)
+    state = request.form.get("state")
+    if not lead_ids or state not in [e.name for e in LeadState]:
+        flash("Select at least one lead and a state", "danger")
+        return redirect(request.referrer or url_for("dashboard"))
+    if len(lead_ids) > MAX_BULK_IDS:
+        flash(f"At most {MAX_BULK_IDS} leads can be updated at once", "danger")
+        return redirect(request.referrer or url_for("dashboard"))
+    
+    try:
+        rows, _, leased_ids = bulk_update_leads(db.session, current_user.id, lead_ids=lead_ids, state=LeadState[state])
+    except BulkSelectionTooBroad as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+        return redirect(request.referrer or url_for("dashboard"))
+    db.session.commit()
+    flash(f"{len(rows)} leads updated", "success")
+    if leased_ids:
+        flash(f"{len(leased_ids)} leads are being worked on by another attorney and were left unchanged", "warning")
+    
+    return redirect(request.referrer or url_for("dashboard"))
+
+@app.route("/system/pool")
+@login_required
+def system_pool():
+    """Live statistics of this worker's database connection pool."""
+    return jsonify(pool_status(db.engine))
+
+# Maintenance commands, e.g. `flask --app app resumes-gc`
+@app.cli.command("db-upgrade")
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = upgrade_schema(db.engine)
+    print(f"Applied migrations: {', '.join(applied) or 'none'}")
+
+@app.cli.command("resumes-gc")
+def resumes_gc_command():
+    """Delete stored resumes that no lead references."""
+    removed, freed = collect_garbage(db.session)
+    print(f"Removed {removed} orphaned resumes, freed {freed} bytes")
+
+@app.cli.command("resumes-report")
+def resumes_report_command():
+    """Report disk space saved by resume deduplication."""
+    report = storage_report(db.session)
+    print(f"{report['references']} leads share {report['blobs']} stored resumes")
+    print(f"Logical size: {report['logical_bytes']} bytes")
+    print(f"Physical size: {report['physical_bytes']} bytes")
+    print(f"Saved: {report['saved_bytes']} bytes")
+
+@app.cli.command("counters-reconcile")
+def counters_reconcile_command():
+    """Recompute the lead state counters from the leads table."""
+    corrections = reconcile(db.session)
+    print(f"Corrections applied: {corrections or 'none'}")
+
+@app.cli.command("resumes-extract")
+def resumes_extract_command():
+    """Extract text from every resume that has not been processed yet."""
+    queued = backfill_extraction(db.session)
+    processed = resume_text_extractor.run_until_idle()
+    print(f"Queued {queued} resumes, processed {processed}")
+
+@app.cli.command("resumes-migrate")
+def resumes_migrate_command():
+    """Move resumes stored under the old flat naming into content-addressed storage."""
+    migrated = migrate_legacy_files(db.session)
+    print(f"Migrated {migrated} resumes")
+
+@app.cli.command("journal-replay")
+def journal_replay_command():
+    """Add submissions journaled during a database outage to the leads table."""
+    created, skipped = replay(db.session)
+    print(f"Created {created} leads, {skipped} were already present")
+
+@app.cli.command("journal-requeue")
+@click.argument("names", nargs=-1)
+def journal_requeue_command(names):
+    """Move entries quarantined in journal/failed/ back to be replayed, all of them by default."""
+    moved = submission_journal.requeue(names)
+    print(f"Requeued {len(moved)} journal entries")
+
+@app.cli.command("leads-merge-duplicates")
+@click.option("--window-days", type=float, default=LEAD_MERGE_WINDOW_DAYS, show_default=True,
+              help="Merge leads of one email created within this many days of each other.")
+@click.option("--dry-run", is_flag=True, help="Only report what would be merged.")
+def leads_merge_duplicates_command(window_days, dry_run):
+    """Merge existing duplicate applicants into one lead with resume versions."""
+    window = merge_window(window_days)
+    if window is None:
+        print("Merge window is 0; nothing to do")
+        return
+    applicants, removed = merge_duplicates(db.session, window, dry_run)
+    verb = "Would merge" if dry_run else "Merged"
+    print(f"{verb} {removed} duplicate leads of {applicants} applicants")
+
+@app.cli.command("idempotency-purge")
+def idempotency_purge_command():
+    """Delete expired submission idempotency keys."""
+    purged = purge_expired_keys(db.session)
+    print(f"Purged {purged} expired idempotency keys")
+
+@app.cli.command("outbox-purge")
+def outbox_purge_command():
+    """Delete sent emails older than OUTBOX_SENT_RETENTION_DAYS."""
+    purged = purge_sent(db.session)
+    print(f"Purged {purged} sent emails")
+
+@app.cli.command("users-deactivate")
+@click.argument("email")
+def users_deactivate_command(email):
+    """Deactivate a user and evict them from the user caches of every worker."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        print(f"No user with email {email}")
+        return
+    user.is_active = 0
+    db.session.commit()
+    print(f"Deactivated {email}")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
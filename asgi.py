@@ -1,4 +1,5 @@
 import os
+import asyncio
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
@@ -6,6 +7,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import importlib.util
 
+from request_limits import RequestSizeLimit
+from resume_storage import MAX_REQUEST_SIZE
+
 # Create upload directory if it doesn't exist
 upload_dir = "uploads"
 if not os.path.exists(upload_dir):
@@ -157,6 +161,8 @@ document.addEventListener('DOMContentLoaded', function() {
  */
 function initLeadForm() {
     const form = document.getElementById('leadForm');
+    // Sent with every attempt at the same submission, so retries don't create duplicates
+    let idempotencyKey = crypto.randomUUID();
     form.addEventListener('submit', async function(e) {
         e.preventDefault();
         
@@ -164,12 +170,14 @@ function initLeadForm() {
         try {
             const response = await fetch('/leads/', {
                 method: 'POST',
+                headers: { 'Idempotency-Key': idempotencyKey },
                 body: formData
             });
             
             if (response.ok) {
                 const result = await response.json();
                 form.reset();
+                idempotencyKey = crypto.randomUUID();
                 const message = document.getElementById('submissionMessage');
                 message.textContent = 'Lead submitted successfully. Check your email for confirmation.';
                 message.style.display = 'block';
@@ -233,12 +241,84 @@ function authenticateUI(token) {
     document.getElementById('loginForm').style.display = 'none';
     document.getElementById('dashboard').style.display = 'block';
     fetchLeads(token);
+    subscribeLeadEvents(token);
+}
+
+let currentFilter = null;
+let changeWatermark = null;
+
+/**
+ * Fetch only the leads changed since the last sync and patch them into the table
+ */
+async function syncChanges(token) {
+    if (changeWatermark === null) {
+        return fetchLeads(token, currentFilter);
+    }
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const response = await fetch(`/leads/changes?since=${changeWatermark}`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            if (!response.ok) return;
+            
+            const result = await response.json();
+            result.changes.forEach(upsertLeadRow);
+            result.deleted.forEach(lead => removeLeadRow(lead.id));
+            changeWatermark = result.watermark;
+            hasMore = result.has_more;
+        }
+    } catch (error) {
+        console.error(error);
+    }
+}
+
+/**
+ * Listen to the live lead feed and patch the table as events arrive
+ */
+async function subscribeLeadEvents(token) {
+    try {
+        const response = await fetch('/leads/events', {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        if (!response.ok) return;
+        
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            const frames = buffer.split('\\n\\n');
+            buffer = frames.pop();
+            frames.forEach(frame => {
+                frame.split('\\n')
+                    .filter(line => line.startsWith('data: '))
+                    .map(line => JSON.parse(line.slice(6)))
+                    .forEach(event => event.type === 'lead.deleted'
+                        ? removeLeadRow(event.lead.id)
+                        : upsertLeadRow(event.lead));
+            });
+        }
+    } catch (error) {
+        console.error(error);
+    }
+    // Catch up on anything missed while disconnected, then reconnect
+    setTimeout(() => {
+        syncChanges(token);
+        subscribeLeadEvents(token);
+    }, 5000);
 }
 
 /**
  * Fetch leads from the API
  */
 async function fetchLeads(token, filterState = null) {
+    currentFilter = filterState;
     try {
         let url = '/leads/';
         if (filterState) {
@@ -252,6 +332,7 @@ async function fetchLeads(token, filterState = null) {
         });
         
         if (response.ok) {
+            changeWatermark = response.headers.get('X-Change-Watermark');
             const leads = await response.json();
             renderLeadsTable(leads);
         } else if (response.status === 401) {
@@ -283,22 +364,56 @@ function renderLeadsTable(leads) {
         return;
     }
     
-    leads.forEach(lead => {
-        const row = document.createElement('tr');
-        const createdAt = new Date(lead.created_at).toLocaleDateString();
-        
-        row.innerHTML = `
-            <td>${lead.first_name} ${lead.last_name}</td>
-            <td>${lead.email}</td>
-            <td><span class="badge ${lead.state === 'PENDING' ? 'bg-warning' : 'bg-success'}">${lead.state}</span></td>
-            <td>${createdAt}</td>
-            <td>
-                <button class="btn btn-sm btn-info" onclick="showLeadDetails(${lead.id})">View</button>
-            </td>
-        `;
-        
-        tableBody.appendChild(row);
-    });
+    leads.forEach(lead => tableBody.appendChild(buildLeadRow(lead)));
+}
+
+/**
+ * Build a table row for a lead
+ */
+function buildLeadRow(lead) {
+    const row = document.createElement('tr');
+    row.dataset.leadId = lead.id;
+    const createdAt = new Date(lead.created_at).toLocaleDateString();
+    
+    row.innerHTML = `
+        <td>${lead.first_name} ${lead.last_name}</td>
+        <td>${lead.email}</td>
+        <td><span class="badge ${lead.state === 'PENDING' ? 'bg-warning' : 'bg-success'}">${lead.state}</span></td>
+        <td>${createdAt}</td>
+        <td>
+            <button class="btn btn-sm btn-info" onclick="showLeadDetails(${lead.id})">View</button>
+        </td>
+    `;
+    return row;
+}
+
+/**
+ * Insert, replace or remove a single lead row without reloading the table
+ */
+function upsertLeadRow(lead) {
+    const tableBody = document.getElementById('leadsTableBody');
+    const existing = tableBody.querySelector(`tr[data-lead-id="${lead.id}"]`);
+    const visible = !currentFilter || lead.state === currentFilter;
+    
+    if (existing) {
+        if (visible) {
+            existing.replaceWith(buildLeadRow(lead));
+        } else {
+            existing.remove();
+        }
+    } else if (visible) {
+        const placeholder = tableBody.querySelector('tr:not([data-lead-id])');
+        if (placeholder) placeholder.remove();
+        tableBody.prepend(buildLeadRow(lead));
+    }
+}
+
+/**
+ * Remove the row of a lead that no longer exists, e.g. after a merge
+ */
+function removeLeadRow(leadId) {
+    const row = document.getElementById('leadsTableBody').querySelector(`tr[data-lead-id="${leadId}"]`);
+    if (row) row.remove();
 }
 
 /**
@@ -324,7 +439,7 @@ async function showLeadDetails(leadId) {
             detailsDiv.innerHTML = `
                 <p><strong>Name:</strong> ${lead.first_name} ${lead.last_name}</p>
                 <p><strong>Email:</strong> ${lead.email}</p>
-                <p><strong>Resume:</strong> <a href="/uploads/${lead.resume_path}" target="_blank">View Resume</a></p>
+                <p><strong>Resume:</strong> <a href="#" onclick="openResume(${lead.id}); return false;">View Resume</a></p>
                 <p><strong>Status:</strong> ${lead.state}</p>
                 <p><strong>Submitted:</strong> ${createdAt}</p>
                 <p><strong>Last Updated:</strong> ${updatedAt}</p>
@@ -345,6 +460,28 @@ async function showLeadDetails(leadId) {
     }
 }
 
+/**
+ * Open a lead's resume; the endpoint needs the bearer token, so it is fetched
+ * and shown from a blob URL (the browser cache still honours its ETag)
+ */
+async function openResume(leadId) {
+    const token = localStorage.getItem('access_token');
+    if (!token) return;
+    
+    const response = await fetch(`/leads/${leadId}/resume`, {
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    });
+    
+    if (response.ok) {
+        const blob = await response.blob();
+        window.open(URL.createObjectURL(blob), '_blank');
+    } else {
+        alert('Failed to load resume');
+    }
+}
+
 /**
  * Update a lead's state and notes
  */
@@ -358,7 +495,7 @@ async function updateLead() {
     
     try {
         const response = await fetch(`/leads/${leadId}`, {
-            method: 'PUT',
+            method: 'PATCH',
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -372,7 +509,7 @@ async function updateLead() {
         if (response.ok) {
             const modal = bootstrap.Modal.getInstance(document.getElementById('leadDetailsModal'));
             modal.hide();
-            fetchLeads(token); // Refresh the leads list
+            syncChanges(token); // Fetch just what changed
             alert('Lead updated successfully');
         } else {
             alert('Failed to update lead');
@@ -397,6 +534,9 @@ function filterLeads(state) {
 # Initialize FastAPI app
 app = FastAPI(title="Lead Management System")
 
+# Refuse oversized uploads before FastAPI spools the body
+app.add_middleware(RequestSizeLimit, max_body_size=MAX_REQUEST_SIZE)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -413,21 +553,52 @@ async def admin_panel(request: Request):
     """Serve the admin lead management interface."""
     return templates.TemplateResponse("lead_management.html", {"request": request})
 
-# Import routers if they exist
-try:
-    # Dynamically import routers
-    from routers import auth, leads
-    app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-    app.include_router(leads.router, prefix="/leads", tags=["Leads"])
-except ImportError:
-    # Create placeholder routes for demo
-    @app.post("/auth/token")
-    async def get_token():
-        return {"access_token": "demo_token", "token_type": "bearer"}
-    
-    @app.get("/leads/")
-    async def get_leads():
-        return []
+# API routers; a missing dependency is an error, not a reason to serve stubs
+from routers import auth, leads, system
+app.include_router(auth.router, tags=["Authentication"])
+app.include_router(leads.router, tags=["Leads"])
+app.include_router(system.router)
+
+from database import engine, async_engine, session_scope
+from migrations import upgrade_schema
+from outbox import OutboxWorkerPool, OUTBOX_WORKERS
+from lead_counters import CounterReconciler
+from resume_text import ResumeTextExtractor
+from lead_events import broker, PostgresEventListener
+from user_cache import user_cache, USER_EVENTS_CHANNEL
+from login_throttle import password_executor
+
+# Deliver queued emails in the background
+outbox_pool = OutboxWorkerPool(session_scope)
+# Keep the lead counters honest
+counter_reconciler = CounterReconciler(session_scope)
+# Extract resume text for search in a separate process pool
+resume_text_extractor = ResumeTextExtractor(session_scope)
+# Share lead events between workers through PostgreSQL LISTEN/NOTIFY
+lead_event_listener = PostgresEventListener(engine)
+# Evict users changed by other processes from the user cache
+user_change_listener = PostgresEventListener(engine, user_cache.handle_notification, USER_EVENTS_CHANNEL)
+
+@app.on_event("startup")
+async def start_background_workers():
+    upgrade_schema(engine)
+    broker.bind(asyncio.get_running_loop())
+    lead_event_listener.start()
+    user_change_listener.start()
+    if OUTBOX_WORKERS > 0:
+        outbox_pool.start()
+    counter_reconciler.start()
+    resume_text_extractor.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    outbox_pool.stop()
+    counter_reconciler.stop()
+    resume_text_extractor.stop()
+    lead_event_listener.stop()
+    user_change_listener.stop()
+    password_executor.shutdown()
+    await async_engine.dispose()
 
 # For local development
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,11 +7,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
 import models
 import schemas
+from user_cache import Principal, user_cache, token_key
+from login_throttle import password_executor
 
 # Security configurations
 SECRET_KEY = os.environ.get("SESSION_SECRET", "a_super_secure_secret_key_change_in_production")
@@ -32,6 +36,11 @@ def get_user(db, email: str):
     """Get a user by email."""
     return db.query(models.User).filter(models.User.email == email).first()
 
+async def get_user_async(db: AsyncSession, email: str):
+    """Get a user by email through an async session."""
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
 def authenticate_user(db, email: str, password: str):
     """Authenticate a user by email and password."""
     user = get_user(db, email)
@@ -41,6 +50,20 @@ def authenticate_user(db, email: str, password: str):
         return False
     return user
 
+async def authenticate_user_async(db, email: str, password: str):
+    """
+    Authenticate a user without blocking the event loop.
+    
+    The bcrypt check runs in the bounded password executor, which raises
+    ExecutorSaturated when too many checks are already waiting.
+    """
+    user = await get_user_async(db, email)
+    if not user:
+        return False
+    if not await password_executor.run(verify_password, password, user.password):
+        return False
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -52,8 +75,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get the current authenticated user from the JWT token."""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the current authenticated user from the JWT token.
+    
+    Verified tokens are cached until they expire (at most USER_CACHE_TTL),
+    so repeat requests with the same token skip the decode and the user query.
+    """
+    key = token_key(token)
+    principal = user_cache.get(key)
+    if principal is not None:
+        return principal
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -67,10 +100,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, email=token_data.email)
+    generation = user_cache.generation
+    user = await get_user_async(db, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user
+    
+    principal = Principal.from_user(user)
+    expires_in = payload["exp"] - time.time() if "exp" in payload else None
+    user_cache.put(key, principal, expires_in, generation)
+    return principal
 
 async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
     """Check if the current user is active."""
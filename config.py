@@ -1,5 +1,7 @@
 import os
-from pydantic import BaseSettings
+from typing import Optional
+
+from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     """Application settings."""
@@ -9,6 +11,19 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = os.environ.get("DATABASE_URL")
+    # URL for the API's async engine; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: Optional[str] = os.environ.get("ASYNC_DATABASE_URL")
+    
+    # Connection pool settings, per engine and process
+    DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.environ.get("DB_POOL_TIMEOUT", 10))  # seconds to wait for a connection
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", 1800))  # seconds before a connection is replaced
+    DB_POOL_USE_LIFO: bool = os.environ.get("DB_POOL_USE_LIFO", "1") == "1"
+    DB_POOL_PRE_PING: bool = os.environ.get("DB_POOL_PRE_PING", "0") == "1"
+    DB_CONNECT_TIMEOUT: int = int(os.environ.get("DB_CONNECT_TIMEOUT", 10))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))  # 0 disables
+    DB_LOCK_TIMEOUT_MS: int = int(os.environ.get("DB_LOCK_TIMEOUT_MS", 5000))  # 0 disables
     
     # JWT settings
     SECRET_KEY: str = os.environ.get("SESSION_SECRET", "a_super_secure_secret_key_change_in_production")
@@ -25,6 +40,6 @@ class Settings(BaseSettings):
     
     # File upload settings
     UPLOAD_DIRECTORY: str = "uploads"
-    MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10 MB
+    MAX_UPLOAD_SIZE: int = int(os.environ.get("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))  # 10 MB
 
 settings = Settings()
@@ -1,13 +1,16 @@
-import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from config import settings
+from engine_factory import create_app_engine, create_app_async_engine
+
 # Use PostgreSQL database from environment variables
-SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL")
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Create the SQLAlchemy engine (no need for check_same_thread with PostgreSQL)
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Create the SQLAlchemy engine; pool sizes and timeouts come from config.Settings
+engine = create_app_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create a SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,3 +25,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+@contextmanager
+def session_scope():
+    """Provide a session for work done outside of a request, e.g. background workers."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async engine for the FastAPI routers, so queries wait without blocking the
+# event loop. ASYNC_DATABASE_URL overrides the URL derived from DATABASE_URL.
+async_engine = create_app_async_engine()
+
+# Objects stay readable after commit; reloading them would need an await
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
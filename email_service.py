@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content, Attachment, FileContent, FileName, FileType, Disposition
 
@@ -11,6 +12,8 @@ SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
 ATTORNEY_EMAIL = os.environ.get('ATTORNEY_EMAIL', 'attorney@example.com')
 COMPANY_NAME = os.environ.get('COMPANY_NAME', 'Lead Management System')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@leadmanagementsystem.com')
+# Either 'sendgrid' or 'fake' (records emails in memory, for offline use)
+EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', 'sendgrid')
 
 def send_prospect_confirmation_email(prospect_email, first_name, last_name):
     """
@@ -75,6 +78,103 @@ def send_attorney_notification_email(first_name, last_name, prospect_email, resu
     
     return _send_email(ATTORNEY_EMAIL, subject, content, attachment_path=resume_path)
 
+class SendGridTransport:
+    """Deliver emails through the SendGrid API."""
+    
+    def send(self, recipient, subject, html_content, attachment_path=None):
+        if not SENDGRID_API_KEY:
+            logger.error("SendGrid API key is not set. Email will not be sent.")
+            return False
+        
+        message = Mail(
+            from_email=Email(DEFAULT_FROM_EMAIL),
+            to_emails=To(recipient),
+            subject=subject,
+            html_content=Content("text/html", html_content)
+        )
+        
+        # Add attachment if provided
+        if attachment_path and os.path.exists(attachment_path):
+            try:
+                with open(attachment_path, 'rb') as f:
+                    file_content = f.read()
+                    
+                file_name = os.path.basename(attachment_path)
+                file_type = "application/pdf"  # Default to PDF
+                
+                # Try to determine file type based on extension
+                if file_name.lower().endswith('.docx'):
+                    file_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                elif file_name.lower().endswith('.doc'):
+                    file_type = "application/msword"
+                elif file_name.lower().endswith('.txt'):
+                    file_type = "text/plain"
+                    
+                attachment = Attachment()
+                attachment.file_content = FileContent(file_content)
+                attachment.file_name = FileName(file_name)
+                attachment.file_type = FileType(file_type)
+                attachment.disposition = Disposition("attachment")
+                
+                message.attachment = attachment
+            except Exception as e:
+                logger.error(f"Failed to attach file to email: {str(e)}")
+        
+        try:
+            sg = SendGridAPIClient(SENDGRID_API_KEY)
+            response = sg.send(message)
+            
+            if response.status_code >= 200 and response.status_code < 300:
+                logger.info(f"Email sent successfully to {recipient}")
+                return True
+            else:
+                logger.error(f"Failed to send email: {response.status_code} - {response.body}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Error sending email: {str(e)}")
+            return False
+
+class FakeTransport:
+    """
+    Local transport that records emails in memory instead of sending them.
+    
+    Useful for running the outbox pipeline offline. Set ``fail_count`` to make
+    the next N sends fail so retry and dead-letter handling can be exercised.
+    """
+    
+    def __init__(self, fail_count=0):
+        self.sent = []
+        self.fail_count = fail_count
+        self._lock = threading.Lock()
+    
+    def send(self, recipient, subject, html_content, attachment_path=None):
+        with self._lock:
+            if self.fail_count > 0:
+                self.fail_count -= 1
+                logger.warning(f"Fake transport rejected email to {recipient}")
+                return False
+            self.sent.append({
+                "recipient": recipient,
+                "subject": subject,
+                "html_content": html_content,
+                "attachment_path": attachment_path,
+            })
+        logger.info(f"Fake transport recorded email to {recipient}")
+        return True
+
+_transport = FakeTransport() if EMAIL_TRANSPORT == 'fake' else SendGridTransport()
+
+def get_transport():
+    """Return the transport used to deliver emails."""
+    return _transport
+
+def set_transport(transport):
+    """Replace the transport used to deliver emails and return the previous one."""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
 def _send_email(recipient, subject, html_content, attachment_path=None):
     """
     Helper function to send an email.
@@ -85,55 +185,4 @@ def _send_email(recipient, subject, html_content, attachment_path=None):
         html_content: The email body (HTML)
         attachment_path: Optional path to an attachment file
     """
-    if not SENDGRID_API_KEY:
-        logger.error("SendGrid API key is not set. Email will not be sent.")
-        return False
-    
-    message = Mail(
-        from_email=Email(DEFAULT_FROM_EMAIL),
-        to_emails=To(recipient),
-        subject=subject,
-        html_content=Content("text/html", html_content)
-    )
-    
-    # Add attachment if provided
-    if attachment_path and os.path.exists(attachment_path):
-        try:
-            with open(attachment_path, 'rb') as f:
-                file_content = f.read()
-                
-            file_name = os.path.basename(attachment_path)
-            file_type = "application/pdf"  # Default to PDF
-            
-            # Try to determine file type based on extension
-            if file_name.lower().endswith('.docx'):
-                file_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            elif file_name.lower().endswith('.doc'):
-                file_type = "application/msword"
-            elif file_name.lower().endswith('.txt'):
-                file_type = "text/plain"
-                
-            attachment = Attachment()
-            attachment.file_content = FileContent(file_content)
-            attachment.file_name = FileName(file_name)
-            attachment.file_type = FileType(file_type)
-            attachment.disposition = Disposition("attachment")
-            
-            message.attachment = attachment
-        except Exception as e:
-            logger.error(f"Failed to attach file to email: {str(e)}")
-    
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        
-        if response.status_code >= 200 and response.status_code < 300:
-            logger.info(f"Email sent successfully to {recipient}")
-            return True
-        else:
-            logger.error(f"Failed to send email: {response.status_code} - {response.body}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
-        return False
\ No newline at end of file
+    return _transport.send(recipient, subject, html_content, attachment_path=attachment_path)
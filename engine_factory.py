@@ -0,0 +1,170 @@
+import time
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from config import settings
+
+class PoolStats:
+    """Counters of how long checkouts from a pool waited for a connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def started(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def finished(self, elapsed, timed_out=False):
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += elapsed
+            self.wait_seconds_max = max(self.wait_seconds_max, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+
+class _InstrumentedPool:
+    """Pool mixin recording how many checkouts are waiting and for how long."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        self.stats.started()
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            self.stats.finished(time.perf_counter() - start, timed_out)
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+def async_database_url(url):
+    """
+    Rewrite a database URL for the asyncio driver of its database.
+
+    PostgreSQL uses asyncpg and SQLite uses aiosqlite. libpq's ``sslmode``
+    is passed on as asyncpg's equivalent ``ssl`` argument.
+
+    Returns:
+        Tuple of (URL, connect_args)
+    """
+    url = make_url(url)
+    connect_args = {}
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        if "sslmode" in url.query:
+            connect_args["ssl"] = url.query["sslmode"]
+            url = url.difference_update_query(["sslmode"])
+        url = url.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, connect_args
+
+def engine_options(url, is_async=False, config=settings):
+    """
+    Keyword arguments for create_engine (or Flask-SQLAlchemy's
+    SQLALCHEMY_ENGINE_OPTIONS) built from the pool settings.
+
+    Connections are reused LIFO, so idle ones beyond the working set age
+    out through pool_recycle, and pre-ping is off by default. PostgreSQL
+    sessions get the configured statement and lock timeouts.
+
+    Args:
+        url: Database URL the engine is for
+        is_async: Whether the engine is an async engine
+        config: Settings to read, the application settings by default
+    """
+    url = make_url(url)
+    connect_args = {}
+    if url.get_backend_name() == "sqlite":
+        # No server to pool connections to; wait on database locks instead of failing
+        if config.DB_LOCK_TIMEOUT_MS:
+            connect_args["timeout"] = config.DB_LOCK_TIMEOUT_MS / 1000
+        return {"connect_args": connect_args}
+
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_use_lifo": config.DB_POOL_USE_LIFO,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+    if url.get_backend_name() == "postgresql":
+        timeouts = {}
+        if config.DB_STATEMENT_TIMEOUT_MS:
+            timeouts["statement_timeout"] = str(config.DB_STATEMENT_TIMEOUT_MS)
+        if config.DB_LOCK_TIMEOUT_MS:
+            timeouts["lock_timeout"] = str(config.DB_LOCK_TIMEOUT_MS)
+        if is_async:
+            connect_args["timeout"] = config.DB_CONNECT_TIMEOUT
+            if timeouts:
+                connect_args["server_settings"] = timeouts
+        else:
+            connect_args.update(connect_timeout=config.DB_CONNECT_TIMEOUT, keepalives=1, keepalives_idle=30)
+            if timeouts:
+                connect_args["options"] = " ".join(f"-c {name}={value}" for name, value in timeouts.items())
+    return options
+
+def create_app_engine(url=None, config=settings):
+    """Create the synchronous engine for a database URL (DATABASE_URL by default)."""
+    url = url or config.DATABASE_URL
+    return create_engine(url, **engine_options(url, config=config))
+
+def create_app_async_engine(url=None, config=settings):
+    """Create the async engine, for ASYNC_DATABASE_URL or the async form of DATABASE_URL."""
+    url, driver_args = async_database_url(url or config.ASYNC_DATABASE_URL or config.DATABASE_URL)
+    options = engine_options(url, is_async=True, config=config)
+    options["connect_args"].update(driver_args)
+    return create_async_engine(url, **options)
+
+def pool_status(engine):
+    """Live statistics of an engine's connection pool."""
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, _InstrumentedPool):
+        status.update(pool.stats.snapshot())
+    return status
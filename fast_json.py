@@ -0,0 +1,43 @@
+import json
+import enum
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value):
+    """
+    Encode a value as compact JSON bytes.
+
+    Uses orjson when it is installed, which encodes datetimes and enums
+    itself; otherwise falls back to the standard library encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+def plain(value):
+    """Convert a column value to its JSON form: ISO 8601 for datetimes, the value for enums."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def lead_row(lead, fields):
+    """
+    JSON-ready dict of the given fields of a lead, read straight off the row.
+
+    Produces the same output as dumping the lead through the Pydantic
+    schemas, without validating it first.
+    """
+    return {field: plain(getattr(lead, field)) for field in fields}
@@ -0,0 +1,59 @@
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# Let clients keep responses but make them revalidate with their validators
+REVALIDATE = "private, no-cache"
+
+def weak_etag(*parts):
+    """Weak entity tag built from the values that determine a response."""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header matches an entity tag.
+
+    Uses the weak comparison that If-None-Match calls for: ``W/`` prefixes
+    and quotes are ignored on both sides.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(candidate) == opaque for candidate in if_none_match.split(","))
+
+def _opaque(tag):
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag.strip('"')
+
+def http_date(value):
+    """Format a naive UTC datetime for Last-Modified."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def not_modified_since(if_modified_since, last_modified):
+    """Whether a resource last modified at ``last_modified`` (naive UTC) is unchanged since the header date."""
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+def is_not_modified(headers, etag, last_modified=None):
+    """
+    Evaluate If-None-Match, falling back to If-Modified-Since when it is absent.
+
+    Args:
+        headers: Mapping of request headers (case-insensitive)
+        etag: Current entity tag of the resource
+        last_modified: Optional naive UTC modification time
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    return not_modified_since(headers.get("if-modified-since"), last_modified)
@@ -0,0 +1,167 @@
+import os
+import uuid
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import IdempotencyKey
+from lead_intake import find_submission
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds a completed key keeps answering repeats of its request
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 3600))
+# Seconds a request may hold its key before a repeat may take it over,
+# e.g. because the process handling it died
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 120))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Scopes of the two lead submission endpoints
+SUBMIT_FORM_SCOPE = "submit_lead"
+CREATE_LEAD_SCOPE = "POST /leads"
+
+_SUBMISSION_NAMESPACE = uuid.UUID("0f8a4c52-6d0e-4f57-9a39-2b8f1d6c7e41")
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused for a request with different content."""
+
+class IdempotencyInProgress(Exception):
+    """Raised when the request that first used a key has not finished yet."""
+
+def request_fingerprint(*fields):
+    """Hash of the fields identifying a request's content."""
+    return hashlib.sha256("\x1f".join(str(field or "").strip() for field in fields).encode()).hexdigest()
+
+def submission_id_for(scope, key):
+    """
+    Submission id of the lead a keyed request creates.
+
+    Derived from the key, so a repeat that runs after the key expired or
+    after its first attempt was journaled still maps onto the same lead.
+    """
+    if not key:
+        return uuid.uuid4().hex
+    return uuid.uuid5(_SUBMISSION_NAMESPACE, f"{scope}:{key}").hex
+
+def claim_key(session, scope, key, fingerprint):
+    """
+    Reserve an idempotency key for the request about to run.
+
+    The reservation is committed straight away, so concurrent repeats see it.
+
+    Args:
+        session: Database session
+        scope: Endpoint the key belongs to
+        key: Key sent by the client
+        fingerprint: request_fingerprint of the request
+
+    Returns:
+        None if the caller now holds the key and should run the request,
+        otherwise the completed IdempotencyKey whose lead is the result
+
+    Raises:
+        IdempotencyConflict: The key was used for a different request
+        IdempotencyInProgress: The first request with the key is still running
+    """
+    now = datetime.utcnow()
+    record = session.query(IdempotencyKey).filter_by(scope=scope, key=key).first()
+    if record is not None and (
+        record.expires_at <= now or
+        (record.lead_id is None and (record.locked_until is None or record.locked_until <= now))
+    ):
+        # Expired, or abandoned by a request that never finished
+        session.query(IdempotencyKey).filter(IdempotencyKey.id == record.id).delete(synchronize_session=False)
+        session.commit()
+        record = None
+
+    if record is None:
+        try:
+            session.add(IdempotencyKey(
+                scope=scope,
+                key=key,
+                fingerprint=fingerprint,
+                locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+            ))
+            session.commit()
+            return None
+        except IntegrityError:
+            # Claimed concurrently by a repeat of the same request
+            session.rollback()
+            record = session.query(IdempotencyKey).filter_by(scope=scope, key=key).first()
+            if record is None:
+                raise IdempotencyInProgress(key)
+
+    if record.fingerprint != fingerprint:
+        raise IdempotencyConflict(key)
+    if record.lead_id is None:
+        raise IdempotencyInProgress(key)
+    return record
+
+def complete_key(session, scope, key, lead_id):
+    """Record the lead a keyed request produced, in the caller's transaction."""
+    session.query(IdempotencyKey).filter_by(scope=scope, key=key).update(
+        {"lead_id": lead_id, "locked_until": None}, synchronize_session=False
+    )
+
+def release_key(session, scope, key):
+    """Give up a key whose request failed, so a retry runs it again."""
+    try:
+        session.query(IdempotencyKey).filter_by(scope=scope, key=key, lead_id=None).delete(synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        # The lock expires on its own
+        logger.warning(f"Could not release idempotency key {key}: {str(e)}")
+
+def commit_submission(session, submission_id, create, scope=None, key=None):
+    """
+    Create a submission's lead with ``create(session)`` and commit it,
+    recording it as the result of the idempotency key if there is one.
+
+    If the submission was already recorded (an earlier attempt that was
+    journaled, or whose key expired), nothing new is written and its lead
+    is returned instead.
+
+    Returns:
+        The lead
+    """
+    try:
+        lead = create(session)
+        if key:
+            session.flush()
+            complete_key(session, scope, key, lead.id)
+        session.commit()
+        return lead
+    except IntegrityError:
+        session.rollback()
+        lead = find_submission(session, submission_id)
+        if lead is None:
+            raise
+        if key:
+            complete_key(session, scope, key, lead.id)
+            session.commit()
+        return lead
+
+def purge_expired_keys(session, batch_size=1000):
+    """
+    Delete expired idempotency keys.
+
+    Returns:
+        Number of keys deleted
+    """
+    purged = 0
+    while True:
+        ids = [
+            row.id for row in session.query(IdempotencyKey.id)
+            .filter(IdempotencyKey.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+        ]
+        if not ids:
+            return purged
+        session.query(IdempotencyKey).filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+        session.commit()
+        purged += len(ids)
@@ -0,0 +1,146 @@
+import os
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, update
+
+from models import Lead, LeadState
+from lead_cache import invalidate_leads
+from lead_changes import next_change_seq
+from lead_counters import record_transitions
+from lead_events import publish_lead_events, LEAD_UPDATED
+from lead_queries import filter_leads
+
+# Largest explicit list of ids accepted by one bulk update
+MAX_BULK_IDS = int(os.environ.get('MAX_BULK_IDS', 1000))
+# Most leads one bulk update may change, however they are selected
+MAX_BULK_ROWS = int(os.environ.get('MAX_BULK_ROWS', 5000))
+
+_leads = Lead.__table__
+
+# Columns returned for each updated lead; enough for the event payload
+_RETURNED = (
+    _leads.c.id,
+    _leads.c.first_name,
+    _leads.c.last_name,
+    _leads.c.email,
+    _leads.c.state,
+    _leads.c.created_at,
+    _leads.c.updated_at,
+)
+
+class BulkSelectionTooBroad(Exception):
+    """Raised when a bulk update selects no criteria at all, or more than MAX_BULK_ROWS leads."""
+
+def bulk_update_leads(session, updated_by, lead_ids=None, state=None, notes=None,
+                      where_state=None, created_after=None, created_before=None, max_rows=MAX_BULK_ROWS):
+    """
+    Apply a state and/or notes change to many leads with one UPDATE.
+
+    Leads are selected either by ``lead_ids`` or by the filter arguments.
+    Leads another user holds a lease on are left alone and reported back;
+    a lead moved out of PENDING loses its lease, as with single updates.
+    Counters, change feed, events and the lead cache are maintained as
+    for single updates. The caller commits.
+
+    On PostgreSQL the matching rows are locked, updated and returned in a
+    single ``UPDATE ... FROM (SELECT ... FOR UPDATE) RETURNING`` statement;
+    elsewhere the previous states are read first, then updated.
+
+    Args:
+        session: The SQLAlchemy session
+        updated_by: Id of the user making the change
+        lead_ids: Optional ids of the leads to update
+        state: Optional new LeadState
+        notes: Optional new notes
+        where_state: Optional LeadState the leads must currently be in
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+        max_rows: Most leads to change; selecting more updates none
+
+    Returns:
+        Tuple of (updated rows, {lead_id: previous state}, ids of the
+        selected leads skipped because another user holds them)
+
+    Raises:
+        BulkSelectionTooBroad: Neither ids nor a filter criterion were given,
+            or more than ``max_rows`` leads matched. Nothing was changed,
+            but on PostgreSQL the caller must roll back.
+    """
+    if lead_ids is None and where_state is None and created_after is None and created_before is None:
+        raise BulkSelectionTooBroad("Select the leads by ids or at least one filter criterion")
+    now = datetime.utcnow()
+    selected = select(_leads.c.id, _leads.c.state)
+    if lead_ids is not None:
+        selected = selected.where(_leads.c.id.in_(lead_ids))
+    selected = filter_leads(selected, where_state, created_after, created_before)
+    # Same rule as lease_holder: an unexpired lease held by someone else
+    leased = and_(
+        _leads.c.lease_expires_at > now,
+        _leads.c.assigned_to.isnot(None),
+        _leads.c.assigned_to != updated_by
+    )
+    leased_ids = [row.id for row in session.execute(selected.where(leased).order_by(_leads.c.id))]
+    targets = selected.where(or_(
+        _leads.c.lease_expires_at.is_(None),
+        _leads.c.lease_expires_at <= now,
+        _leads.c.assigned_to.is_(None),
+        _leads.c.assigned_to == updated_by
+    ))
+
+    values = {
+        "updated_by": updated_by,
+        "updated_at": now,
+    }
+    if state is not None:
+        values["state"] = state
+        if state != LeadState.PENDING:
+            # The leads leave the work queue; end_lease for a whole statement
+            values["lease_expires_at"] = None
+    if notes is not None:
+        values["notes"] = notes
+
+    if session.get_bind().dialect.name == "postgresql":
+        values["change_seq"] = next_change_seq(session)
+        # Lock in id order so concurrent bulk updates cannot deadlock; one
+        # row past the cap is enough to tell the selection is too broad
+        previous = targets.order_by(_leads.c.id).limit(max_rows + 1).with_for_update().subquery("previous")
+        rows = session.execute(
+            update(_leads)
+            .where(_leads.c.id == previous.c.id)
+            .values(**values)
+            .returning(*_RETURNED, previous.c.state.label("previous_state"))
+        ).all()
+        if len(rows) > max_rows:
+            raise BulkSelectionTooBroad(f"More than {max_rows} leads match")
+        previous_states = {row.id: row.previous_state for row in rows}
+    else:
+        previous_states = {row.id: row.state for row in session.execute(targets.limit(max_rows + 1))}
+        if len(previous_states) > max_rows:
+            raise BulkSelectionTooBroad(f"More than {max_rows} leads match")
+        if not previous_states:
+            return [], {}, leased_ids
+        values["change_seq"] = next_change_seq(session)
+        rows = session.execute(
+            update(_leads)
+            .where(_leads.c.id.in_(list(previous_states)), targets.whereclause)
+            .values(**values)
+            .returning(*_RETURNED)
+        ).all()
+        updated = {row.id for row in rows}
+        missed = [lead_id for lead_id in previous_states if lead_id not in updated]
+        if missed:
+            # Claimed (or changed) by another process between the read and the update
+            leased_ids += [
+                row.id for row in session.execute(select(_leads.c.id).where(_leads.c.id.in_(missed), leased))
+            ]
+            previous_states = {lead_id: previous_states[lead_id] for lead_id in updated}
+
+    if not rows:
+        return [], {}, leased_ids
+
+    if state is not None:
+        record_transitions(session, Counter(previous_states.values()), state)
+    publish_lead_events(session, LEAD_UPDATED, rows)
+    invalidate_leads(session, *(row.id for row in rows))
+    return rows, previous_states, leased_ids
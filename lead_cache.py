@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# "local" (per-process LRU), "shared" (Redis at LEAD_CACHE_URL) or "none"
+LEAD_CACHE_BACKEND = os.environ.get('LEAD_CACHE_BACKEND', 'local')
+LEAD_CACHE_URL = os.environ.get('LEAD_CACHE_URL')
+# Seconds an entry is kept; entries are only served while their version is current
+LEAD_CACHE_TTL = float(os.environ.get('LEAD_CACHE_TTL', 30))
+LEAD_CACHE_MAX_ENTRIES = int(os.environ.get('LEAD_CACHE_MAX_ENTRIES', 2048))
+
+class LocalCacheBackend:
+    """
+    In-process LRU cache whose entries expire after a TTL.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries=LEAD_CACHE_MAX_ENTRIES, ttl=LEAD_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+class InMemorySharedStore:
+    """
+    In-process stand-in for the Redis client used by SharedCacheBackend.
+
+    Implements the handful of commands the backend needs, storing bytes
+    like Redis does, so the shared code path runs in tests without a
+    server. Nothing is shared between processes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, px=None):
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = time.monotonic() + px / 1000 if px else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def dbsize(self):
+        return len(self._data)
+
+class SharedCacheBackend:
+    """
+    Cache kept in Redis (or a compatible store), shared by every worker.
+
+    Values are stored as JSON, so they must be plain JSON-serializable data.
+
+    Args:
+        client: Redis client, or an InMemorySharedStore
+        ttl: Seconds an entry stays valid
+        prefix: Namespace for this cache's keys
+    """
+
+    def __init__(self, client, ttl=LEAD_CACHE_TTL, prefix="lead-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return json.loads(data) if data is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, separators=(",", ":")), px=int(self.ttl * 1000))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def size(self):
+        return self.client.dbsize()
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class LeadCache:
+    """
+    Read-through cache for lead detail and list responses.
+
+    Callers read the current version of what they want from the database
+    first (a lead's change_seq, or the data_version of all leads), so they
+    can answer a conditional request without loading anything, and pass it
+    in. An entry is only served for the version it was loaded at, which
+    keeps every worker's cache correct whatever process made a write.
+
+    Loads for the same key and version are collapsed: while one caller
+    runs the loader, others wait for its result instead of querying the
+    database too. ``invalidate`` (normally via ``invalidate_leads``) drops
+    written leads' entries early; stale entries are never served anyway.
+
+    Args:
+        backend: LocalCacheBackend, SharedCacheBackend, or None to disable caching
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "errors": 0}
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def get_lead(self, lead_id, version, loader):
+        """Cached value for one lead at ``version``, loading it with ``loader()`` on a miss."""
+        return self.get_or_load(f"lead:{lead_id}", version, loader)
+
+    def get_list(self, params, version, loader):
+        """Cached value for a list page identified by ``params`` at ``version``, loading it on a miss."""
+        return self.get_or_load(_list_key(params, version), version, loader)
+
+    def get_or_load(self, key, version, loader):
+        """
+        Return the value cached for ``key`` at ``version``, or load and cache it.
+
+        A loader returning None (e.g. lead not found) is not cached.
+        """
+        if not self.enabled:
+            return loader()
+
+        value = self._lookup(key, version)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        flight_key = (key, version)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+        if not leader:
+            self._count("coalesced")
+            return flight.wait()
+
+        self._count("misses")
+        try:
+            flight.value = loader()
+            if flight.value is not None:
+                self._call(self.backend.set, key, {"version": version, "value": flight.value})
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.done.set()
+
+    async def get_lead_async(self, lead_id, version, loader):
+        """``get_lead`` for async callers; ``loader`` is a coroutine function."""
+        return await self.get_or_load_async(f"lead:{lead_id}", version, loader)
+
+    async def get_list_async(self, params, version, loader):
+        """``get_list`` for async callers; ``loader`` is a coroutine function."""
+        return await self.get_or_load_async(_list_key(params, version), version, loader)
+
+    async def get_or_load_async(self, key, version, loader):
+        """
+        ``get_or_load`` for async callers.
+
+        Concurrent requests on the event loop wait on the leader's future
+        instead of a thread event, which would block the loop.
+        """
+        if not self.enabled:
+            return await loader()
+
+        value = self._lookup(key, version)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        flight_key = (key, version)
+        flight = self._async_flights.get(flight_key)
+        if flight is not None:
+            self._count("coalesced")
+            return await asyncio.shield(flight)
+
+        flight = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+        self._count("misses")
+        try:
+            value = await loader()
+            if value is not None:
+                self._call(self.backend.set, key, {"version": version, "value": value})
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            # Mark the exception retrieved in case nobody was waiting
+            flight.exception()
+            raise
+        finally:
+            self._async_flights.pop(flight_key, None)
+
+    def invalidate(self, lead_ids=()):
+        """Drop the entries of the given leads."""
+        if not self.enabled or not lead_ids:
+            return
+        self._count("invalidations")
+        self._call(self.backend.delete, *(f"lead:{lead_id}" for lead_id in lead_ids))
+
+    def stats(self):
+        """Hit/miss counters and the current size of the cache."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["backend"] = type(self.backend).__name__ if self.enabled else None
+        if self.enabled:
+            stats["size"] = self._call(self.backend.size)
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _call(self, method, *args):
+        # An unreachable shared cache degrades to a miss, never to an error
+        try:
+            return method(*args)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Lead cache backend error: {str(e)}")
+            return None
+
+    def _lookup(self, key, version):
+        entry = self._call(self.backend.get, key)
+        if entry is None or entry["version"] != version:
+            return None
+        return entry["value"]
+
+def _list_key(params, version):
+    return f"leads:{version}:" + "|".join(str(part) for part in params)
+
+def make_backend(kind=LEAD_CACHE_BACKEND, url=LEAD_CACHE_URL):
+    """Build the cache backend selected by LEAD_CACHE_BACKEND."""
+    if kind == "none":
+        return None
+    if kind == "shared":
+        if url:
+            try:
+                import redis
+                return SharedCacheBackend(redis.Redis.from_url(url))
+            except ImportError:
+                logger.warning("The shared lead cache requires the redis package; each worker caches on its own")
+        else:
+            logger.warning("LEAD_CACHE_URL is not set; each worker caches on its own")
+    return LocalCacheBackend()
+
+lead_cache = LeadCache(make_backend())
+
+def invalidate_leads(session, *lead_ids):
+    """
+    Drop written leads' cache entries once the caller's transaction commits.
+
+    List pages need no invalidation: their keys include the data version,
+    which the write moves on. Nothing is dropped if the transaction rolls back.
+    """
+    session.info.setdefault("lead_cache_invalidations", set()).update(lead_ids)
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_invalidations(session):
+    lead_ids = session.info.pop("lead_cache_invalidations", None)
+    if lead_ids is not None:
+        lead_cache.invalidate(lead_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session):
+    session.info.pop("lead_cache_invalidations", None)
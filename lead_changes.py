@@ -0,0 +1,137 @@
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Lead, LeadTombstone, ChangeSequence
+
+LEAD_CHANGES = "lead_changes"
+MAX_CHANGES = 500
+
+_sequences = ChangeSequence.__table__
+
+def _postgres(session):
+    return session.get_bind().dialect.name == "postgresql"
+
+def _settled_horizon():
+    """
+    Oldest transaction id that may still be running on PostgreSQL.
+
+    Every change stamped with a lower value has committed or rolled back,
+    so it is final and visible.
+    """
+    return func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+def next_change_seq(session, name=LEAD_CHANGES):
+    """
+    Change value to stamp on leads written in the caller's transaction.
+
+    On PostgreSQL this is the id of the transaction itself. Taking it holds
+    no lock, so writers never wait on one another; values may commit out of
+    order, and readers stop at the oldest transaction still running (see
+    get_changes) so a ``since`` watermark never skips one.
+
+    Elsewhere a counter row is incremented. It stays locked until the
+    transaction ends, so writers commit in sequence order and a reader
+    never sees value N+1 while N is still in flight.
+    """
+    conn = session.connection()
+    if _postgres(session):
+        return conn.execute(select(func.txid_current())).scalar_one()
+    updated = conn.execute(
+        _sequences.update()
+        .where(_sequences.c.name == name)
+        .values(value=_sequences.c.value + 1)
+    ).rowcount
+    if not updated:
+        try:
+            with conn.begin_nested():
+                conn.execute(_sequences.insert().values(name=name, value=1))
+        except IntegrityError:
+            # Created concurrently by another transaction
+            conn.execute(
+                _sequences.update()
+                .where(_sequences.c.name == name)
+                .values(value=_sequences.c.value + 1)
+            )
+    return conn.execute(select(_sequences.c.value).where(_sequences.c.name == name)).scalar_one()
+
+def current_watermark(session, name=LEAD_CHANGES):
+    """Latest change value that is final, or 0 if nothing changed yet."""
+    if _postgres(session):
+        value = max(
+            session.query(func.max(model.change_seq)).filter(model.change_seq < _settled_horizon()).scalar() or 0
+            for model in (Lead, LeadTombstone)
+        )
+    else:
+        value = session.query(ChangeSequence.value).filter(ChangeSequence.name == name).scalar()
+    return value or 0
+
+def data_version(session, name=LEAD_CHANGES):
+    """
+    Version of the lead data as a whole, for caching and validating listings.
+
+    Any lead write commits a higher version. On PostgreSQL that only holds
+    once every visible change is older than every running transaction;
+    until then a transaction with a lower id may still commit, so None is
+    returned and the data must be read uncached.
+    """
+    if _postgres(session):
+        latest, removed, horizon = session.execute(select(
+            select(func.max(Lead.change_seq)).scalar_subquery(),
+            select(func.max(LeadTombstone.change_seq)).scalar_subquery(),
+            _settled_horizon()
+        )).one()
+        latest = max(latest or 0, removed or 0)
+        return latest if latest < horizon else None
+    return current_watermark(session, name)
+
+@event.listens_for(Session, "before_flush")
+def _stamp_lead_changes(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, (Lead, LeadTombstone))]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, Lead) and session.is_modified(obj, include_collections=False)
+    ]
+    if not changed:
+        return
+    seq = next_change_seq(session)
+    for obj in changed:
+        obj.change_seq = seq
+
+def get_changes(session, since, limit=MAX_CHANGES):
+    """
+    Leads created, modified or removed after the ``since`` watermark, oldest change first.
+
+    Returns:
+        Tuple of (leads, tombstones of removed leads, new watermark,
+        whether more changes are pending)
+    """
+    limit = max(1, min(limit, MAX_CHANGES))
+    changes = []
+    for model in (Lead, LeadTombstone):
+        query = session.query(model).filter(model.change_seq > since)
+        if _postgres(session):
+            # Only changes older than every running transaction; one still
+            # running may yet commit a lower value
+            query = query.filter(model.change_seq < _settled_horizon())
+        changes += query.order_by(model.change_seq, model.id).limit(limit + 1).all()
+    changes.sort(key=lambda obj: obj.change_seq)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        # Never split a sequence value across pages: rows sharing the last
+        # value are all returned again on the next call.
+        last_seq = changes[-1].change_seq
+        complete = [obj for obj in changes if obj.change_seq < last_seq]
+        if complete:
+            changes = complete
+        else:
+            # A single change (e.g. a bulk update) larger than the page
+            changes = [
+                obj for model in (Lead, LeadTombstone)
+                for obj in session.query(model).filter(model.change_seq == last_seq).order_by(model.id)
+            ]
+    watermark = changes[-1].change_seq if changes else since
+    leads = [obj for obj in changes if isinstance(obj, Lead)]
+    removed = [obj for obj in changes if isinstance(obj, LeadTombstone)]
+    return leads, removed, watermark, has_more
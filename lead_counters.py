@@ -0,0 +1,148 @@
+import os
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import Lead, LeadCounter, LeadState
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds between reconciliations of the counters against the leads table
+COUNTER_RECONCILE_INTERVAL = int(os.environ.get('COUNTER_RECONCILE_INTERVAL', 3600))
+
+def increment(session, state, delta=1):
+    """
+    Adjust the counter for a state in the caller's transaction.
+
+    The UPDATE is relative, so concurrent writers never lose increments.
+    """
+    updated = session.query(LeadCounter).filter(LeadCounter.state == state).update(
+        {LeadCounter.count: LeadCounter.count + delta},
+        synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with session.begin_nested():
+            session.add(LeadCounter(state=state, count=delta))
+    except IntegrityError:
+        # Created concurrently by another request
+        session.query(LeadCounter).filter(LeadCounter.state == state).update(
+            {LeadCounter.count: LeadCounter.count + delta},
+            synchronize_session=False
+        )
+
+def record_created(session, lead):
+    """Count a newly created lead."""
+    increment(session, lead.state or LeadState.PENDING)
+
+def record_transition(session, old_state, new_state):
+    """Move a lead between state counters when its state changes."""
+    if old_state == new_state:
+        return
+    if old_state is not None:
+        increment(session, old_state, -1)
+    increment(session, new_state)
+
+def record_transitions(session, old_states, new_state):
+    """
+    Move many leads into ``new_state`` at once.
+
+    Args:
+        session: The SQLAlchemy session
+        old_states: Mapping of each previous state to the number of leads that left it
+        new_state: State the leads moved into
+    """
+    moved = 0
+    for old_state, count in old_states.items():
+        if old_state == new_state or not count:
+            continue
+        if old_state is not None:
+            increment(session, old_state, -count)
+        moved += count
+    if moved:
+        increment(session, new_state, moved)
+
+def get_counts(session):
+    """
+    Return a {LeadState: count} mapping for every state.
+
+    Reads one tiny row per state, so the cost does not depend on the number of leads.
+    """
+    counts = {state: 0 for state in LeadState}
+    for counter in session.query(LeadCounter.state, LeadCounter.count):
+        counts[counter.state] = counter.count
+    return counts
+
+def reconcile(session):
+    """
+    Recompute the counters from the leads table and correct any drift.
+
+    Returns a {LeadState: difference} mapping of the corrections applied.
+    """
+    # Lock the counters first so writers that already adjusted them have
+    # committed, and new writers wait, before the leads are counted.
+    existing = {counter.state: counter for counter in session.query(LeadCounter).with_for_update()}
+    actual = {state: 0 for state in LeadState}
+    for state, count in session.query(Lead.state, func.count(Lead.id)).group_by(Lead.state):
+        actual[state or LeadState.PENDING] += count
+
+    now = datetime.utcnow()
+    corrections = {}
+    for state, count in actual.items():
+        counter = existing.get(state)
+        if counter is None:
+            counter = LeadCounter(state=state, count=0)
+            session.add(counter)
+        if counter.count != count:
+            corrections[state] = count - counter.count
+            counter.count = count
+        counter.reconciled_at = now
+    session.commit()
+
+    if corrections:
+        logger.warning(f"Lead counters drifted, corrected: {corrections}")
+    return corrections
+
+class CounterReconciler:
+    """
+    Background thread that periodically reconciles the lead counters.
+
+    Args:
+        session_factory: Callable returning a context manager that yields a session
+        interval: Seconds between reconciliations
+    """
+
+    def __init__(self, session_factory, interval=COUNTER_RECONCILE_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the reconciliation thread."""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="counter-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Signal the thread to stop and wait for it to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as session:
+                    reconcile(session)
+            except Exception as e:
+                logger.error(f"Counter reconciliation failed: {str(e)}")
+            self._stop.wait(self.interval)
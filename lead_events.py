@@ -0,0 +1,195 @@
+import os
+import json
+import asyncio
+import logging
+import select
+import threading
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LEAD_EVENTS_CHANNEL = "lead_events"
+LEAD_CREATED = "lead.created"
+LEAD_UPDATED = "lead.updated"
+LEAD_DELETED = "lead.deleted"
+
+# Events buffered per subscriber before a slow client is disconnected
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get('SUBSCRIBER_QUEUE_SIZE', 256))
+
+def lead_payload(lead):
+    """Compact representation of a lead sent with events (notes are left out)."""
+    return {
+        "id": lead.id,
+        "first_name": lead.first_name,
+        "last_name": lead.last_name,
+        "email": lead.email,
+        "state": lead.state.value if lead.state else None,
+        "created_at": lead.created_at.isoformat() if lead.created_at else None,
+        "updated_at": lead.updated_at.isoformat() if lead.updated_at else None,
+    }
+
+class LeadEventBroker:
+    """
+    In-process fan-out of lead events to connected subscribers.
+
+    Each subscriber gets a bounded asyncio queue; a subscriber that falls
+    too far behind is dropped rather than slowing everyone else down.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+
+    def bind(self, loop):
+        """Attach the broker to the event loop its subscribers run on."""
+        self._loop = loop
+
+    def subscribe(self):
+        """Register a new subscriber and return its queue."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        """Remove a subscriber."""
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def dispatch(self, message):
+        """Deliver an event to every subscriber. Must run on the broker's loop."""
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Replace the oldest event with an end-of-stream marker; the
+                # client reconnects and resynchronizes.
+                logger.warning("Dropping slow lead event subscriber")
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def dispatch_threadsafe(self, message):
+        """Deliver an event from any thread."""
+        if self._loop is None or not self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self.dispatch, message)
+
+broker = LeadEventBroker()
+
+def publish_lead_event(session, event_type, lead):
+    """
+    Publish a lead event once the caller's transaction commits.
+
+    On PostgreSQL the event is sent with pg_notify inside the transaction,
+    which the database only delivers on commit, to every worker listening
+    on the channel. Elsewhere it is handed to the in-process broker after
+    the session commits.
+    """
+    publish_lead_events(session, event_type, [lead])
+
+def publish_lead_events(session, event_type, leads):
+    """
+    Publish one event per lead, in a single statement on PostgreSQL.
+
+    ``leads`` may be Lead objects or rows with the same attributes.
+    """
+    session.flush()
+    _publish(session, [
+        json.dumps({"type": event_type, "lead": lead_payload(lead)}, separators=(",", ":"))
+        for lead in leads
+    ])
+
+def publish_lead_deleted(session, lead_id, merged_into=None):
+    """Publish the removal of a lead once the caller's transaction commits."""
+    _publish(session, [json.dumps(
+        {"type": LEAD_DELETED, "lead": {"id": lead_id, "merged_into": merged_into}},
+        separators=(",", ":")
+    )])
+
+def _publish(session, messages):
+    if not messages:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": LEAD_EVENTS_CHANNEL, "payloads": messages}
+        )
+    else:
+        session.info.setdefault("lead_events", []).extend(messages)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending_events(session):
+    for message in session.info.pop("lead_events", []):
+        broker.dispatch_threadsafe(message)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    session.info.pop("lead_events", None)
+
+class PostgresEventListener:
+    """
+    Thread that LISTENs on a notification channel and passes each payload on.
+
+    Every worker process runs one, so an event committed by any worker (or
+    by the Flask app) reaches the subscribers connected to all of them.
+
+    Args:
+        engine: SQLAlchemy engine for a PostgreSQL database
+        callback: Called with each payload; by default the lead event broker
+        channel: Channel to listen on
+    """
+
+    def __init__(self, engine, callback=None, channel=LEAD_EVENTS_CHANNEL):
+        self.engine = engine
+        self.callback = callback or broker.dispatch_threadsafe
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start listening; does nothing on databases other than PostgreSQL."""
+        if self._thread or self.engine.dialect.name != "postgresql":
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.channel}-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop listening and wait for the thread to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Listener error on {self.channel}: {str(e)}")
+                self._stop.wait(5)
+
+    def _listen(self):
+        conn = self.engine.raw_connection()
+        try:
+            dbapi_conn = conn.dbapi_connection
+            dbapi_conn.autocommit = True
+            with dbapi_conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            while not self._stop.is_set():
+                if select.select([dbapi_conn], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_conn.poll()
+                while dbapi_conn.notifies:
+                    notify = dbapi_conn.notifies.pop(0)
+                    self.callback(notify.payload)
+        finally:
+            # Never hand a LISTENing autocommit connection back to the pool
+            conn.invalidate()
@@ -0,0 +1,100 @@
+import io
+import os
+import csv
+
+from fast_json import dumps, plain
+from models import Lead
+from lead_queries import filter_leads
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_COLUMNS = (
+    Lead.id,
+    Lead.first_name,
+    Lead.last_name,
+    Lead.email,
+    Lead.state,
+    Lead.notes,
+    Lead.resume_path,
+    Lead.created_at,
+    Lead.updated_at,
+    Lead.updated_by,
+)
+
+_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+# Leading characters that make spreadsheets evaluate a cell as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_cell(value):
+    """
+    A column value as written to CSV. Text that a spreadsheet would run as a
+    formula (a prospect typing ``=HYPERLINK(...)`` as their name) is prefixed
+    with a quote so it is shown as text instead.
+    """
+    if value is None:
+        return ""
+    value = plain(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _csv_chunk(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(_FIELDS)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+    return buffer.getvalue()
+
+def _ndjson_chunk(rows):
+    return b"".join(dumps(dict(zip(_FIELDS, row))) + b"\n" for row in rows)
+
+def iter_export(session, fmt="csv", state=None, created_after=None, created_before=None,
+                batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield an export of the leads, one chunk per batch of rows.
+
+    CSV chunks are text; NDJSON chunks are bytes straight from the JSON
+    encoder (orjson when installed).
+
+    Rows are read as plain column tuples through a server-side cursor
+    (``yield_per``), so memory use stays constant however many leads match.
+    The session must stay open until the generator is exhausted.
+
+    Args:
+        session: The SQLAlchemy session
+        fmt: ``csv`` or ``ndjson``
+        state: Optional LeadState to export
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+        batch_size: Rows fetched per round trip
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    query = filter_leads(session.query(*EXPORT_COLUMNS), state, created_after, created_before)
+    query = query.order_by(Lead.id).yield_per(batch_size)
+
+    if fmt == "csv":
+        yield _csv_chunk([], header=True)
+
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield _csv_chunk(batch) if fmt == "csv" else _ndjson_chunk(batch)
+            batch = []
+    if batch:
+        yield _csv_chunk(batch) if fmt == "csv" else _ndjson_chunk(batch)
+
+def export_filename(fmt):
+    """Download name for an export in the given format."""
+    return f"leads.{fmt}"
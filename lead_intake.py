@@ -0,0 +1,81 @@
+from models import Lead, LeadResume, LeadState
+from resume_storage import register_blob
+from lead_cache import invalidate_leads
+from lead_counters import record_created
+from lead_events import publish_lead_event, LEAD_CREATED, LEAD_UPDATED
+from lead_merge import attach_resume, find_recent_lead, normalize_email
+from outbox import enqueue_lead_emails
+from resume_text import queue_extraction
+
+def create_lead(session, first_name, last_name, email, stored, submission_id=None, created_at=None):
+    """
+    Add a lead for an uploaded resume, along with everything a new lead
+    brings: counters, blob reference, text extraction, the created event,
+    cache invalidation and the confirmation emails.
+
+    Nothing is committed; all of it lands in the caller's transaction.
+
+    Args:
+        session: Database session
+        first_name: Prospect's first name
+        last_name: Prospect's last name
+        email: Prospect's email address
+        stored: StoredResume returned by store_stream
+        submission_id: Optional unique id of the submission, so replaying it is detectable
+        created_at: Optional submission time, when the lead is created later
+
+    Returns:
+        The new (pending) Lead
+    """
+    lead = Lead(
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        email_normalized=normalize_email(email),
+        resume_path=stored.key,
+        state=LeadState.PENDING,
+        submission_id=submission_id,
+        created_at=created_at
+    )
+    session.add(lead)
+    record_created(session, lead)
+    register_blob(session, stored)
+    queue_extraction(session, stored.key)
+    publish_lead_event(session, LEAD_CREATED, lead)
+    invalidate_leads(session)
+    # Emails are queued in the same transaction and sent by the outbox workers
+    enqueue_lead_emails(session, lead, stored.key)
+    return lead
+
+def add_submission(session, first_name, last_name, email, stored, submission_id=None, created_at=None):
+    """
+    Record a submission: as a new resume version of the applicant's lead if
+    the same email applied within the merge window, otherwise as a new lead.
+
+    A merged submission only confirms to the prospect; attorneys are not
+    notified again for an applicant they already have. Arguments are those
+    of ``create_lead``, and nothing is committed.
+
+    Returns:
+        The Lead the submission was recorded on
+    """
+    lead = find_recent_lead(session, email, created_at)
+    if lead is None:
+        return create_lead(session, first_name, last_name, email, stored, submission_id, created_at)
+
+    attach_resume(session, lead, stored.key, submission_id, created_at)
+    register_blob(session, stored)
+    queue_extraction(session, stored.key)
+    publish_lead_event(session, LEAD_UPDATED, lead)
+    invalidate_leads(session, lead.id)
+    enqueue_lead_emails(session, lead, stored.key, notify_attorney=False)
+    return lead
+
+def find_submission(session, submission_id):
+    """The lead a submission was recorded on, as a new lead or a resume version, or None."""
+    lead = session.query(Lead).filter(Lead.submission_id == submission_id).first()
+    if lead is None:
+        lead = session.query(Lead).join(
+            LeadResume, LeadResume.lead_id == Lead.id
+        ).filter(LeadResume.submission_id == submission_id).first()
+    return lead
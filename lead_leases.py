@@ -0,0 +1,147 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from models import Lead, LeadState
+from lead_cache import invalidate_leads
+from lead_changes import next_change_seq
+from lead_events import publish_lead_event, LEAD_UPDATED
+
+# Seconds a claimed lead stays with its attorney unless the lease is renewed
+LEAD_LEASE_SECONDS = int(os.environ.get('LEAD_LEASE_SECONDS', 900))
+# Candidates tried per claim where rows cannot be locked with SKIP LOCKED
+LEAD_CLAIM_CANDIDATES = 20
+
+_leads = Lead.__table__
+
+# SQLite has no row locks to skip. Claims from this process take turns on
+# this lock instead, and the conditional UPDATE keeps another process from
+# taking a lead that was leased in the meantime.
+_local_claim_lock = threading.Lock()
+
+def _claimable(now):
+    """Pending leads nobody holds an unexpired lease on."""
+    return and_(
+        _leads.c.state == LeadState.PENDING,
+        or_(_leads.c.lease_expires_at.is_(None), _leads.c.lease_expires_at <= now)
+    )
+
+def lease_holder(lead, now=None):
+    """Id of the user holding an unexpired lease on a lead, or None."""
+    if lead.lease_expires_at is None or lead.lease_expires_at <= (now or datetime.utcnow()):
+        return None
+    return lead.assigned_to
+
+def _stamp_change(session, lead_id):
+    """Put a lead written by a core UPDATE into the change feed, once the write succeeded."""
+    session.execute(
+        update(_leads)
+        .where(_leads.c.id == lead_id)
+        .values(change_seq=next_change_seq(session), updated_at=_leads.c.updated_at)
+    )
+
+def claim_next_lead(session, user_id, lease_seconds=LEAD_LEASE_SECONDS):
+    """
+    Lease the oldest pending lead nobody is working on to a user.
+
+    On PostgreSQL the lead is picked and leased by one UPDATE whose subquery
+    selects it ``FOR UPDATE SKIP LOCKED``, so concurrent claims each get a
+    different lead without waiting on one another. Elsewhere candidates are
+    leased with a conditional UPDATE, one at a time, until one succeeds.
+    The caller commits.
+
+    Args:
+        session: The SQLAlchemy session
+        user_id: Id of the attorney claiming a lead
+        lease_seconds: Length of the lease
+
+    Returns:
+        The claimed Lead, or None if no lead is available
+    """
+    now = datetime.utcnow()
+    values = {
+        "assigned_to": user_id,
+        "lease_expires_at": now + timedelta(seconds=lease_seconds),
+        "updated_at": now,
+    }
+    candidates = select(_leads.c.id).where(_claimable(now)).order_by(_leads.c.created_at, _leads.c.id)
+
+    if session.get_bind().dialect.name == "postgresql":
+        target = candidates.limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        lead_id = session.execute(
+            update(_leads).where(_leads.c.id == target).values(**values).returning(_leads.c.id)
+        ).scalar()
+    else:
+        lead_id = None
+        with _local_claim_lock:
+            for candidate in session.execute(candidates.limit(LEAD_CLAIM_CANDIDATES)).scalars().all():
+                claimed = session.execute(
+                    update(_leads).where(_leads.c.id == candidate, _claimable(now)).values(**values)
+                ).rowcount
+                if claimed:
+                    lead_id = candidate
+                    break
+
+    if lead_id is None:
+        return None
+    # Only now, so claims finding nothing never touch the change sequence
+    _stamp_change(session, lead_id)
+    lead = session.get(Lead, lead_id, populate_existing=True)
+    publish_lead_event(session, LEAD_UPDATED, lead)
+    invalidate_leads(session, lead_id)
+    return lead
+
+def renew_lease(session, lead_id, user_id, lease_seconds=LEAD_LEASE_SECONDS):
+    """
+    Extend a user's lease on a lead. The caller commits.
+
+    A lease that ran out can still be renewed as long as nobody else has
+    claimed the lead since.
+
+    Returns:
+        The Lead, or None if the user no longer holds it
+    """
+    renewed = session.execute(
+        update(_leads)
+        .where(
+            _leads.c.id == lead_id,
+            _leads.c.assigned_to == user_id,
+            _leads.c.state == LeadState.PENDING,
+            _leads.c.lease_expires_at.isnot(None)
+        )
+        # Renewals are heartbeats, not edits, so updated_at is left alone
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds), updated_at=_leads.c.updated_at)
+    ).rowcount
+    if not renewed:
+        return None
+    # The new expiry is part of the lead, so change feed readers and caches must see it
+    _stamp_change(session, lead_id)
+    lead = session.get(Lead, lead_id, populate_existing=True)
+    publish_lead_event(session, LEAD_UPDATED, lead)
+    invalidate_leads(session, lead_id)
+    return lead
+
+def release_lease(session, lead_id, user_id):
+    """
+    Hand a claimed lead back to the queue. The caller commits.
+
+    Returns:
+        True if the user held the lead
+    """
+    released = session.execute(
+        update(_leads)
+        .where(_leads.c.id == lead_id, _leads.c.assigned_to == user_id, _leads.c.lease_expires_at.isnot(None))
+        .values(assigned_to=None, lease_expires_at=None, updated_at=datetime.utcnow())
+    ).rowcount
+    if not released:
+        return False
+    _stamp_change(session, lead_id)
+    publish_lead_event(session, LEAD_UPDATED, session.get(Lead, lead_id, populate_existing=True))
+    invalidate_leads(session, lead_id)
+    return True
+
+def end_lease(lead):
+    """End the lease on a lead that is leaving the queue; assigned_to keeps who worked it."""
+    lead.lease_expires_at = None
@@ -0,0 +1,217 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import Lead, LeadResume, LeadState, LeadTombstone, EmailOutbox, IdempotencyKey
+from lead_cache import invalidate_leads
+from lead_counters import increment, record_transition
+from lead_events import publish_lead_event, publish_lead_deleted, LEAD_UPDATED
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A submission from an email address that applied within this many days is
+# merged into that lead as a new resume version; 0 turns merging off
+LEAD_MERGE_WINDOW_DAYS = float(os.environ.get('LEAD_MERGE_WINDOW_DAYS', 30))
+
+# How far a lead has progressed; a merged lead keeps the furthest state
+_STATE_ORDER = {LeadState.PENDING: 0, LeadState.REACHED_OUT: 1}
+
+def normalize_email(email):
+    """Form of an email address under which repeat applications are recognised."""
+    return (email or "").strip().lower()
+
+def merge_window(days=LEAD_MERGE_WINDOW_DAYS):
+    """The merge window as a timedelta, or None if merging is off."""
+    return timedelta(days=days) if days and days > 0 else None
+
+def find_recent_lead(session, email, submitted_at=None, window=None):
+    """
+    Latest lead of the same applicant created within the merge window.
+
+    Served by the (email_normalized, created_at) index. The lead is locked
+    until the caller's transaction ends, so concurrent submissions from one
+    applicant add their versions one at a time.
+
+    Returns:
+        The Lead, or None if there is none or merging is off
+    """
+    window = window or merge_window()
+    if window is None:
+        return None
+    submitted_at = submitted_at or datetime.utcnow()
+    return session.query(Lead).filter(
+        Lead.email_normalized == normalize_email(email),
+        Lead.created_at >= submitted_at - window
+    ).order_by(Lead.created_at.desc()).with_for_update().first()
+
+def resume_versions(session, lead_id):
+    """A lead's resume versions, oldest first; empty if the applicant submitted only once."""
+    return session.query(LeadResume).filter(
+        LeadResume.lead_id == lead_id
+    ).order_by(LeadResume.version).all()
+
+def _versions(session, lead):
+    """Resume versions of a lead, creating version 1 from its resume_path if it has none yet."""
+    versions = resume_versions(session, lead.id)
+    if not versions:
+        versions = [LeadResume(
+            lead_id=lead.id,
+            version=1,
+            resume_path=lead.resume_path,
+            submission_id=lead.submission_id,
+            created_at=lead.created_at
+        )]
+        session.add(versions[0])
+    return versions
+
+def attach_resume(session, lead, resume_path, submission_id=None, created_at=None):
+    """
+    Add a resume as the latest version of a lead, in the caller's transaction.
+
+    The lead's resume_path is left alone. Submissions are anonymous, so a
+    repeat one only adds a version for attorneys to review; it never
+    replaces the resume they have been working from.
+
+    Returns:
+        The new LeadResume
+    """
+    version = LeadResume(
+        lead_id=lead.id,
+        version=_versions(session, lead)[-1].version + 1,
+        resume_path=resume_path,
+        submission_id=submission_id,
+        created_at=created_at or datetime.utcnow()
+    )
+    session.add(version)
+    lead.updated_at = datetime.utcnow()
+    return version
+
+def backfill_normalized_emails(session, batch_size=1000):
+    """
+    Fill email_normalized for leads created before it existed.
+
+    Returns:
+        Number of leads updated
+    """
+    updated = 0
+    while True:
+        ids = [
+            row.id for row in session.query(Lead.id)
+            .filter(Lead.email_normalized.is_(None))
+            .limit(batch_size)
+        ]
+        if not ids:
+            return updated
+        session.query(Lead).filter(Lead.id.in_(ids)).update(
+            # updated_at is kept; filling a derived column is not an edit
+            {Lead.email_normalized: func.lower(func.trim(Lead.email)), Lead.updated_at: Lead.updated_at},
+            synchronize_session=False
+        )
+        session.commit()
+        updated += len(ids)
+
+def _merge_into(session, survivor, duplicate):
+    """
+    Fold a newer duplicate lead into the lead kept for its applicant, then
+    delete it, leaving a tombstone for the change feed.
+    """
+    next_version = _versions(session, survivor)[-1].version + 1
+    moved = session.query(LeadResume).filter(
+        LeadResume.lead_id == duplicate.id
+    ).order_by(LeadResume.version).all()
+    if not moved:
+        moved = [LeadResume(resume_path=duplicate.resume_path, created_at=duplicate.created_at)]
+        session.add(moved[0])
+    if duplicate.submission_id and moved[0].submission_id is None and not any(
+        version.submission_id == duplicate.submission_id for version in moved
+    ):
+        # find_submission must still map the duplicate's submission to a
+        # lead once the duplicate is gone; its first version is that submission
+        moved[0].submission_id = duplicate.submission_id
+    for version in moved:
+        version.lead_id = survivor.id
+        version.version = next_version
+        next_version += 1
+
+    if _STATE_ORDER.get(duplicate.state, 0) > _STATE_ORDER.get(survivor.state, 0):
+        record_transition(session, survivor.state, duplicate.state)
+        survivor.state = duplicate.state
+    increment(session, duplicate.state or LeadState.PENDING, -1)
+    if duplicate.notes:
+        survivor.notes = f"{survivor.notes}\n\n{duplicate.notes}" if survivor.notes else duplicate.notes
+    survivor.updated_at = datetime.utcnow()
+
+    session.query(EmailOutbox).filter(EmailOutbox.lead_id == duplicate.id).update(
+        {EmailOutbox.lead_id: survivor.id}, synchronize_session=False
+    )
+    session.query(IdempotencyKey).filter(IdempotencyKey.lead_id == duplicate.id).update(
+        {IdempotencyKey.lead_id: survivor.id}, synchronize_session=False
+    )
+    # Nothing may reference the duplicate any more when it is deleted
+    session.flush()
+    session.delete(duplicate)
+    session.add(LeadTombstone(lead_id=duplicate.id, merged_into=survivor.id))
+    publish_lead_deleted(session, duplicate.id, survivor.id)
+
+def merge_duplicates(session, window=None, dry_run=False):
+    """
+    Merge leads already in the table that the live merge would have joined.
+
+    Leads of one applicant are taken oldest first; each is folded into the
+    lead kept for the applicant if it was created within the window after
+    that lead, and otherwise starts a new one. Every applicant is committed
+    separately.
+
+    Args:
+        session: Database session
+        window: Merge window, LEAD_MERGE_WINDOW_DAYS by default
+        dry_run: Only count what would be merged
+
+    Returns:
+        Tuple of (applicants merged, leads removed)
+    """
+    window = window or merge_window()
+    if window is None:
+        return 0, 0
+    backfill_normalized_emails(session)
+
+    duplicated = [
+        row.email_normalized for row in session.query(Lead.email_normalized)
+        .filter(Lead.email_normalized.isnot(None))
+        .group_by(Lead.email_normalized)
+        .having(func.count(Lead.id) > 1)
+    ]
+    applicants = 0
+    removed = 0
+    for email in duplicated:
+        leads = session.query(Lead).filter(
+            Lead.email_normalized == email
+        ).order_by(Lead.created_at, Lead.id).with_for_update().all()
+        survivor = leads[0]
+        survivors = []
+        merged = []
+        for lead in leads[1:]:
+            if lead.created_at - survivor.created_at <= window:
+                if not dry_run:
+                    _merge_into(session, survivor, lead)
+                if survivor not in survivors:
+                    survivors.append(survivor)
+                merged.append(lead.id)
+            else:
+                survivor = lead
+        if not merged or dry_run:
+            session.rollback()
+        else:
+            for lead in survivors:
+                publish_lead_event(session, LEAD_UPDATED, lead)
+            invalidate_leads(session, *(lead.id for lead in survivors), *merged)
+            session.commit()
+            logger.info(f"Merged duplicate leads {merged} of {email}")
+        if not merged:
+            continue
+        applicants += 1
+        removed += len(merged)
+    return applicants, removed
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload, load_only, raiseload
+
+from models import Lead, LeadState, User
+
+# Columns a list request may select
+LEAD_FIELDS = (
+    "id", "first_name", "last_name", "email", "resume_path", "state",
+    "notes", "created_at", "updated_at", "updated_by", "assigned_to", "lease_expires_at",
+)
+# Lists leave the unbounded notes out unless they are asked for
+DEFAULT_LIST_FIELDS = tuple(field for field in LEAD_FIELDS if field != "notes")
+# Relationships a list request may ask to have loaded
+LEAD_INCLUDES = ("user",)
+
+# Always loaded: keyset pagination builds its cursor from them
+_KEY_FIELDS = ("id", "created_at")
+
+def parse_state(value):
+    """Parse a LeadState name from a query string; empty values mean no filter."""
+    if not value:
+        return None
+    try:
+        return LeadState[value]
+    except KeyError:
+        raise ValueError(f"Unknown lead state: {value}")
+
+def parse_datetime(value):
+    """Parse an ISO 8601 date or datetime from a query string; empty values mean no filter."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+def filter_leads(query, state=None, created_after=None, created_before=None):
+    """
+    Restrict a lead query by state and creation time.
+
+    Filtering by state is served by the ix_leads_state_created_at_id index,
+    which also keeps the newest-first keyset ordering index-only.
+
+    Args:
+        query: Query over Lead
+        state: Optional LeadState to match
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+    """
+    if state is not None:
+        query = query.filter(Lead.state == state)
+    if created_after is not None:
+        query = query.filter(Lead.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Lead.created_at < created_before)
+    return query
+
+def parse_fields(value):
+    """Parse a comma-separated field selection; empty values mean the default list fields."""
+    if not value:
+        return DEFAULT_LIST_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in LEAD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown lead fields: {', '.join(unknown)}")
+    return fields or DEFAULT_LIST_FIELDS
+
+def parse_include(value):
+    """Parse a comma-separated list of relationships to load."""
+    if not value:
+        return ()
+    include = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in include if name not in LEAD_INCLUDES]
+    if unknown:
+        raise ValueError(f"Unknown lead relationships: {', '.join(unknown)}")
+    return include
+
+def projection_options(fields=DEFAULT_LIST_FIELDS, include=()):
+    """
+    Loader options that load only the selected columns of each lead.
+
+    Relationships are joined in when named in ``include`` and otherwise
+    refuse to load, so a list can never fall into one query per row.
+
+    Args:
+        fields: Names of the Lead columns to load
+        include: Names of the relationships to load
+    """
+    columns = [getattr(Lead, field) for field in dict.fromkeys(_KEY_FIELDS + tuple(fields))]
+    options = [load_only(*columns)]
+    if "user" in include:
+        options.append(joinedload(Lead.user).load_only(User.id, User.email, User.full_name))
+    else:
+        options.append(raiseload(Lead.user))
+    return options
+
+def project_leads(query, fields=DEFAULT_LIST_FIELDS, include=()):
+    """Restrict a lead query to the selected columns and relationships."""
+    return query.options(*projection_options(fields, include))
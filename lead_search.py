@@ -0,0 +1,218 @@
+import os
+import re
+from collections import namedtuple
+
+from sqlalchemy import DateTime, bindparam, or_, select, text
+
+from models import Lead, LeadResume, ResumeText
+from lead_queries import filter_leads
+
+MAX_SEARCH_RESULTS = 100
+# Matches ranked per PostgreSQL search; past this, further matches are left out
+MAX_SEARCH_CANDIDATES = int(os.environ.get('MAX_SEARCH_CANDIDATES', 1000))
+
+_TOKEN_RE = re.compile(r"[\w@.+-]+", re.UNICODE)
+
+# Leads owning the matched resumes (a CTE named "candidates" with resume_key
+# and rank): by their current resume, or by any earlier version of it
+_RESUME_OWNERS = """
+    keyed AS (
+        SELECT leads.id AS lead_id, candidates.rank
+        FROM candidates JOIN leads ON leads.resume_path = candidates.resume_key
+        UNION ALL
+        SELECT lead_resumes.lead_id, candidates.rank
+        FROM candidates JOIN lead_resumes ON lead_resumes.resume_path = candidates.resume_key
+    )
+"""
+
+# Restrictions applied to the leads of a search: state and creation time bounds
+_SearchFilters = namedtuple("_SearchFilters", "state created_after created_before")
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query.lower())
+
+def _filter_conditions(filters):
+    """
+    SQL conditions on ``leads`` for the filters, and their bind parameters.
+
+    The bounds are bound as DateTime so SQLite compares them in the format
+    the column is stored in.
+    """
+    conditions, params = [], []
+    if filters.state is not None:
+        conditions.append("leads.state = :state")
+        params.append(bindparam("state", filters.state.name))
+    if filters.created_after is not None:
+        conditions.append("leads.created_at >= :created_after")
+        params.append(bindparam("created_after", filters.created_after, type_=DateTime))
+    if filters.created_before is not None:
+        conditions.append("leads.created_at < :created_before")
+        params.append(bindparam("created_before", filters.created_before, type_=DateTime))
+    return conditions, params
+
+def _postgres_ids(session, query, filters, limit, offset):
+    # Rank a bounded set of candidates, each branch served by its own index:
+    # word matches by the tsvector GIN index, prefix and fuzzy email matches
+    # by the trigram index.
+    conditions, bound = _filter_conditions(filters)
+    lead_filter = "".join(" AND " + condition for condition in conditions)
+    sql = f"""
+        WITH q AS (
+            SELECT websearch_to_tsquery('simple', :raw) || websearch_to_tsquery('english', :raw) AS q
+        ),
+        candidates AS (
+            (SELECT leads.id FROM leads, q WHERE search_vector @@ q.q{lead_filter} LIMIT :candidates)
+            UNION
+            (SELECT leads.id FROM leads
+             WHERE (lower(email) LIKE :prefix OR lower(email) % :raw){lead_filter}
+             LIMIT :candidates)
+        )
+        SELECT leads.id,
+               ts_rank_cd(leads.search_vector, q.q) + similarity(lower(leads.email), :raw) AS rank
+        FROM candidates JOIN leads ON leads.id = candidates.id, q
+        ORDER BY rank DESC, leads.id DESC LIMIT :limit OFFSET :offset
+    """
+    params = {
+        "raw": query.lower(),
+        "prefix": _escape_like(query.lower()) + "%",
+        "candidates": MAX_SEARCH_CANDIDATES,
+        "limit": limit,
+        "offset": offset,
+    }
+    return [row.id for row in session.execute(text(sql).bindparams(*bound), params)]
+
+def _sqlite_ids(session, query, filters, limit, offset):
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    # Quote every token so FTS5 operators in user input are taken literally,
+    # and make each one a prefix match.
+    match = " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+    sql = """
+        SELECT leads.id AS id
+        FROM leads_fts JOIN leads ON leads.id = leads_fts.rowid
+        WHERE leads_fts MATCH :match
+    """
+    conditions, bound = _filter_conditions(filters)
+    sql += "".join(" AND " + condition for condition in conditions)
+    sql += " ORDER BY bm25(leads_fts), leads.id DESC LIMIT :limit OFFSET :offset"
+    params = {"match": match, "limit": limit, "offset": offset}
+    return [row.id for row in session.execute(text(sql).bindparams(*bound), params)]
+
+def _postgres_resume_ids(session, query, filters, limit, offset):
+    sql = f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', :raw) AS q),
+        candidates AS (
+            SELECT resume_texts.resume_key, ts_rank_cd(resume_texts.search_vector, q.q) AS rank
+            FROM resume_texts, q
+            WHERE resume_texts.search_vector @@ q.q LIMIT :candidates
+        ),
+        {_RESUME_OWNERS}
+        SELECT leads.id AS id, max(keyed.rank) AS rank
+        FROM keyed JOIN leads ON leads.id = keyed.lead_id
+    """
+    conditions, bound = _filter_conditions(filters)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " GROUP BY leads.id ORDER BY rank DESC, leads.id DESC LIMIT :limit OFFSET :offset"
+    params = {"raw": query, "candidates": MAX_SEARCH_CANDIDATES, "limit": limit, "offset": offset}
+    return [row.id for row in session.execute(text(sql).bindparams(*bound), params)]
+
+def _sqlite_resume_ids(session, query, filters, limit, offset):
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    match = " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+    sql = f"""
+        WITH candidates AS (
+            SELECT resume_texts.resume_key, bm25(resume_texts_fts) AS rank
+            FROM resume_texts_fts JOIN resume_texts ON resume_texts.id = resume_texts_fts.rowid
+            WHERE resume_texts_fts MATCH :match
+        ),
+        {_RESUME_OWNERS}
+        SELECT leads.id AS id, min(keyed.rank) AS rank
+        FROM keyed JOIN leads ON leads.id = keyed.lead_id
+    """
+    conditions, bound = _filter_conditions(filters)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " GROUP BY leads.id ORDER BY rank, leads.id DESC LIMIT :limit OFFSET :offset"
+    params = {"match": match, "limit": limit, "offset": offset}
+    return [row.id for row in session.execute(text(sql).bindparams(*bound), params)]
+
+def _fallback_resume_ids(session, query, filters, limit, offset):
+    conditions = [
+        ResumeText.text.ilike(f"%{_escape_like(token)}%", escape="\\")
+        for token in _tokens(query)
+    ]
+    if not conditions:
+        return []
+    matching = select(ResumeText.resume_key).where(*conditions)
+    q = session.query(Lead.id).filter(or_(
+        Lead.resume_path.in_(matching),
+        Lead.id.in_(select(LeadResume.lead_id).where(LeadResume.resume_path.in_(matching)))
+    ))
+    q = filter_leads(q, *filters)
+    return [row.id for row in q.order_by(Lead.id.desc()).limit(limit).offset(offset)]
+
+def _fallback_ids(session, query, filters, limit, offset):
+    conditions = []
+    for token in _tokens(query):
+        pattern = f"%{_escape_like(token)}%"
+        conditions.append(
+            Lead.first_name.ilike(pattern, escape="\\") |
+            Lead.last_name.ilike(pattern, escape="\\") |
+            Lead.email.ilike(pattern, escape="\\") |
+            Lead.notes.ilike(pattern, escape="\\")
+        )
+    if not conditions:
+        return []
+    q = session.query(Lead.id).filter(*conditions)
+    q = filter_leads(q, *filters)
+    return [row.id for row in q.order_by(Lead.id.desc()).limit(limit).offset(offset)]
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_leads(session, query, state=None, limit=50, offset=0, resumes=False, options=(),
+                 created_after=None, created_before=None):
+    """
+    Search leads by name, email and notes, best matches first.
+
+    Args:
+        session: The SQLAlchemy session
+        query: Free-text search string
+        state: Optional LeadState to restrict results to
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+        resumes: Search the extracted resume text instead of the lead fields
+        options: Loader options for the returned leads, e.g. from project_leads
+        limit: Maximum number of leads to return
+        offset: Number of ranked results to skip
+
+    Returns:
+        Tuple of (leads, offset of the next page or None)
+    """
+    query = (query or "").strip()
+    if not query:
+        return [], None
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        search = _postgres_resume_ids if resumes else _postgres_ids
+    elif dialect == "sqlite":
+        search = _sqlite_resume_ids if resumes else _sqlite_ids
+    else:
+        search = _fallback_resume_ids if resumes else _fallback_ids
+    filters = _SearchFilters(state, created_after, created_before)
+    ids = search(session, query, filters, limit + 1, offset)
+
+    next_offset = offset + limit if len(ids) > limit else None
+    ids = ids[:limit]
+    if not ids:
+        return [], None
+
+    # Load the rows, then restore the ranked order
+    by_id = {lead.id: lead for lead in session.query(Lead).options(*options).filter(Lead.id.in_(ids))}
+    return [by_id[lead_id] for lead_id in ids if lead_id in by_id], next_offset
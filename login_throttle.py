@@ -0,0 +1,155 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Threads hashing and verifying passwords; bcrypt releases the GIL, so
+# these run in parallel with each other and with the event loop.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+# Hashes allowed to wait for a thread before new ones are turned away
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+
+# Login attempts per minute, and the burst allowed, for one account and one client IP
+LOGIN_RATE_PER_ACCOUNT = float(os.environ.get('LOGIN_RATE_PER_ACCOUNT', 5))
+LOGIN_BURST_PER_ACCOUNT = int(os.environ.get('LOGIN_BURST_PER_ACCOUNT', 5))
+LOGIN_RATE_PER_IP = float(os.environ.get('LOGIN_RATE_PER_IP', 30))
+LOGIN_BURST_PER_IP = int(os.environ.get('LOGIN_BURST_PER_IP', 20))
+# Buckets kept per limiter; the least recently used are dropped first
+LOGIN_LIMITER_MAX_KEYS = int(os.environ.get('LOGIN_LIMITER_MAX_KEYS', 10000))
+# Reverse proxies in front of the apps that append to X-Forwarded-For; 0 trusts the header not at all
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+class ExecutorSaturated(Exception):
+    """Raised when the password executor's queue is full."""
+
+class BoundedExecutor:
+    """
+    Thread pool that rejects work instead of queueing it without limit.
+
+    Args:
+        workers: Number of threads
+        queue_size: Tasks allowed to wait for a free thread
+        name: Thread name prefix
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE, name="password-hash"):
+        self.capacity = workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._rejected = 0
+
+    def submit(self, func, *args):
+        """Submit a task, or raise ExecutorSaturated if the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            self._rejected += 1
+            raise ExecutorSaturated("Too many password checks in progress")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, func, *args):
+        """Run a task in the pool and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def stats(self):
+        return {"capacity": self.capacity, "rejected": self._rejected}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+class RateLimiter:
+    """
+    Token buckets keyed by e.g. account or client address.
+
+    Each key may make ``burst`` attempts at once, refilled at ``per_minute``.
+
+    Args:
+        per_minute: Refill rate in attempts per minute
+        burst: Bucket capacity
+        max_keys: Buckets kept before the least recently used is dropped
+    """
+
+    def __init__(self, per_minute, burst, max_keys=LOGIN_LIMITER_MAX_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Take one token from a key's bucket.
+
+        Returns:
+            0 if the attempt is allowed, otherwise seconds until it would be
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = math.ceil((1 - tokens) / self.rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+password_executor = BoundedExecutor()
+account_limiter = RateLimiter(LOGIN_RATE_PER_ACCOUNT, LOGIN_BURST_PER_ACCOUNT)
+ip_limiter = RateLimiter(LOGIN_RATE_PER_IP, LOGIN_BURST_PER_IP)
+
+def client_address(peer, forwarded_for, hops=TRUSTED_PROXY_HOPS):
+    """
+    Address a request came from, as the per-address login limit counts it.
+
+    Each of the ``hops`` trusted proxies appends the address it received the
+    request from to X-Forwarded-For, so the client is the ``hops``-th entry
+    from the right. Entries left of it come from the client itself and are
+    ignored, as is the whole header when no proxy is trusted; otherwise a
+    client could pick a new address for every attempt. This is what
+    werkzeug's ProxyFix does for the Flask app.
+
+    Args:
+        peer: Address of the connection's peer
+        forwarded_for: X-Forwarded-For values joined by commas, or None
+        hops: Number of trusted proxies
+
+    Returns:
+        The client address, or ``peer`` if the header has fewer entries than hops
+    """
+    if hops <= 0 or not forwarded_for:
+        return peer
+    addresses = [address.strip() for address in forwarded_for.split(",") if address.strip()]
+    if len(addresses) < hops:
+        return peer
+    return addresses[-hops]
+
+def login_retry_after(email, client_ip):
+    """
+    Charge a login attempt to its client IP and account.
+
+    Returns:
+        0 if the attempt may proceed, otherwise seconds the client should wait
+    """
+    wait = ip_limiter.acquire(client_ip or "unknown")
+    if wait:
+        logger.warning(f"Login attempts throttled for address {client_ip}")
+        return wait
+    wait = account_limiter.acquire((email or "").strip().lower())
+    if wait:
+        logger.warning(f"Login attempts throttled for account {email}")
+    return wait
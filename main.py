@@ -1,4 +1,7 @@
-from app import app
+from app import app, start_background_workers
+
+# Serving processes, including each Gunicorn worker, run the background workers
+start_background_workers()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, debug=True)
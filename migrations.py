@@ -0,0 +1,251 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import db
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+# Rows updated per statement when a migration backfills a column
+MIGRATION_BATCH_SIZE = 5000
+
+# Held on PostgreSQL while migrating, so workers starting together take turns
+_ADVISORY_LOCK_KEY = 7352841
+
+def _columns(conn, table):
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+def _add_column(conn, table, name, ddl):
+    """Add a column unless the table has it already."""
+    if name not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+def _is_unique(conn, table, column):
+    """Whether a unique constraint or unique index covers exactly this column."""
+    inspector = inspect(conn)
+    constraints = [c["column_names"] for c in inspector.get_unique_constraints(table)]
+    constraints += [i["column_names"] for i in inspector.get_indexes(table) if i["unique"]]
+    return [column] in constraints
+
+def _create_index(conn, name, table, columns, unique=False, using=None):
+    """
+    Create an index unless it exists. PostgreSQL builds it CONCURRENTLY, so
+    writes to the table carry on meanwhile; an invalid leftover of an
+    interrupted build is dropped and built again.
+    """
+    concurrently = ""
+    if conn.dialect.name == "postgresql":
+        concurrently = " CONCURRENTLY"
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_class JOIN pg_index ON pg_index.indexrelid = pg_class.oid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX{concurrently} IF NOT EXISTS {name} "
+        f"ON {table}{f' USING {using}' if using else ''} ({columns})"
+    ))
+
+def _backfill(conn, statement):
+    """Run a batched UPDATE until it matches no more rows; every batch commits on its own."""
+    updated = 0
+    while True:
+        count = conn.execute(text(statement), {"batch": MIGRATION_BATCH_SIZE}).rowcount
+        if not count:
+            return updated
+        updated += count
+
+def _lead_resume_path_index(conn):
+    # Counts the leads referencing a stored resume
+    _create_index(conn, "ix_leads_resume_path", "leads", "resume_path")
+
+def _lead_keyset_index(conn):
+    _create_index(conn, "ix_leads_created_at_id", "leads", "created_at, id")
+
+def _lead_state_index(conn):
+    _create_index(conn, "ix_leads_state_created_at_id", "leads", "state, created_at, id")
+
+def _lead_change_seq(conn):
+    # A constant default fills existing rows without rewriting the table
+    _add_column(conn, "leads", "change_seq", "BIGINT NOT NULL DEFAULT 0")
+    _create_index(conn, "ix_leads_change_seq", "leads", "change_seq")
+
+def _lead_submission_id(conn):
+    _add_column(conn, "leads", "submission_id", "VARCHAR(36)")
+    if not _is_unique(conn, "leads", "submission_id"):
+        _create_index(conn, "uq_leads_submission_id", "leads", "submission_id", unique=True)
+
+def _lead_email_normalized(conn):
+    _add_column(conn, "leads", "email_normalized", "VARCHAR(255)")
+    _backfill(conn, """
+        UPDATE leads SET email_normalized = lower(trim(email))
+        WHERE id IN (SELECT id FROM leads WHERE email_normalized IS NULL LIMIT :batch)
+    """)
+    _create_index(conn, "ix_leads_email_normalized_created_at", "leads", "email_normalized, created_at")
+
+def _lead_leases(conn):
+    _add_column(conn, "leads", "assigned_to", "INTEGER REFERENCES users (id)")
+    _add_column(conn, "leads", "lease_expires_at", "TIMESTAMP")
+
+# SQLite search: external-content FTS5 tables kept in sync by triggers
+_SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        first_name, last_name, email, notes,
+        content='leads', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_insert AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts(rowid, first_name, last_name, email, notes)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_delete AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, first_name, last_name, email, notes)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_update AFTER UPDATE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, first_name, last_name, email, notes)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.notes);
+        INSERT INTO leads_fts(rowid, first_name, last_name, email, notes)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.notes);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS resume_texts_fts USING fts5(
+        text, content='resume_texts', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resume_texts_fts_insert AFTER INSERT ON resume_texts BEGIN
+        INSERT INTO resume_texts_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resume_texts_fts_delete AFTER DELETE ON resume_texts BEGIN
+        INSERT INTO resume_texts_fts(resume_texts_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resume_texts_fts_update AFTER UPDATE OF text ON resume_texts BEGIN
+        INSERT INTO resume_texts_fts(resume_texts_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO resume_texts_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+def _search_index(conn):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        # Generated tsvector columns with GIN indexes for words, and a trigram
+        # index on the email for prefix and fuzzy matches. Adding a STORED
+        # column rewrites the table, which is why this runs here, once, with
+        # the timeouts lifted rather than at every start.
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("""
+            ALTER TABLE leads ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(email, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(notes, '')), 'B')
+            ) STORED
+        """))
+        _create_index(conn, "ix_leads_search_vector", "leads", "search_vector", using="GIN")
+        _create_index(conn, "ix_leads_email_trgm", "leads", "lower(email) gin_trgm_ops", using="GIN")
+        conn.execute(text("""
+            ALTER TABLE resume_texts ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED
+        """))
+        _create_index(conn, "ix_resume_texts_search_vector", "resume_texts", "search_vector", using="GIN")
+    elif dialect == "sqlite":
+        existing = {
+            row.name for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'"
+            ))
+        }
+        for statement in _SQLITE_SEARCH_DDL:
+            conn.execute(text(statement))
+        for table in ("leads_fts", "resume_texts_fts"):
+            if table not in existing:
+                conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    else:
+        logger.warning(f"No full-text index for {dialect}; search falls back to LIKE scans")
+
+# Applied in order, each once; every step must be safe to run again if it
+# was interrupted, and a no-op on tables create_all has just made.
+MIGRATIONS = [
+    ("0001_lead_resume_path_index", _lead_resume_path_index),
+    ("0002_lead_keyset_index", _lead_keyset_index),
+    ("0003_lead_state_index", _lead_state_index),
+    ("0004_lead_change_seq", _lead_change_seq),
+    ("0005_lead_submission_id", _lead_submission_id),
+    ("0006_lead_email_normalized", _lead_email_normalized),
+    ("0007_lead_leases", _lead_leases),
+    ("0008_search_index", _search_index),
+]
+
+def pending_migrations(conn):
+    """Names of the migrations not applied to the database yet."""
+    applied = {row.name for row in conn.execute(text(f"SELECT name FROM {MIGRATIONS_TABLE}"))}
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+def upgrade_schema(engine):
+    """
+    Create missing tables, then bring existing ones up to date with the models.
+
+    ``create_all`` never alters a table that exists, so columns and indexes
+    added since are applied here by the migrations in MIGRATIONS. Completed
+    ones are recorded in schema_migrations and skipped from then on.
+
+    Every statement commits on its own. On PostgreSQL the statement and
+    lock timeouts are lifted for the migration connection, indexes are
+    built concurrently, and an advisory lock keeps two processes from
+    migrating at once.
+
+    Returns:
+        Names of the migrations applied
+    """
+    db.metadata.create_all(engine)
+    applied = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        postgres = conn.dialect.name == "postgresql"
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (name VARCHAR(128) PRIMARY KEY, applied_at TIMESTAMP)"
+        ))
+        if postgres:
+            conn.execute(text("SET statement_timeout = 0"))
+            conn.execute(text("SET lock_timeout = 0"))
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        try:
+            # Read after taking the lock; another process may have just migrated
+            pending = pending_migrations(conn)
+            for name, migrate in MIGRATIONS:
+                if name not in pending:
+                    continue
+                logger.info(f"Applying schema migration {name}")
+                migrate(conn)
+                conn.execute(
+                    text(f"INSERT INTO {MIGRATIONS_TABLE} (name, applied_at) VALUES (:name, CURRENT_TIMESTAMP)"),
+                    {"name": name}
+                )
+                applied.append(name)
+        finally:
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+                conn.execute(text("RESET statement_timeout"))
+                conn.execute(text("RESET lock_timeout"))
+    return applied
+
+if __name__ == "__main__":
+    # For deployments running only the API: python migrations.py
+    from database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Applied migrations: {', '.join(upgrade_schema(engine)) or 'none'}")
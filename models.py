@@ -10,6 +10,13 @@ class LeadState(enum.Enum):
     PENDING = "PENDING"
     REACHED_OUT = "REACHED_OUT"
 
+class OutboxStatus(enum.Enum):
+    """Delivery states of a queued outbound email."""
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    SENT = "SENT"
+    DEAD = "DEAD"
+
 class User(UserMixin, db.Model):
     """User model for attorney authentication."""
     __tablename__ = "users"
@@ -32,16 +39,150 @@ class User(UserMixin, db.Model):
 class Lead(db.Model):
     """Lead model to store prospect information."""
     __tablename__ = "leads"
+    __table_args__ = (
+        # Serves newest-first keyset pagination
+        db.Index("ix_leads_created_at_id", "created_at", "id"),
+        # Serves the same pagination filtered by state
+        db.Index("ix_leads_state_created_at_id", "state", "created_at", "id"),
+        # Finds an applicant's recent leads when merging repeat submissions
+        db.Index("ix_leads_email_normalized_created_at", "email_normalized", "created_at"),
+    )
     
     id = db.Column(db.Integer, primary_key=True, index=True)
     first_name = db.Column(db.String(255), nullable=False)
     last_name = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(255), nullable=False, index=True)
-    resume_path = db.Column(db.String(255), nullable=False)
+    # Lowercased, trimmed email, to recognise the same applicant applying again
+    email_normalized = db.Column(db.String(255), nullable=True)
+    resume_path = db.Column(db.String(255), nullable=False, index=True)
     state = db.Column(db.Enum(LeadState), default=LeadState.PENDING)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     updated_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    # Position in the lead change feed, stamped on every insert and update
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    # Id of the form submission that created the lead; replaying a journaled
+    # submission checks it so the lead is never created twice
+    submission_id = db.Column(db.String(36), unique=True, nullable=True)
+    # Attorney who claimed the lead from the work queue, and until when they
+    # hold it; an expired lease puts a pending lead back in the queue
+    assigned_to = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    
+    user = db.relationship("User", foreign_keys=[updated_by])
+    assignee = db.relationship("User", foreign_keys=[assigned_to])
+
+class LeadResume(db.Model):
+    """
+    One version of a lead's resume. A lead gets versions once the same
+    applicant submits again; its resume_path stays version 1.
+    """
+    __tablename__ = "lead_resumes"
+    __table_args__ = (
+        db.UniqueConstraint("lead_id", "version", name="uq_lead_resumes_lead_id_version"),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey("leads.id"), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)
+    resume_path = db.Column(db.String(255), nullable=False, index=True)
+    # Submission that attached this version, for replays and repeated requests
+    submission_id = db.Column(db.String(36), unique=True, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LeadTombstone(db.Model):
+    """A lead removed by merging it into another, kept so the change feed can report the removal."""
+    __tablename__ = "lead_tombstones"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, nullable=False, index=True)
+    # Lead the removed one was folded into
+    merged_into = db.Column(db.Integer, nullable=True)
+    # Position in the lead change feed, like Lead.change_seq
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeSequence(db.Model):
+    """Named monotonic counter for databases without transaction ids (SQLite); incrementing it locks the row until commit."""
+    __tablename__ = "change_sequences"
+    
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class LeadCounter(db.Model):
+    """Number of leads in each state, maintained alongside every insert and state change."""
+    __tablename__ = "lead_counters"
+    
+    state = db.Column(db.Enum(LeadState), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+class ResumeBlob(db.Model):
+    """Content-addressed resume file, shared by every lead whose resume_path is its key."""
+    __tablename__ = "resume_blobs"
     
-    user = db.relationship("User", foreign_keys=[updated_by])
\ No newline at end of file
+    key = db.Column(db.String(255), primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExtractionStatus(enum.Enum):
+    """Progress of text extraction for a stored resume."""
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    UNSUPPORTED = "UNSUPPORTED"
+    FAILED = "FAILED"
+
+class ResumeText(db.Model):
+    """Plain text extracted from a stored resume, shared by every lead referencing it."""
+    __tablename__ = "resume_texts"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    resume_key = db.Column(db.String(255), unique=True, nullable=False)
+    status = db.Column(db.Enum(ExtractionStatus), default=ExtractionStatus.PENDING, nullable=False, index=True)
+    text = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    extracted_at = db.Column(db.DateTime, nullable=True)
+
+class EmailOutbox(db.Model):
+    """Outbound email written in the same transaction as the lead it belongs to."""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, index=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey("leads.id"), nullable=True, index=True)
+    
+    lead = db.relationship("Lead", foreign_keys=[lead_id])
+
+class IdempotencyKey(db.Model):
+    """Client-supplied key of a lead submission, and the lead it produced, kept for a short TTL."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Endpoint the key belongs to, so the form and the API can't collide
+    scope = db.Column(db.String(64), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # Hash of the request fields; reusing a key for a different request is refused
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # Set once the request has committed its lead; NULL while it is in progress
+    lead_id = db.Column(db.Integer, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
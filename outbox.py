@@ -0,0 +1,295 @@
+import os
+import json
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from models import EmailOutbox, OutboxStatus
+from email_service import send_prospect_confirmation_email, send_attorney_notification_email
+from resume_storage import resolve_path
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Outbox settings
+OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', 2))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 10))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_BASE_BACKOFF = float(os.environ.get('OUTBOX_BASE_BACKOFF', 5))
+OUTBOX_MAX_BACKOFF = float(os.environ.get('OUTBOX_MAX_BACKOFF', 3600))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 300))
+# Sent emails are kept this many days, then removed by purge_sent
+OUTBOX_SENT_RETENTION_DAYS = float(os.environ.get('OUTBOX_SENT_RETENTION_DAYS', 7))
+OUTBOX_PURGE_INTERVAL = float(os.environ.get('OUTBOX_PURGE_INTERVAL', 3600))
+
+PROSPECT_CONFIRMATION = "prospect_confirmation"
+ATTORNEY_NOTIFICATION = "attorney_notification"
+
+def _send_attorney_notification(first_name, last_name, prospect_email, resume_key=None, resume_path=None):
+    """
+    Resolve the resume's storage key only when the email is sent, so queued
+    rows survive a move of UPLOAD_DIRECTORY. Rows queued before keys were
+    stored carry an absolute ``resume_path`` instead.
+    """
+    if resume_key is not None:
+        resume_path = resolve_path(resume_key)
+    return send_attorney_notification_email(first_name, last_name, prospect_email, resume_path)
+
+_SENDERS = {
+    PROSPECT_CONFIRMATION: send_prospect_confirmation_email,
+    ATTORNEY_NOTIFICATION: _send_attorney_notification,
+}
+
+def enqueue_email(session, kind, lead=None, **kwargs):
+    """
+    Queue an email in the outbox.
+
+    The row is only added to the session, so it is committed in the same
+    transaction as whatever the caller is writing (normally the lead itself).
+
+    Args:
+        session: The SQLAlchemy session the caller will commit
+        kind: One of the registered email kinds
+        lead: Optional lead the email belongs to
+        **kwargs: Arguments passed to the sender when the email is delivered
+    """
+    if kind not in _SENDERS:
+        raise ValueError(f"Unknown email kind: {kind}")
+
+    message = EmailOutbox(
+        kind=kind,
+        payload=json.dumps(kwargs),
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        lead=lead
+    )
+    session.add(message)
+    return message
+
+def enqueue_lead_emails(session, lead, resume_key, notify_attorney=True):
+    """
+    Queue the prospect confirmation and attorney notification for a new lead.
+
+    The attorney email carries the resume's storage key, not its path.
+
+    ``notify_attorney=False`` only confirms to the prospect, e.g. when a
+    repeat submission was merged into their existing lead.
+    """
+    enqueue_email(
+        session,
+        PROSPECT_CONFIRMATION,
+        lead=lead,
+        prospect_email=lead.email,
+        first_name=lead.first_name,
+        last_name=lead.last_name
+    )
+    if not notify_attorney:
+        return
+    enqueue_email(
+        session,
+        ATTORNEY_NOTIFICATION,
+        lead=lead,
+        first_name=lead.first_name,
+        last_name=lead.last_name,
+        prospect_email=lead.email,
+        resume_key=resume_key
+    )
+
+def _backoff_seconds(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(OUTBOX_MAX_BACKOFF, OUTBOX_BASE_BACKOFF * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+def _claimable(now):
+    """Filter for messages that are due, or whose worker lease has expired."""
+    return or_(
+        and_(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == OutboxStatus.PROCESSING, EmailOutbox.locked_until < now)
+    )
+
+def claim_batch(session, limit=OUTBOX_BATCH_SIZE):
+    """
+    Lease up to ``limit`` due messages to the calling worker.
+
+    Each row is claimed with a conditional UPDATE so that concurrent workers,
+    in this process or another one, never deliver the same message twice.
+    """
+    now = datetime.utcnow()
+    candidate_ids = [
+        row.id for row in session.query(EmailOutbox.id)
+        .filter(_claimable(now))
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+    ]
+
+    claimed = []
+    for message_id in candidate_ids:
+        updated = session.query(EmailOutbox).filter(
+            EmailOutbox.id == message_id,
+            _claimable(now)
+        ).update(
+            {
+                EmailOutbox.status: OutboxStatus.PROCESSING,
+                EmailOutbox.locked_until: now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+            },
+            synchronize_session=False
+        )
+        if updated:
+            claimed.append(message_id)
+    session.commit()
+
+    if not claimed:
+        return []
+    return session.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed)).all()
+
+def deliver(session, message):
+    """Send a claimed message and record the outcome."""
+    message.attempts += 1
+    try:
+        sender = _SENDERS[message.kind]
+        sent = sender(**json.loads(message.payload))
+        error = None if sent else "Transport reported failure"
+    except Exception as e:
+        sent = False
+        error = str(e)
+
+    now = datetime.utcnow()
+    message.locked_until = None
+    if sent:
+        message.status = OutboxStatus.SENT
+        message.sent_at = now
+        message.last_error = None
+    elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+        message.status = OutboxStatus.DEAD
+        message.last_error = error
+        logger.error(f"Email {message.id} ({message.kind}) dead-lettered after {message.attempts} attempts: {error}")
+    else:
+        message.status = OutboxStatus.PENDING
+        message.next_attempt_at = now + timedelta(seconds=_backoff_seconds(message.attempts))
+        message.last_error = error
+        logger.warning(f"Email {message.id} ({message.kind}) failed on attempt {message.attempts}: {error}")
+    session.commit()
+    return sent
+
+def drain_once(session, limit=OUTBOX_BATCH_SIZE):
+    """Claim and deliver one batch of messages. Returns the number processed."""
+    messages = claim_batch(session, limit=limit)
+    for message in messages:
+        deliver(session, message)
+    return len(messages)
+
+def requeue_dead(session, message_ids=None):
+    """Move dead-lettered messages back to the queue for another round of attempts."""
+    query = session.query(EmailOutbox).filter(EmailOutbox.status == OutboxStatus.DEAD)
+    if message_ids is not None:
+        query = query.filter(EmailOutbox.id.in_(message_ids))
+    count = query.update(
+        {
+            EmailOutbox.status: OutboxStatus.PENDING,
+            EmailOutbox.attempts: 0,
+            EmailOutbox.next_attempt_at: datetime.utcnow(),
+        },
+        synchronize_session=False
+    )
+    session.commit()
+    return count
+
+def purge_sent(session, retention_days=OUTBOX_SENT_RETENTION_DAYS, batch_size=1000):
+    """
+    Delete emails sent more than ``retention_days`` ago.
+
+    Pending and dead-lettered messages are never purged.
+
+    Returns:
+        Number of messages deleted
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    purged = 0
+    while True:
+        ids = [
+            row.id for row in session.query(EmailOutbox.id)
+            .filter(EmailOutbox.status == OutboxStatus.SENT, EmailOutbox.sent_at < cutoff)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return purged
+        session.query(EmailOutbox).filter(EmailOutbox.id.in_(ids)).delete(synchronize_session=False)
+        session.commit()
+        purged += len(ids)
+
+class OutboxWorkerPool:
+    """
+    Pool of background threads that drain the email outbox.
+
+    Args:
+        session_factory: Callable returning a context manager that yields a session
+        workers: Number of worker threads
+        poll_interval: Seconds to sleep when the outbox is empty
+        purge_interval: Seconds between sweeps of old sent emails
+    """
+
+    def __init__(self, session_factory, workers=OUTBOX_WORKERS, poll_interval=OUTBOX_POLL_INTERVAL,
+                 purge_interval=OUTBOX_PURGE_INTERVAL):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._purge_lock = threading.Lock()
+        self._next_purge = datetime.utcnow()
+
+    def start(self):
+        """Start the worker threads."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} outbox workers")
+
+    def stop(self, timeout=10):
+        """Signal the workers to stop and wait for them to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """Drain the outbox synchronously on the calling thread."""
+        total = 0
+        with self.session_factory() as session:
+            while True:
+                processed = drain_once(session)
+                if not processed:
+                    return total
+                total += processed
+
+    def _purge_due(self):
+        """True for the one worker that should run the retention sweep now."""
+        with self._purge_lock:
+            now = datetime.utcnow()
+            if now < self._next_purge:
+                return False
+            self._next_purge = now + timedelta(seconds=self.purge_interval)
+            return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as session:
+                    if self._purge_due():
+                        purge_sent(session)
+                    processed = drain_once(session)
+            except Exception as e:
+                logger.error(f"Outbox worker error: {str(e)}")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
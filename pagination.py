@@ -0,0 +1,57 @@
+import os
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import Lead
+
+# Page size settings
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = 500
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+def encode_cursor(lead):
+    """Encode the (created_at, id) position of a lead as an opaque cursor."""
+    payload = json.dumps([lead.created_at.isoformat(), lead.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into (created_at, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(lead_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def keyset_page(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of leads, newest first, using keyset pagination.
+
+    Rows are ordered by (created_at, id) descending, which the
+    ix_leads_created_at_id index serves directly, and the page starts
+    strictly after the cursor position. Unlike OFFSET, the cost of a page
+    does not grow with how deep into the table it is.
+
+    Args:
+        query: Query over Lead, optionally already filtered
+        cursor: Cursor returned with the previous page, or None for the first page
+        limit: Maximum number of leads to return
+
+    Returns:
+        Tuple of (leads, cursor for the next page or None)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = query.order_by(Lead.created_at.desc(), Lead.id.desc())
+    if cursor:
+        created_at, lead_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Lead.created_at, Lead.id) < (created_at, lead_id))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
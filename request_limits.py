@@ -0,0 +1,83 @@
+import json
+
+class RequestTooLarge(Exception):
+    """Raised inside the app when a request body grows past the limit while it is read."""
+
+class RequestSizeLimit:
+    """
+    ASGI middleware refusing request bodies larger than ``max_body_size``.
+
+    FastAPI reads and spools a multipart body before the endpoint runs, so
+    a size check in the endpoint comes too late. A declared Content-Length
+    over the limit is answered with 413 before any of the body is read; a
+    body without one (chunked) is counted as it arrives and cut off once it
+    passes the limit.
+
+    Args:
+        app: The ASGI application to wrap
+        max_body_size: Largest accepted body in bytes
+    """
+
+    def __init__(self, app, max_body_size):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_size:
+                    return await self._reject(send)
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    exceeded = True
+                    raise RequestTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                if exceeded:
+                    # The app turned the cut-off body into an error of its own
+                    return await self._reject(send)
+            elif exceeded:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except RequestTooLarge:
+            if started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body exceeds {self.max_body_size} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,409 @@
+import os
+import re
+import mmap
+import time
+import hashlib
+import logging
+import mimetypes
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from models import Lead, LeadResume, ResumeBlob
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upload settings
+UPLOAD_DIRECTORY = os.path.abspath(os.environ.get('UPLOAD_DIRECTORY', 'uploads'))
+MAX_UPLOAD_SIZE = settings.MAX_UPLOAD_SIZE
+# Largest request body accepted, leaving room for the form fields around the resume
+MAX_REQUEST_SIZE = MAX_UPLOAD_SIZE + 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Browsers may reuse a downloaded resume for this long before revalidating with its ETag
+RESUME_CACHE_MAX_AGE = int(os.environ.get('RESUME_CACHE_MAX_AGE', 24 * 3600))
+
+# Files younger than this are never garbage-collected, so an upload whose
+# lead has not been committed yet is not removed from under it.
+RESUME_GC_GRACE_SECONDS = int(os.environ.get('RESUME_GC_GRACE_SECONDS', 3600))
+
+_TMP_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".tmp")
+_SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+_KEY_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+os.makedirs(_TMP_DIRECTORY, exist_ok=True)
+
+StoredResume = namedtuple("StoredResume", ["key", "sha256", "size", "deduplicated"])
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header lies outside the file."""
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+
+    def __init__(self, max_size):
+        super().__init__(f"File exceeds the maximum upload size of {max_size // (1024 * 1024)} MB")
+        self.max_size = max_size
+
+def stream_to_file(source, dest_path, max_size=MAX_UPLOAD_SIZE, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy a file-like object to disk in chunks, enforcing a size cap.
+
+    The data is written to a temporary file next to ``dest_path`` and renamed
+    into place only once the copy completes, so a rejected or interrupted
+    upload never leaves a partial file behind. The SHA-256 of the content is
+    computed during the same pass.
+
+    Args:
+        source: Readable binary file-like object
+        dest_path: Final path of the file
+        max_size: Maximum number of bytes accepted
+        chunk_size: Number of bytes read per iteration
+
+    Returns:
+        Tuple of (size in bytes, hex SHA-256 digest)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path) or ".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
+
+def key_for(sha256, ext):
+    """Storage key of a file: two levels of shard directories, then the digest."""
+    ext = ext.lower()
+    if not _EXT_RE.match(ext):
+        ext = ""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+def resolve_path(resume_path):
+    """
+    Absolute path of a stored resume.
+
+    Accepts content keys as well as the legacy flat names written before
+    content addressing (``name.pdf`` and ``uploads/name.pdf``).
+    """
+    if resume_path.startswith("uploads/"):
+        resume_path = resume_path[len("uploads/"):]
+    path = os.path.abspath(os.path.join(UPLOAD_DIRECTORY, resume_path))
+    if os.path.commonpath([path, UPLOAD_DIRECTORY]) != UPLOAD_DIRECTORY:
+        raise ValueError(f"Resume path escapes the upload directory: {resume_path}")
+    return path
+
+def store_stream(source, ext, max_size=MAX_UPLOAD_SIZE):
+    """
+    Store an upload under its SHA-256, reusing an existing copy of the same bytes.
+
+    Args:
+        source: Readable binary file-like object
+        ext: Original file extension, kept so the stored file has a usable type
+        max_size: Maximum number of bytes accepted
+
+    Returns:
+        StoredResume describing the stored file
+    """
+    tmp_path = os.path.join(_TMP_DIRECTORY, f"{os.getpid()}-{time.monotonic_ns()}.upload")
+    size, sha256 = stream_to_file(source, tmp_path, max_size)
+
+    key = key_for(sha256, ext)
+    final_path = resolve_path(key)
+    try:
+        # Refresh the mtime so the garbage collector's grace period restarts;
+        # this fails if there is no copy, or the collector just claimed it
+        os.utime(final_path)
+    except FileNotFoundError:
+        pass
+    else:
+        os.remove(tmp_path)
+        return StoredResume(key, sha256, size, True)
+
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return StoredResume(key, sha256, size, False)
+
+def register_blob(session, stored):
+    """
+    Record a stored file in the caller's transaction.
+
+    Leads reference the blob through ``Lead.resume_path``; the blob row only
+    carries the size used for the savings report. An existing row is locked
+    until the caller commits, so the garbage collector, which locks it
+    before its last reference check, sees the new reference.
+    """
+    if session.get(ResumeBlob, stored.key, with_for_update=True) is not None:
+        return
+    try:
+        with session.begin_nested():
+            session.add(ResumeBlob(key=stored.key, sha256=stored.sha256, size=stored.size))
+    except IntegrityError:
+        # Registered concurrently by another request
+        pass
+
+def reference_count(session, key):
+    """Number of leads referencing a stored file."""
+    return session.query(func.count(Lead.id)).filter(Lead.resume_path == key).scalar()
+
+def _is_referenced(session, key):
+    """Whether a lead or an earlier resume version references a stored file."""
+    return session.query(
+        session.query(Lead.id).filter(Lead.resume_path == key).exists() |
+        session.query(LeadResume.id).filter(LeadResume.resume_path == key).exists()
+    ).scalar()
+
+def _remove_orphan(session, key, path, cutoff):
+    """
+    Delete a stored file found unreferenced, unless it was reused meanwhile.
+
+    The file is first renamed out of the way, so a submission arriving from
+    now on stores its own copy instead of reusing this one. One that reused
+    it before has refreshed its mtime, and one that already recorded its
+    reference is seen by the check made under the blob row lock (which
+    ``register_blob`` takes too); either way the file is put back.
+
+    Returns:
+        Bytes freed, or None if the file was kept
+    """
+    claimed = path + ".gc"
+    try:
+        os.rename(path, claimed)
+    except OSError as e:
+        logger.error(f"Failed to remove orphaned resume {key}: {str(e)}")
+        return None
+
+    session.query(ResumeBlob).filter(ResumeBlob.key == key).with_for_update().one_or_none()
+    try:
+        if os.path.getmtime(claimed) > cutoff or _is_referenced(session, key):
+            os.replace(claimed, path)
+            session.rollback()
+            return None
+        size = os.path.getsize(claimed)
+        session.query(ResumeBlob).filter(ResumeBlob.key == key).delete(synchronize_session=False)
+        session.commit()
+    except Exception:
+        session.rollback()
+        os.replace(claimed, path)
+        raise
+    try:
+        os.remove(claimed)
+    except OSError as e:
+        # Left behind as a stored file of its own, collected on the next run
+        logger.error(f"Failed to remove orphaned resume {key}: {str(e)}")
+        return None
+    return size
+
+def _iter_stored_files():
+    """Yield (key, path) for every file in the shard directories."""
+    for first in os.listdir(UPLOAD_DIRECTORY):
+        if not _SHARD_RE.match(first):
+            continue
+        first_dir = os.path.join(UPLOAD_DIRECTORY, first)
+        for second in os.listdir(first_dir):
+            second_dir = os.path.join(first_dir, second)
+            if not _SHARD_RE.match(second) or not os.path.isdir(second_dir):
+                continue
+            for name in os.listdir(second_dir):
+                yield f"{first}/{second}/{name}", os.path.join(second_dir, name)
+
+def collect_garbage(session, grace_seconds=RESUME_GC_GRACE_SECONDS, batch_size=500):
+    """
+    Remove stored files that no lead references any more.
+
+    This covers uploads whose lead was never committed, e.g. after a failed
+    submission. Files younger than ``grace_seconds`` are skipped, as are
+    files whose submission is waiting in the journal.
+
+    Returns:
+        Tuple of (files removed, bytes freed)
+    """
+    # Imported here; the journal replays leads through modules that import this one
+    from submission_journal import submission_journal
+
+    cutoff = time.time() - grace_seconds
+    # Journaled submissions reference their resume before any lead does
+    journaled = submission_journal.resume_keys()
+    created_cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    removed = 0
+    freed = 0
+
+    def sweep(batch):
+        nonlocal removed, freed
+        keys = [key for key, _ in batch]
+        referenced = {
+            row.resume_path for row in
+            session.query(Lead.resume_path).filter(Lead.resume_path.in_(keys)).distinct()
+        }
+        # Earlier resume versions of merged applicants are kept too
+        referenced.update(
+            row.resume_path for row in
+            session.query(LeadResume.resume_path).filter(LeadResume.resume_path.in_(keys)).distinct()
+        )
+        session.rollback()
+        for key, path in batch:
+            if key in referenced or key in journaled:
+                continue
+            size = _remove_orphan(session, key, path, cutoff)
+            if size is not None:
+                removed += 1
+                freed += size
+
+    batch = []
+    for key, path in _iter_stored_files():
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        batch.append((key, path))
+        if len(batch) >= batch_size:
+            sweep(batch)
+            batch = []
+    if batch:
+        sweep(batch)
+
+    # Blob rows whose file is gone and that nothing references
+    unreferenced = session.query(ResumeBlob.key).outerjoin(
+        Lead, Lead.resume_path == ResumeBlob.key
+    ).outerjoin(
+        LeadResume, LeadResume.resume_path == ResumeBlob.key
+    ).filter(Lead.id.is_(None), LeadResume.id.is_(None), ResumeBlob.created_at < created_cutoff)
+    for row in unreferenced.all():
+        if not os.path.exists(resolve_path(row.key)):
+            session.query(ResumeBlob).filter(ResumeBlob.key == row.key).delete(synchronize_session=False)
+    session.commit()
+
+    logger.info(f"Resume GC removed {removed} files, freed {freed} bytes")
+    return removed, freed
+
+def storage_report(session):
+    """
+    Summarize how much disk space deduplication saves.
+
+    ``logical_bytes`` is what storing one copy per lead would take,
+    ``physical_bytes`` is what the content-addressed store actually uses.
+    """
+    physical_bytes, blobs = session.query(
+        func.coalesce(func.sum(ResumeBlob.size), 0),
+        func.count(ResumeBlob.key)
+    ).one()
+    logical_bytes, references = session.query(
+        func.coalesce(func.sum(ResumeBlob.size), 0),
+        func.count(Lead.id)
+    ).join(Lead, Lead.resume_path == ResumeBlob.key).one()
+    return {
+        "blobs": blobs,
+        "references": references,
+        "physical_bytes": int(physical_bytes),
+        "logical_bytes": int(logical_bytes),
+        "saved_bytes": int(logical_bytes) - int(physical_bytes),
+    }
+
+def migrate_legacy_files(session):
+    """
+    Move resumes stored under the old flat naming schemes into the content-addressed store.
+
+    Leads are repointed at the new key and the old file is removed once
+    the change is committed. Returns the number of leads migrated.
+    """
+    migrated = 0
+    legacy = session.query(Lead).filter(~Lead.resume_path.like("__/__/%")).all()
+    for lead in legacy:
+        old_path = resolve_path(lead.resume_path)
+        if not os.path.exists(old_path):
+            logger.warning(f"Resume for lead {lead.id} is missing: {lead.resume_path}")
+            continue
+        with open(old_path, "rb") as source:
+            stored = store_stream(source, os.path.splitext(old_path)[1], max_size=float("inf"))
+        register_blob(session, stored)
+        lead.resume_path = stored.key
+        session.commit()
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+        migrated += 1
+    logger.info(f"Migrated {migrated} legacy resumes to content-addressed storage")
+    return migrated
+
+def resume_etag(resume_path, path):
+    """
+    Strong entity tag (unquoted) for a stored resume.
+
+    Content-addressed files use their SHA-256; legacy files fall back to
+    size and modification time.
+    """
+    match = _KEY_RE.match(resume_path)
+    if match:
+        return match.group(1)
+    stat = os.stat(path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def resume_media_type(path):
+    """Content type of a stored resume, based on its extension."""
+    media_type, _ = mimetypes.guess_type(path)
+    return media_type or "application/octet-stream"
+
+def resume_download_name(lead, path):
+    """Human-friendly file name for a lead's resume."""
+    name = re.sub(r"[^A-Za-z0-9_-]+", "_", f"{lead.first_name}_{lead.last_name}_resume").strip("_")
+    return f"{name or 'resume'}{os.path.splitext(path)[1]}"
+
+def parse_range(range_header, size):
+    """
+    Parse a single-range ``Range`` header.
+
+    Returns an inclusive (start, end) tuple, or None when the whole file
+    should be sent (no header, or a form we do not serve such as multiple
+    ranges). Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+def iter_file_range(path, start, end, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Yield the inclusive byte range of a file from a read-only memory map."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = start
+        while position <= end:
+            stop = min(position + chunk_size, end + 1)
+            yield mm[position:stop]
+            position = stop
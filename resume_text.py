@@ -0,0 +1,304 @@
+import os
+import re
+import logging
+import zipfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.etree import ElementTree
+
+from pypdf import PdfReader
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+
+from models import Lead, ResumeText, ExtractionStatus
+from resume_storage import resolve_path
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Extraction settings
+RESUME_EXTRACT_PROCESSES = int(os.environ.get('RESUME_EXTRACT_PROCESSES', 1))
+RESUME_EXTRACT_BATCH_SIZE = int(os.environ.get('RESUME_EXTRACT_BATCH_SIZE', 8))
+RESUME_EXTRACT_POLL_INTERVAL = float(os.environ.get('RESUME_EXTRACT_POLL_INTERVAL', 5))
+RESUME_EXTRACT_LEASE_SECONDS = 600
+# Seconds to wait for one resume's text before marking it failed
+RESUME_EXTRACT_TIMEOUT = float(os.environ.get('RESUME_EXTRACT_TIMEOUT', 120))
+MAX_RESUME_TEXT_LENGTH = 200000
+
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+class UnsupportedResumeType(Exception):
+    """Raised when no extractor exists for a resume's file type."""
+
+def _extract_txt(path):
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8", errors="replace")
+
+def _extract_docx(path):
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_DOCX_NS}p"):
+        paragraphs.append("".join(node.text or "" for node in paragraph.iter(f"{_DOCX_NS}t")))
+    return "\n".join(paragraphs)
+
+def _extract_pdf(path):
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+_EXTRACTORS = {
+    ".txt": _extract_txt,
+    ".docx": _extract_docx,
+    ".pdf": _extract_pdf,
+}
+
+def extract_text(path):
+    """
+    Extract plain text from a resume file.
+
+    Runs in the extraction process pool, so it must stay a module-level
+    function without database access.
+    """
+    extractor = _EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        raise UnsupportedResumeType(f"No text extractor for {os.path.basename(path)}")
+    # PostgreSQL text cannot hold NUL characters
+    text = _WHITESPACE_RE.sub(" ", extractor(path).replace("\x00", "")).strip()
+    return text[:MAX_RESUME_TEXT_LENGTH]
+
+class ExtractionPool:
+    """
+    Process pool running the extractions, replaceable as a whole.
+
+    A running extraction cannot be cancelled. When one overruns its
+    timeout, ``recycle`` terminates the pool's processes and starts a
+    fresh pool; otherwise the stuck process would keep its worker, and
+    with the default single process every later extraction would wait
+    behind it.
+
+    Args:
+        processes: Number of extraction processes
+    """
+
+    def __init__(self, processes=RESUME_EXTRACT_PROCESSES):
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def recycle(self):
+        """Terminate the current processes, failing their futures, and continue with new ones."""
+        executor, self._executor = self._executor, ProcessPoolExecutor(max_workers=self.processes)
+        _terminate(executor)
+
+    def shutdown(self):
+        _terminate(self._executor)
+
+def _terminate(executor):
+    # ProcessPoolExecutor only gained terminate_workers() in Python 3.14
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def queue_extraction(session, resume_key):
+    """Queue text extraction for a stored resume in the caller's transaction."""
+    if session.query(ResumeText.id).filter(ResumeText.resume_key == resume_key).first():
+        return
+    try:
+        with session.begin_nested():
+            session.add(ResumeText(resume_key=resume_key, status=ExtractionStatus.PENDING))
+    except IntegrityError:
+        # Queued concurrently by another request
+        pass
+
+def backfill_extraction(session, batch_size=1000):
+    """Queue extraction for every lead resume that has never been processed."""
+    queued = 0
+    while True:
+        missing = [
+            row.resume_path for row in
+            session.query(Lead.resume_path)
+            .outerjoin(ResumeText, ResumeText.resume_key == Lead.resume_path)
+            .filter(ResumeText.id.is_(None))
+            .distinct()
+            .limit(batch_size)
+        ]
+        if not missing:
+            break
+        for resume_key in missing:
+            queue_extraction(session, resume_key)
+        session.commit()
+        queued += len(missing)
+    logger.info(f"Queued {queued} resumes for text extraction")
+    return queued
+
+def _claim_batch(session, limit):
+    now = datetime.utcnow()
+    claimable = or_(
+        ResumeText.status == ExtractionStatus.PENDING,
+        and_(
+            ResumeText.status == ExtractionStatus.PROCESSING,
+            ResumeText.claimed_at < now - timedelta(seconds=RESUME_EXTRACT_LEASE_SECONDS)
+        )
+    )
+    candidate_ids = [row.id for row in session.query(ResumeText.id).filter(claimable).limit(limit)]
+    claimed = []
+    for text_id in candidate_ids:
+        updated = session.query(ResumeText).filter(ResumeText.id == text_id, claimable).update(
+            {ResumeText.status: ExtractionStatus.PROCESSING, ResumeText.claimed_at: now},
+            synchronize_session=False
+        )
+        if updated:
+            claimed.append(text_id)
+    session.commit()
+    if not claimed:
+        return []
+    return session.query(ResumeText).filter(ResumeText.id.in_(claimed)).all()
+
+def _store_result(session, row):
+    """
+    Commit one extraction result. If the database refuses it, the row is
+    marked FAILED instead, so it is not claimed again and again.
+    """
+    text_id = row.id
+    try:
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Could not store extracted text for resume text {text_id}: {str(e)}")
+        session.query(ResumeText).filter(ResumeText.id == text_id).update({
+            ResumeText.status: ExtractionStatus.FAILED,
+            ResumeText.text: None,
+            ResumeText.error: str(e)[:1000],
+            ResumeText.extracted_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        session.commit()
+
+def process_batch(session, pool, limit=RESUME_EXTRACT_BATCH_SIZE, timeout=RESUME_EXTRACT_TIMEOUT):
+    """
+    Claim pending resumes, extract them in an ExtractionPool and store the text.
+
+    Every result is committed on its own, so one bad row neither holds back
+    nor undoes the rest of the batch. A resume taking longer than
+    ``timeout`` is marked failed and the pool is recycled; the batch's
+    unfinished extractions die with it and go back to pending.
+    """
+    rows = _claim_batch(session, limit)
+    futures = []
+    for row in rows:
+        try:
+            path = resolve_path(row.resume_key)
+        except ValueError as e:
+            futures.append((row, None, e))
+            continue
+        futures.append((row, pool.submit(extract_text, path), None))
+
+    recycled = False
+    for row, future, error in futures:
+        try:
+            if error is not None:
+                raise error
+            row.text = future.result(timeout=timeout)
+            row.status = ExtractionStatus.DONE
+            row.error = None
+        except UnsupportedResumeType as e:
+            row.status = ExtractionStatus.UNSUPPORTED
+            row.error = str(e)
+        except TimeoutError:
+            # A running extraction cannot be interrupted, so its processes are replaced
+            pool.recycle()
+            recycled = True
+            row.status = ExtractionStatus.FAILED
+            row.error = f"Extraction took longer than {timeout:g} seconds"
+            logger.error(f"Text extraction timed out for {row.resume_key}; extraction processes restarted")
+        except (BrokenProcessPool, CancelledError):
+            if recycled:
+                # Lost with the recycled pool, not at fault; try again later
+                row.status = ExtractionStatus.PENDING
+                row.claimed_at = None
+                _store_result(session, row)
+                continue
+            # A process died, most likely on the file it was working on
+            pool.recycle()
+            recycled = True
+            row.status = ExtractionStatus.FAILED
+            row.error = "Extraction process exited unexpectedly"
+            logger.error(f"Text extraction process died on {row.resume_key}; extraction processes restarted")
+        except Exception as e:
+            row.status = ExtractionStatus.FAILED
+            row.error = str(e)
+            logger.error(f"Text extraction failed for {row.resume_key}: {str(e)}")
+        row.extracted_at = datetime.utcnow()
+        _store_result(session, row)
+    return len(rows)
+
+class ResumeTextExtractor:
+    """
+    Background pipeline stage that extracts resume text in a process pool.
+
+    A dispatcher thread claims pending rows and hands the CPU-heavy parsing to
+    worker processes, keeping it out of the request workers.
+
+    Args:
+        session_factory: Callable returning a context manager that yields a session
+        processes: Number of extraction processes
+        poll_interval: Seconds to sleep when nothing is pending
+    """
+
+    def __init__(self, session_factory, processes=RESUME_EXTRACT_PROCESSES,
+                 poll_interval=RESUME_EXTRACT_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        """Start the dispatcher thread and the process pool."""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._pool = ExtractionPool(self.processes)
+        self._thread = threading.Thread(target=self._run, name="resume-text-extractor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the dispatcher thread and shut down the process pool."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def run_until_idle(self):
+        """Process pending resumes on the calling thread until none are left."""
+        total = 0
+        pool = ExtractionPool(self.processes)
+        try:
+            with self.session_factory() as session:
+                while True:
+                    processed = process_batch(session, pool)
+                    if not processed:
+                        return total
+                    total += processed
+        finally:
+            pool.shutdown()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as session:
+                    processed = process_batch(session, self._pool)
+            except Exception as e:
+                logger.error(f"Resume text extractor error: {str(e)}")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
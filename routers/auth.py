@@ -1,27 +1,61 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
 import models
 import schemas
-from auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import (
+    authenticate_user_async, create_access_token, get_password_hash, get_current_active_user,
+    ACCESS_TOKEN_EXPIRE_MINUTES
+)
+from login_throttle import password_executor, login_retry_after, client_address, ExecutorSaturated
+from user_cache import user_cache
 
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"],
 )
 
+def _busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many requests in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint to get a JWT token for authentication.
+    
+    Attempts are rate limited per client address (see TRUSTED_PROXY_HOPS)
+    and per account (429),
+    and the password check is refused with 503 while the password
+    executor is saturated.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    client_ip = client_address(
+        request.client.host if request.client else None,
+        ",".join(request.headers.getlist("x-forwarded-for"))
+    )
+    retry_after = login_retry_after(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
+    try:
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
+    except ExecutorSaturated:
+        raise _busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,18 +70,21 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=schemas.User)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new attorney user. In a real-world scenario, this should be protected.
     """
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+    result = await db.execute(select(models.User).where(models.User.email == user.email))
+    if result.scalars().first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_executor.run(get_password_hash, user.password)
+    except ExecutorSaturated:
+        raise _busy()
     db_user = models.User(
         email=user.email,
         password=hashed_password,
@@ -55,6 +92,13 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: schemas.User = Depends(get_current_active_user)):
+    """
+    Get hit/miss statistics of this worker's authenticated user cache. Requires authentication.
+    """
+    return user_cache.stats()
@@ -1,35 +1,109 @@
 import os
 import uuid
-import shutil
-from typing import List
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db, session_scope
 import models
 import schemas
 from auth import get_current_active_user
-from email_service import send_prospect_confirmation_email, send_attorney_notification_email
+from lead_counters import get_counts, record_transition
+from http_cache import etag_matches, weak_etag, http_date, is_not_modified, REVALIDATE
+from fast_json import dumps, lead_row
+from lead_bulk import bulk_update_leads, BulkSelectionTooBroad, MAX_BULK_IDS
+from lead_merge import resume_versions
+from lead_leases import claim_next_lead, renew_lease, release_lease, lease_holder, end_lease
+from lead_cache import lead_cache, invalidate_leads
+from lead_changes import get_changes, current_watermark, data_version, MAX_CHANGES
+from lead_events import broker, publish_lead_event, LEAD_UPDATED
+import lead_intake
+from idempotency import (
+    claim_key, release_key, commit_submission, request_fingerprint, submission_id_for,
+    IdempotencyConflict, IdempotencyInProgress, CREATE_LEAD_SCOPE, MAX_IDEMPOTENCY_KEY_LENGTH
+)
+from lead_export import iter_export, export_filename, EXPORT_FORMATS
+from lead_queries import filter_leads, parse_fields, parse_include, project_leads, projection_options
+from lead_search import search_leads, MAX_SEARCH_RESULTS
+from pagination import keyset_page, InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from resume_storage import (
+    store_stream, resolve_path, resume_etag, resume_media_type, resume_download_name,
+    parse_range, iter_file_range, RangeNotSatisfiable, UploadTooLarge,
+    MAX_UPLOAD_SIZE, RESUME_CACHE_MAX_AGE
+)
 
 router = APIRouter(
     prefix="/leads",
     tags=["leads"],
 )
 
-# Ensure uploads directory exists
-os.makedirs("uploads", exist_ok=True)
+# Opt in to sending list responses through the fast encoder instead of response_model validation
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', '0') == '1'
+
+# Field order of schemas.Lead, so fast responses match the validated ones
+_LEAD_SCHEMA_FIELDS = tuple(schemas.Lead.model_fields)
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded by fast_json.dumps.
+
+    Returning one skips FastAPI's response_model validation and encoding,
+    so it is only used for data built from database rows.
+    """
+    media_type = "application/json"
+    
+    def render(self, content):
+        return dumps(content)
+
+def _list_response(response, content, headers):
+    """Return list data through the fast path, or hand it to response_model validation."""
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(content, headers=headers)
+    response.headers.update(headers)
+    return content
 
-@router.post("/", response_model=schemas.Lead)
+def _lead_data(lead):
+    """JSON-ready representation of a lead, as cached and returned by the read endpoints."""
+    return schemas.Lead.model_validate(lead).model_dump(mode="json")
+
+def _partial_lead_data(lead, fields, include):
+    """JSON-ready representation of the selected fields of a lead loaded by project_leads."""
+    data = lead_row(lead, fields)
+    if "user" in include:
+        user = lead.user
+        data["user"] = {"id": user.id, "email": user.email, "full_name": user.full_name} if user else None
+    return data
+
+def _projection(fields, include):
+    try:
+        return parse_fields(fields), parse_include(include)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/", response_model=schemas.LeadSubmissionReceipt)
 async def create_lead(
+    response: Response,
     first_name: str = Form(...),
     last_name: str = Form(...),
     email: str = Form(...),
     resume: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Public endpoint to submit a new lead with resume upload.
+    
+    If the same email applied within the merge window, the resume is added
+    to that lead as a new version. With an Idempotency-Key header, repeating
+    the request is answered as the first time instead of submitting again.
+    
+    The caller is anonymous, so the answer only acknowledges the submission;
+    it is the same whether a lead was created or the resume was merged.
     """
     # Validate file type
     allowed_extensions = [".pdf", ".doc", ".docx", ".txt"]
@@ -40,85 +114,559 @@ async def create_lead(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
         )
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+        )
     
-    # Create a unique filename to avoid collisions
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join("uploads", unique_filename)
-    
-    # Save the uploaded file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(resume.file, buffer)
-    
-    # Create the lead in the database
-    db_lead = models.Lead(
-        first_name=first_name,
-        last_name=last_name,
-        email=email,
-        resume_path=file_path,
-        state=models.LeadState.PENDING
-    )
+    # A repeat is answered from the key before the upload is read
+    if idempotency_key:
+        fingerprint = request_fingerprint(first_name, last_name, email.lower(), resume.filename)
+        try:
+            original = await db.run_sync(claim_key, CREATE_LEAD_SCOPE, idempotency_key, fingerprint)
+        except IdempotencyConflict:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        except IdempotencyInProgress:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+        if original is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return {"id": submission_id_for(CREATE_LEAD_SCOPE, idempotency_key), "status": "replayed"}
     
-    db.add(db_lead)
-    db.commit()
-    db.refresh(db_lead)
+    try:
+        # Stream the upload to disk off the event loop, aborting once the size cap is hit.
+        # Files are stored under their content hash, so repeat uploads share one copy.
+        try:
+            stored = await run_in_threadpool(store_stream, resume.file, file_ext, MAX_UPLOAD_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        
+        # Create the lead in the database; emails are queued in the same
+        # transaction and sent by the outbox workers
+        submission_id = submission_id_for(CREATE_LEAD_SCOPE, idempotency_key)
+        
+        def write(session):
+            return lead_intake.add_submission(session, first_name, last_name, email, stored, submission_id=submission_id)
+        
+        await db.run_sync(commit_submission, submission_id, write, CREATE_LEAD_SCOPE, idempotency_key)
+    except Exception:
+        if idempotency_key:
+            await db.rollback()
+            await db.run_sync(release_key, CREATE_LEAD_SCOPE, idempotency_key)
+        raise
     
-    # Send emails
-    send_prospect_confirmation_email(email, first_name, last_name)
-    send_attorney_notification_email(first_name, last_name, email, file_path)
+    return {"id": submission_id, "status": "received"}
+
+@router.post("/bulk", response_model=schemas.LeadBulkUpdateResult)
+async def bulk_update(
+    bulk: schemas.LeadBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Update the state and/or notes of many leads at once. Requires authentication.
     
-    return db_lead
+    Select the leads with ``ids`` (at most MAX_BULK_IDS) or with a ``filter``
+    on state and creation time that sets at least one criterion. All of
+    them are updated by one statement in one transaction; a selection of
+    more than MAX_BULK_ROWS leads is refused and changes nothing. Leads another user has claimed are skipped. Each
+    requested id is reported as ``updated``, ``leased`` or ``not_found``;
+    with a filter the updated and the skipped leased leads are listed.
+    """
+    if (bulk.ids is None) == (bulk.filter is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide either ids or filter")
+    if bulk.state is None and bulk.notes is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    if bulk.ids is not None and len(bulk.ids) > MAX_BULK_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BULK_IDS} ids per request")
+    
+    where = bulk.filter or schemas.LeadFilter()
+    try:
+        rows, previous_states, leased_ids = await db.run_sync(
+            bulk_update_leads,
+            current_user.id,
+            lead_ids=bulk.ids,
+            state=bulk.state,
+            notes=bulk.notes,
+            where_state=where.state,
+            created_after=where.created_after,
+            created_before=where.created_before
+        )
+    except BulkSelectionTooBroad as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    
+    leased_ids = set(leased_ids)
+    requested = bulk.ids if bulk.ids is not None else [row.id for row in rows] + sorted(leased_ids)
+    results = []
+    for lead_id in dict.fromkeys(requested):
+        if lead_id in previous_states:
+            results.append({"id": lead_id, "status": "updated", "previous_state": previous_states[lead_id]})
+        elif lead_id in leased_ids:
+            results.append({"id": lead_id, "status": "leased"})
+        else:
+            results.append({"id": lead_id, "status": "not_found"})
+    return {"updated": len(rows), "results": results}
 
-@router.get("/", response_model=List[schemas.Lead])
+@router.get("/", response_model=List[schemas.LeadPartial], response_model_exclude_unset=True)
 async def get_leads(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    state: Optional[models.LeadState] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     """
-    Get a list of all leads. Requires authentication.
+    Get a page of leads, newest first. Requires authentication.
+    
+    Optionally filter by ``state`` and by a ``created_after`` (inclusive) /
+    ``created_before`` (exclusive) range. Pass the X-Next-Cursor header of a
+    response as ``cursor`` to fetch the following page; the header is absent
+    on the last page. X-Change-Watermark is the value to pass as ``since``
+    to /leads/changes to catch up from this listing.
+    
+    ``fields`` is a comma-separated list of the lead fields to return; by
+    default every field except ``notes``. Only those columns are read.
+    ``include=user`` adds the user who last updated each lead.
     """
-    leads = db.query(models.Lead).offset(skip).limit(limit).all()
-    return leads
+    fields, include = _projection(fields, include)
+    
+    # Validate against the data version before reading the page; a 304
+    # costs one index lookup. None means changes are not settled yet, and
+    # the page is then neither cached nor validated.
+    version = await db.run_sync(data_version)
+    headers = {"Cache-Control": REVALIDATE}
+    if version is not None:
+        headers["ETag"] = weak_etag("leads", version)
+        if is_not_modified(request.headers, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    def load_page(session):
+        # Read before the page so no change made while it is fetched is skipped.
+        watermark = current_watermark(session)
+        query = filter_leads(session.query(models.Lead), state, created_after, created_before)
+        leads, next_cursor = keyset_page(project_leads(query, fields, include), cursor, limit)
+        return {
+            "watermark": watermark,
+            "next_cursor": next_cursor,
+            "leads": [_partial_lead_data(lead, fields, include) for lead in leads],
+        }
+    
+    async def load():
+        return await db.run_sync(load_page)
+    
+    params = (state, created_after, created_before, cursor, limit, ",".join(fields), ",".join(include))
+    try:
+        if version is None:
+            page = await load()
+        else:
+            page = await lead_cache.get_list_async(params, version, load)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    headers["X-Change-Watermark"] = str(page["watermark"])
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+        next_url = request.url.include_query_params(cursor=page["next_cursor"])
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return _list_response(response, page["leads"], headers)
+
+@router.get("/search", response_model=List[schemas.LeadPartial], response_model_exclude_unset=True)
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    state: Optional[models.LeadState] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=MAX_SEARCH_RESULTS),
+    offset: int = Query(0, ge=0),
+    resumes: bool = False,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Full-text search over lead names, emails and notes, best matches first.
+    With ``resumes=true`` the extracted resume text is searched instead.
+    Requires authentication.
+    
+    The X-Next-Offset header carries the ``offset`` of the next page and is
+    absent on the last page. ``fields``, ``include`` and the ``created_after``
+    and ``created_before`` bounds work as for GET /leads/.
+    """
+    fields, include = _projection(fields, include)
+    
+    def run_search(session):
+        leads, next_offset = search_leads(
+            session, q, state, limit, offset, resumes=resumes,
+            options=projection_options(fields, include),
+            created_after=created_after, created_before=created_before
+        )
+        return [_partial_lead_data(lead, fields, include) for lead in leads], next_offset
+    
+    results, next_offset = await db.run_sync(run_search)
+    headers = {"X-Next-Offset": str(next_offset)} if next_offset is not None else {}
+    return _list_response(response, results, headers)
+
+@router.get("/export")
+async def export_leads(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    state: Optional[models.LeadState] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Stream all matching leads as CSV or NDJSON. Requires authentication.
+    
+    Rows are read through a server-side cursor and written as they arrive,
+    so the export runs in constant memory.
+    """
+    def generate():
+        # The request-scoped session is closed before a streaming body is
+        # sent, so the export owns its session for as long as it streams.
+        with session_scope() as db:
+            yield from iter_export(db, format, state, created_after, created_before)
+    
+    return StreamingResponse(
+        generate(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(format)}"'}
+    )
+
+@router.get("/changes", response_model=schemas.LeadChanges)
+async def get_lead_changes(
+    response: Response,
+    since: int = Query(..., ge=0),
+    limit: int = Query(MAX_CHANGES, ge=1, le=MAX_CHANGES),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Get the leads created or modified after a watermark. Requires authentication.
+    
+    ``deleted`` lists the leads removed since, with the lead each was merged into.
+    Pass the returned ``watermark`` as ``since`` on the next call; while
+    ``has_more`` is true there are further changes to fetch straight away.
+    """
+    changes, removed, watermark, has_more = await db.run_sync(get_changes, since, limit)
+    return _list_response(response, {
+        "changes": [lead_row(lead, _LEAD_SCHEMA_FIELDS) for lead in changes],
+        "deleted": [{"id": tombstone.lead_id, "merged_into": tombstone.merged_into} for tombstone in removed],
+        "watermark": watermark,
+        "has_more": has_more,
+    }, {})
+
+@router.get("/events")
+async def lead_events(
+    request: Request,
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Server-Sent Events feed of created, updated and removed leads. Requires authentication.
+    
+    Each event's data is a JSON object with ``type`` (``lead.created``,
+    ``lead.updated`` or ``lead.deleted``) and a compact ``lead``; for a
+    removed lead that is its ``id`` and the ``merged_into`` lead. Comment lines are sent as
+    keep-alives while the feed is idle.
+    """
+    queue = broker.subscribe()
+    
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    # Dropped for falling behind; the client reconnects
+                    break
+                yield f"data: {message}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/counts")
+async def get_lead_counts(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Get the number of leads in each state. Requires authentication.
+    """
+    counts = await db.run_sync(get_counts)
+    return {
+        "total": sum(counts.values()),
+        **{state.value: count for state, count in counts.items()}
+    }
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Get hit/miss statistics of this worker's lead cache. Requires authentication.
+    """
+    return lead_cache.stats()
+
+@router.post("/claim", response_model=schemas.Lead, responses={204: {"description": "No lead is waiting"}})
+async def claim_lead(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Lease the oldest unassigned pending lead to the current user. Requires authentication.
+    
+    The lease lasts LEAD_LEASE_SECONDS; renew it with ``PUT /leads/{id}/lease``
+    while working on the lead. Concurrent claims never return the same lead.
+    Returns 204 when no lead is waiting.
+    """
+    lead = await db.run_sync(claim_next_lead, current_user.id)
+    if lead is None:
+        await db.rollback()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    await db.commit()
+    return lead
 
 @router.get("/{lead_id}", response_model=schemas.Lead)
 async def get_lead(
     lead_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     """
     Get a specific lead by ID. Requires authentication.
+    
+    Supports If-None-Match and If-Modified-Since. Only the lead's version is
+    read to answer those; the lead itself is served from the lead cache.
+    """
+    version = (await db.execute(
+        select(models.Lead.change_seq, models.Lead.updated_at).where(models.Lead.id == lead_id)
+    )).first()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    
+    etag = weak_etag("lead", lead_id, version.change_seq, int(version.updated_at.timestamp() * 1000000))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(version.updated_at),
+        "Cache-Control": REVALIDATE,
+    }
+    if is_not_modified(request.headers, etag, version.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    async def load():
+        lead = await db.get(models.Lead, lead_id)
+        return _lead_data(lead) if lead is not None else None
+    
+    lead = await lead_cache.get_lead_async(lead_id, etag, load)
+    if lead is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    response.headers.update(headers)
+    return lead
+
+@router.get("/{lead_id}/resume")
+async def download_resume(
+    lead_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Download a lead's resume. Requires authentication.
+    
+    Supports conditional requests (If-None-Match) and single byte ranges.
+    Full downloads are handed to the server as a file response so it can
+    use sendfile where available; ranges are read from a memory map.
+    """
+    lead = await db.get(models.Lead, lead_id)
+    if lead is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return _resume_response(request, lead, lead.resume_path)
+
+@router.get("/{lead_id}/resumes", response_model=List[schemas.LeadResumeVersion])
+async def list_resume_versions(
+    lead_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
     """
-    lead = db.query(models.Lead).filter(models.Lead.id == lead_id).first()
+    List the resume versions of a lead whose applicant submitted again. Requires authentication.
+    
+    Empty for a lead with a single submission; its resume is the one at /leads/{lead_id}/resume.
+    """
+    if await db.get(models.Lead, lead_id) is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return await db.run_sync(resume_versions, lead_id)
+
+@router.get("/{lead_id}/resumes/{version}")
+async def download_resume_version(
+    lead_id: int,
+    version: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """Download one resume version of a lead, like /leads/{lead_id}/resume. Requires authentication."""
+    lead = await db.get(models.Lead, lead_id)
     if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    resume_path = (await db.execute(
+        select(models.LeadResume.resume_path)
+        .where(models.LeadResume.lead_id == lead_id, models.LeadResume.version == version)
+    )).scalar()
+    if resume_path is None:
+        raise HTTPException(status_code=404, detail="Resume version not found")
+    return _resume_response(request, lead, resume_path)
+
+def _resume_response(request, lead, resume_path):
+    """Response serving a stored resume of a lead, honouring If-None-Match and Range."""
+    path = resolve_path(resume_path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Resume not found")
+    
+    etag = resume_etag(resume_path, path)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"private, max-age={RESUME_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    size = os.path.getsize(path)
+    media_type = resume_media_type(path)
+    filename = resume_download_name(lead, path)
+    
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip('"') == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+    
+    if byte_range is None:
+        return FileResponse(
+            path,
+            media_type=media_type,
+            headers=headers,
+            filename=filename,
+            content_disposition_type="inline"
+        )
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
+
+@router.put("/{lead_id}/lease", response_model=schemas.Lead)
+async def renew_lead_lease(
+    lead_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Extend the current user's lease on a claimed lead. Requires authentication.
+    
+    Returns 409 if the lead has been claimed by someone else or has left the queue.
+    """
+    lead = await db.run_sync(renew_lease, lead_id, current_user.id)
+    if lead is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You no longer hold this lead")
+    await db.commit()
     return lead
 
+@router.delete("/{lead_id}/lease", status_code=status.HTTP_204_NO_CONTENT)
+async def release_lead_lease(
+    lead_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Return a claimed lead to the queue. Requires authentication.
+    """
+    if not await db.run_sync(release_lease, lead_id, current_user.id):
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You do not hold this lead")
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.patch("/{lead_id}", response_model=schemas.Lead)
 async def update_lead(
     lead_id: int,
     lead_update: schemas.LeadUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     """
     Update a lead's state or notes. Requires authentication.
+    
+    A lead claimed by another attorney can't be updated until their lease
+    ends (409). Moving a lead out of PENDING ends the lease on it.
     """
-    lead = db.query(models.Lead).filter(models.Lead.id == lead_id).first()
+    lead = await db.get(models.Lead, lead_id)
     if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    holder = lease_holder(lead)
+    if holder is not None and holder != current_user.id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Lead is claimed by another user")
     
-    # Update the lead with the provided values
-    if lead_update.state is not None:
-        lead.state = lead_update.state
-    
-    if lead_update.notes is not None:
-        lead.notes = lead_update.notes
-    
-    # Set the user who updated the lead
-    lead.updated_by = current_user.id
+    def apply(session):
+        # Update the lead with the provided values
+        if lead_update.state is not None:
+            record_transition(session, lead.state, lead_update.state)
+            lead.state = lead_update.state
+            if lead.state != models.LeadState.PENDING:
+                end_lease(lead)
+        
+        if lead_update.notes is not None:
+            lead.notes = lead_update.notes
+        
+        # Set the user who updated the lead
+        lead.updated_by = current_user.id
+        publish_lead_event(session, LEAD_UPDATED, lead)
+        invalidate_leads(session, lead.id)
     
-    db.commit()
-    db.refresh(lead)
+    await db.run_sync(apply)
+    await db.commit()
+    await db.refresh(lead)
     return lead
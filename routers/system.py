@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+
+import schemas
+from auth import get_current_active_user
+from database import engine, async_engine
+from engine_factory import pool_status
+
+router = APIRouter(
+    prefix="/system",
+    tags=["system"],
+)
+
+@router.get("/pool")
+async def get_pool_stats(current_user: schemas.User = Depends(get_current_active_user)):
+    """
+    Get live statistics of this worker's connection pools. Requires authentication.
+    
+    ``async`` is the pool serving the API's requests; ``sync`` serves the
+    streamed exports and the background workers.
+    """
+    return {
+        "async": pool_status(async_engine),
+        "sync": pool_status(engine),
+    }
@@ -31,6 +31,38 @@ class LeadUpdate(BaseModel):
     state: Optional[LeadState] = None
     notes: Optional[str] = None
 
+class LeadFilter(BaseModel):
+    state: Optional[LeadState] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class LeadBulkUpdate(LeadUpdate):
+    # Either explicit ids or a filter selects the leads to update
+    ids: Optional[List[int]] = Field(None, min_length=1)
+    filter: Optional[LeadFilter] = None
+
+class LeadSubmissionReceipt(BaseModel):
+    # Answer to the public submission endpoint: the submission's own id and
+    # "received" or "replayed", nothing of the lead it was recorded on
+    id: str
+    status: str
+
+class LeadResumeVersion(BaseModel):
+    version: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LeadBulkUpdateItem(BaseModel):
+    id: int
+    status: str
+    previous_state: Optional[LeadState] = None
+
+class LeadBulkUpdateResult(BaseModel):
+    updated: int
+    results: List[LeadBulkUpdateItem]
+
 class LeadInDB(LeadBase):
     id: int
     resume_path: str
@@ -39,6 +71,8 @@ class LeadInDB(LeadBase):
     created_at: datetime
     updated_at: datetime
     updated_by: Optional[int] = None
+    assigned_to: Optional[int] = None
+    lease_expires_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -46,6 +80,38 @@ class LeadInDB(LeadBase):
 class Lead(LeadInDB):
     pass
 
+class UserSummary(BaseModel):
+    id: int
+    email: EmailStr
+    full_name: str
+
+class LeadPartial(BaseModel):
+    # A lead restricted to the fields selected on a list request
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    resume_path: Optional[str] = None
+    state: Optional[LeadState] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    updated_by: Optional[int] = None
+    assigned_to: Optional[int] = None
+    lease_expires_at: Optional[datetime] = None
+    user: Optional[UserSummary] = None
+
+class LeadDeleted(BaseModel):
+    id: int
+    merged_into: Optional[int] = None
+
+class LeadChanges(BaseModel):
+    changes: List[Lead]
+    # Leads removed since, e.g. merged into another lead
+    deleted: List[LeadDeleted] = []
+    watermark: int
+    has_more: bool
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -156,7 +156,9 @@ function authenticateUI(token) {
  */
 async function fetchLeads(token, filterState = null) {
     try {
-        const response = await fetch('/leads/', {
+        // Filtering happens on the server
+        const url = filterState ? `/leads/?state=${filterState}` : '/leads/';
+        const response = await fetch(url, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -164,13 +166,7 @@ async function fetchLeads(token, filterState = null) {
         
         if (response.ok) {
             const leads = await response.json();
-            
-            // Filter leads if a filter is specified
-            const filteredLeads = filterState 
-                ? leads.filter(lead => lead.state === filterState)
-                : leads;
-                
-            renderLeadsTable(filteredLeads);
+            renderLeadsTable(leads);
         } else {
             // Handle error (e.g., token expired)
             if (response.status === 401) {
@@ -220,7 +216,7 @@ function renderLeadsTable(leads) {
             <td>${lead.email}</td>
             <td>${formattedDate}</td>
             <td>${statusBadge}</td>
-            <td><a href="${lead.resume_path}" target="_blank">View</a></td>
+            <td><a href="#" onclick="openResume(${lead.id}); return false;">View</a></td>
             <td>
                 <button class="btn btn-sm btn-primary view-lead-btn" data-lead-id="${lead.id}">
                     View Details
@@ -260,7 +256,10 @@ async function showLeadDetails(leadId) {
             document.getElementById('detailName').textContent = `${lead.first_name} ${lead.last_name}`;
             document.getElementById('detailEmail').textContent = lead.email;
             document.getElementById('detailCreated').textContent = new Date(lead.created_at).toLocaleString();
-            document.getElementById('detailResumeLink').href = lead.resume_path;
+            document.getElementById('detailResumeLink').onclick = function(e) {
+                e.preventDefault();
+                openResume(lead.id);
+            };
             
             // Set current state and notes
             document.getElementById('leadState').value = lead.state;
@@ -278,6 +277,29 @@ async function showLeadDetails(leadId) {
     }
 }
 
+/**
+ * Open a lead's resume; the endpoint needs the bearer token, so it is fetched
+ * and shown from a blob URL (the browser cache still honours its ETag)
+ */
+async function openResume(leadId) {
+    const token = localStorage.getItem('token');
+    
+    try {
+        const response = await fetch(`/leads/${leadId}/resume`, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        
+        if (response.ok) {
+            const blob = await response.blob();
+            window.open(URL.createObjectURL(blob), '_blank');
+        }
+    } catch (error) {
+        console.error('Error fetching resume:', error);
+    }
+}
+
 /**
  * Update a lead's state and notes
  */
@@ -0,0 +1,282 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError, TimeoutError as PoolTimeout
+
+from lead_intake import add_submission, find_submission
+from resume_storage import StoredResume
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Submissions that could not be committed wait here until they are replayed
+JOURNAL_DIRECTORY = os.path.abspath(os.environ.get('JOURNAL_DIRECTORY', 'journal'))
+# Seconds between attempts to drain the journal into the database
+JOURNAL_REPLAY_INTERVAL = float(os.environ.get('JOURNAL_REPLAY_INTERVAL', 15))
+
+# Errors meaning the database could not be reached, as opposed to a bad row
+DATABASE_UNAVAILABLE = (OperationalError, InterfaceError, PoolTimeout)
+# PostgreSQL errors that go away on their own: lock timeout, statement
+# timeout, serialization failure and deadlock
+_RETRYABLE_SQLSTATES = {"55P03", "57014", "40001", "40P01"}
+
+_ENTRY_SUFFIX = ".json"
+
+class SubmissionJournal:
+    """
+    Write-ahead journal of lead submissions on local disk.
+
+    Every submission is its own file, written under a temporary name,
+    fsync'd and then renamed into place, so a crash leaves either a whole
+    entry or none and workers never interleave their writes. Names start
+    with the time of the submission, so entries replay in arrival order.
+    Entries that cannot be replayed are moved to ``failed/`` for inspection.
+
+    Args:
+        directory: Directory holding the entries
+    """
+
+    def __init__(self, directory=JOURNAL_DIRECTORY):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, "failed")
+        os.makedirs(self.failed_directory, exist_ok=True)
+
+    def append(self, submission_id, first_name, last_name, email, stored):
+        """
+        Durably record a submission whose lead could not be committed.
+
+        Returns:
+            Name of the journal entry
+        """
+        received_at = datetime.utcnow()
+        entry = {
+            "submission_id": submission_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "resume": {"key": stored.key, "sha256": stored.sha256, "size": stored.size},
+            "received_at": received_at.isoformat(),
+        }
+        name = f"{received_at:%Y%m%dT%H%M%S%f}-{submission_id}{_ENTRY_SUFFIX}"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._sync_directory()
+        return name
+
+    def entries(self, directory=None):
+        """Names of the journaled submissions, oldest first."""
+        return sorted(
+            name for name in os.listdir(directory or self.directory)
+            if name.endswith(_ENTRY_SUFFIX) and not name.startswith(".")
+        )
+
+    def read(self, name, directory=None):
+        with open(os.path.join(directory or self.directory, name)) as f:
+            return json.load(f)
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            # Replayed by another worker at the same time
+            pass
+
+    def quarantine(self, name):
+        """Move an entry that cannot be replayed out of the way."""
+        try:
+            os.replace(os.path.join(self.directory, name), os.path.join(self.failed_directory, name))
+        except FileNotFoundError:
+            pass
+
+    def requeue(self, names=None):
+        """
+        Move quarantined entries back into the journal to be replayed again.
+
+        Args:
+            names: Entries to move; every quarantined entry by default
+
+        Returns:
+            Names of the entries moved
+        """
+        moved = []
+        for name in names or self.entries(self.failed_directory):
+            # Names only; a path must not move files from elsewhere
+            name = os.path.basename(name)
+            try:
+                os.replace(os.path.join(self.failed_directory, name), os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            moved.append(name)
+        if moved:
+            self._sync_directory()
+        return moved
+
+    def resume_keys(self):
+        """Stored resumes that journaled submissions, replayable or failed, still need."""
+        keys = set()
+        for directory in (self.directory, self.failed_directory):
+            for name in self.entries(directory):
+                try:
+                    keys.add(self.read(name, directory)["resume"]["key"])
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+        return keys
+
+    def _sync_directory(self):
+        # Make the rename itself durable
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+submission_journal = SubmissionJournal()
+
+def is_retryable(error):
+    """
+    Whether a database error may succeed if tried again later: the database
+    is unreachable, or the statement hit a lock or statement timeout (which
+    some drivers report as a plain DBAPIError).
+    """
+    if isinstance(error, DATABASE_UNAVAILABLE):
+        return True
+    if isinstance(error, DBAPIError):
+        orig = error.orig
+        sqlstate = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+        return sqlstate in _RETRYABLE_SQLSTATES
+    return False
+
+def replay_entry(session, entry):
+    """
+    Record and commit a journaled submission, unless that was done already.
+
+    The lead may exist because an earlier replay got that far, or because
+    the original commit reached the database before its connection failed.
+
+    Returns:
+        True if the submission was recorded, False if it was already there
+    """
+    submission_id = entry["submission_id"]
+    if find_submission(session, submission_id) is not None:
+        return False
+    resume = entry["resume"]
+    add_submission(
+        session,
+        entry["first_name"],
+        entry["last_name"],
+        entry["email"],
+        StoredResume(resume["key"], resume["sha256"], resume["size"], True),
+        submission_id=submission_id,
+        created_at=datetime.fromisoformat(entry["received_at"])
+    )
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        # Replayed concurrently by another worker
+        if find_submission(session, submission_id) is not None:
+            return False
+        raise
+    return True
+
+def replay(session, journal=submission_journal):
+    """
+    Add journaled submissions to the database, oldest first.
+
+    Raises the first error that may go away on its own (see is_retryable),
+    leaving that entry and the rest for the next attempt. Entries failing
+    for any other reason are quarantined so they do not block the rest.
+
+    Returns:
+        Tuple of (submissions recorded, entries that were recorded already)
+    """
+    created = 0
+    skipped = 0
+    for name in journal.entries():
+        try:
+            entry = journal.read(name)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable journal entry {name}: {str(e)}")
+            journal.quarantine(name)
+            continue
+
+        try:
+            if replay_entry(session, entry):
+                created += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            session.rollback()
+            if is_retryable(e):
+                raise
+            logger.error(f"Failed to replay journal entry {name}: {str(e)}")
+            journal.quarantine(name)
+            continue
+        journal.remove(name)
+        logger.info(f"Replayed journaled submission {entry['submission_id']} for {entry['email']}")
+    return created, skipped
+
+class JournalReplayer:
+    """
+    Background thread that drains the submission journal into the database.
+
+    Args:
+        session_factory: Callable returning a context manager that yields a session
+        journal: SubmissionJournal to drain
+        interval: Seconds between attempts
+    """
+
+    def __init__(self, session_factory, journal=submission_journal, interval=JOURNAL_REPLAY_INTERVAL):
+        self.session_factory = session_factory
+        self.journal = journal
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the replay thread."""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="journal-replayer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Signal the thread to stop and wait for it to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        """
+        Replay whatever the journal holds.
+
+        Returns:
+            Tuple of (leads created, entries whose lead already existed)
+        """
+        # Don't take a connection while there is nothing to replay
+        if not self.journal.entries():
+            return 0, 0
+        with self.session_factory() as session:
+            return replay(session, self.journal)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                if is_retryable(e):
+                    logger.warning(f"Database still unavailable, journal replay postponed: {str(e)}")
+                else:
+                    logger.error(f"Journal replay failed: {str(e)}")
+            self._stop.wait(self.interval)
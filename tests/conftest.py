@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+# Modules read their settings from the environment on import, so point
+# them at a scratch SQLite database and directories before importing any
+_scratch = tempfile.mkdtemp(prefix="leads-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'leads.db')}"
+os.environ["UPLOAD_DIRECTORY"] = os.path.join(_scratch, "uploads")
+os.environ["JOURNAL_DIRECTORY"] = os.path.join(_scratch, "journal")
+os.environ["EMAIL_TRANSPORT"] = "fake"
+
+import hashlib
+
+import pytest
+
+from database import engine, SessionLocal
+from migrations import upgrade_schema
+from models import db, User
+from resume_storage import StoredResume, key_for
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    upgrade_schema(engine)
+
+@pytest.fixture
+def session():
+    """A session on an emptied database."""
+    with engine.begin() as conn:
+        for table in reversed(db.metadata.sorted_tables):
+            conn.execute(table.delete())
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture(scope="session")
+def api_app():
+    """The FastAPI app; it writes its default assets to the working directory on import."""
+    cwd = os.getcwd()
+    os.chdir(_scratch)
+    try:
+        import asgi
+    finally:
+        os.chdir(cwd)
+    return asgi.app
+
+@pytest.fixture
+def client(api_app, session):
+    """A client of the API, without the background workers started at startup."""
+    from fastapi.testclient import TestClient
+    from login_throttle import account_limiter, ip_limiter
+    # Every test logs in from the same address; start each with full buckets
+    for limiter in (account_limiter, ip_limiter):
+        limiter._buckets.clear()
+    return TestClient(api_app)
+
+@pytest.fixture
+def users(session):
+    """Two attorneys, as (first id, second id)."""
+    first = User(email="first@example.com", password="x", full_name="First Attorney")
+    second = User(email="second@example.com", password="x", full_name="Second Attorney")
+    session.add_all([first, second])
+    session.commit()
+    return first.id, second.id
+
+def stored_resume(content="resume"):
+    """A StoredResume for content, as store_stream would describe it."""
+    sha256 = hashlib.sha256(content.encode()).hexdigest()
+    return StoredResume(key_for(sha256, ".pdf"), sha256, len(content), False)
@@ -0,0 +1,79 @@
+from auth import get_password_hash
+from models import Lead, LeadResume, User
+from conftest import stored_resume
+from lead_intake import create_lead
+
+def _submit(client, email, content, **headers):
+    return client.post(
+        "/leads/",
+        data={"first_name": "Someone", "last_name": "Else", "email": email},
+        files={"resume": ("resume.pdf", content, "application/pdf")},
+        headers=headers
+    )
+
+def test_resubmission_cannot_read_or_replace_the_lead(client, session):
+    lead = create_lead(session, "Ada", "Lovelace", "ada@example.com", stored_resume("original"))
+    lead.notes = "PRIVATE attorney note"
+    session.commit()
+    original_resume = lead.resume_path
+
+    response = _submit(client, "ADA@example.com", b"another resume")
+
+    assert response.status_code == 200
+    receipt = response.json()
+    assert set(receipt) == {"id", "status"}
+    assert receipt["status"] == "received"
+    for private in ("Ada", "Lovelace", "PRIVATE", original_resume):
+        assert private not in response.text
+
+    session.expire_all()
+    lead = session.get(Lead, lead.id)
+    assert session.query(Lead).count() == 1
+    assert (lead.first_name, lead.notes, lead.resume_path) == ("Ada", "PRIVATE attorney note", original_resume)
+    # The upload is kept as a version for attorneys to review
+    versions = session.query(LeadResume).filter(LeadResume.lead_id == lead.id).order_by(LeadResume.version).all()
+    assert [v.resume_path for v in versions][0] == original_resume
+    assert versions[-1].submission_id == receipt["id"]
+
+    headers = {"Authorization": f"Bearer {_token(client, session)}"}
+    listed = client.get(f"/leads/{lead.id}/resumes", headers=headers).json()
+    assert [v["version"] for v in listed] == [1, 2]
+    assert client.get(f"/leads/{lead.id}/resumes/2", headers=headers).content == b"another resume"
+    assert client.get(f"/leads/{lead.id}/resumes/2").status_code == 401
+
+def test_idempotent_replay_returns_only_the_receipt(client, session):
+    first = _submit(client, "grace@example.com", b"resume", **{"Idempotency-Key": "k1"})
+    session.query(Lead).update({"notes": "PRIVATE attorney note"})
+    session.commit()
+
+    again = _submit(client, "grace@example.com", b"resume", **{"Idempotency-Key": "k1"})
+
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == {"id": first.json()["id"], "status": "replayed"}
+
+def _token(client, session):
+    session.add(User(email="attorney@example.com", password=get_password_hash("secret"), full_name="Attorney"))
+    session.commit()
+    response = client.post("/auth/token", data={"username": "attorney@example.com", "password": "secret"})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+def test_routes_are_served_where_the_admin_ui_calls_them(client, session):
+    lead = create_lead(session, "Ada", "Lovelace", "ada@example.com", stored_resume())
+    session.commit()
+    headers = {"Authorization": f"Bearer {_token(client, session)}"}
+
+    listed = client.get("/leads/", headers=headers)
+    assert listed.status_code == 200
+    assert [row["id"] for row in listed.json()] == [lead.id]
+    assert client.get(f"/leads/{lead.id}", headers=headers).status_code == 200
+    assert client.get("/leads/").status_code == 401
+
+    paths = client.get("/openapi.json").json()["paths"]
+    assert not [path for path in paths if path.startswith(("/leads/leads", "/auth/auth"))]
+
+def test_wrong_password_is_refused(client, session):
+    _token(client, session)
+
+    response = client.post("/auth/token", data={"username": "attorney@example.com", "password": "wrong"})
+    assert response.status_code == 401
@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+import fast_json
+import schemas
+from fast_json import dumps, lead_row
+from lead_intake import create_lead
+from conftest import stored_resume
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_path_matches_validated_output(session, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    lead = create_lead(session, "Ada", "Lovelace", "ada@example.com", stored_resume())
+    lead.notes = "Ünïcode notes"
+    session.commit()
+
+    fast = json.loads(dumps(lead_row(lead, tuple(schemas.Lead.model_fields))))
+
+    assert fast == schemas.Lead.model_validate(lead).model_dump(mode="json")
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from idempotency import (
+    IdempotencyConflict, IdempotencyInProgress, CREATE_LEAD_SCOPE,
+    claim_key, commit_submission, request_fingerprint, submission_id_for
+)
+from lead_intake import add_submission, find_submission
+from models import IdempotencyKey, Lead
+from conftest import stored_resume
+
+FIELDS = ("Ada", "Lovelace", "ada@example.com")
+
+def _submit(session, key, fields=FIELDS):
+    """Run a keyed submission the way the endpoints do; returns the lead or the completed key."""
+    record = claim_key(session, CREATE_LEAD_SCOPE, key, request_fingerprint(*fields))
+    if record is not None:
+        return session.get(Lead, record.lead_id)
+    submission_id = submission_id_for(CREATE_LEAD_SCOPE, key)
+    return commit_submission(
+        session, submission_id,
+        lambda s: add_submission(s, *fields, stored_resume(), submission_id=submission_id),
+        scope=CREATE_LEAD_SCOPE, key=key
+    )
+
+def test_repeated_request_returns_the_same_lead(session):
+    first = _submit(session, "key-1")
+    again = _submit(session, "key-1")
+
+    assert again.id == first.id
+    assert session.query(Lead).count() == 1
+    assert find_submission(session, submission_id_for(CREATE_LEAD_SCOPE, "key-1")).id == first.id
+
+def test_key_reused_for_another_request_is_refused(session):
+    _submit(session, "key-1")
+
+    with pytest.raises(IdempotencyConflict):
+        _submit(session, "key-1", ("Grace", "Hopper", "grace@example.com"))
+
+def test_repeat_while_the_first_request_runs(session):
+    assert claim_key(session, CREATE_LEAD_SCOPE, "key-1", request_fingerprint(*FIELDS)) is None
+
+    with pytest.raises(IdempotencyInProgress):
+        claim_key(session, CREATE_LEAD_SCOPE, "key-1", request_fingerprint(*FIELDS))
+
+def test_repeat_after_the_key_expired_finds_the_lead(session):
+    first = _submit(session, "key-1")
+    session.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    session.commit()
+
+    # The key is claimed afresh, but the submission id derived from it
+    # already has a lead, so none is created
+    again = _submit(session, "key-1")
+    assert again.id == first.id
+    assert session.query(Lead).count() == 1
+    assert session.query(IdempotencyKey).one().lead_id == first.id
+
+def test_merged_submission_is_found_by_its_id(session):
+    first = _submit(session, "key-1")
+    merged = _submit(session, "key-2")
+
+    # Same applicant within the merge window: a new resume version, not a lead
+    assert merged.id == first.id
+    assert find_submission(session, submission_id_for(CREATE_LEAD_SCOPE, "key-2")).id == first.id
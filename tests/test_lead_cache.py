@@ -0,0 +1,108 @@
+import time
+import threading
+
+import pytest
+
+import lead_cache as lead_cache_module
+from lead_cache import LeadCache, LocalCacheBackend, invalidate_leads
+from lead_changes import data_version
+from lead_intake import create_lead
+from models import Lead
+from conftest import stored_resume
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A fresh local cache, also used by the commit hooks."""
+    cache = LeadCache(LocalCacheBackend())
+    monkeypatch.setattr(lead_cache_module, "lead_cache", cache)
+    return cache
+
+class Loader:
+    """Loader counting its calls."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+def test_entry_is_only_served_at_its_version(cache):
+    loader = Loader({"id": 1})
+
+    assert cache.get_lead(1, 5, loader) == {"id": 1}
+    assert cache.get_lead(1, 5, loader) == {"id": 1}
+    assert loader.calls == 1
+
+    loader.value = {"id": 1, "notes": "changed"}
+    assert cache.get_lead(1, 6, loader) == {"id": 1, "notes": "changed"}
+    assert loader.calls == 2
+
+def test_missing_lead_is_not_cached(cache):
+    loader = Loader(None)
+
+    assert cache.get_lead(1, 5, loader) is None
+    assert cache.get_lead(1, 5, loader) is None
+    assert loader.calls == 2
+
+def test_concurrent_loads_are_collapsed(cache):
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return {"id": 1}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_lead(1, 5, slow_loader)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    # Let the followers reach the leader's flight before it finishes
+    while cache.stats()["coalesced"] + cache.stats()["misses"] < len(threads):
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"id": 1}] * len(threads)
+
+def test_invalidation_waits_for_the_commit(session, cache):
+    cache.get_lead(7, 1, Loader({"id": 7}))
+
+    invalidate_leads(session, 7)
+    session.rollback()
+    assert cache.backend.get("lead:7") is not None
+
+    invalidate_leads(session, 7)
+    session.commit()
+    assert cache.backend.get("lead:7") is None
+
+def test_list_entries_follow_the_data_version(session, cache):
+    loader = Loader(["first page"])
+    before = data_version(session)
+    cache.get_list(("PENDING", 20), before, loader)
+    assert cache.get_list(("PENDING", 20), before, loader) == ["first page"]
+
+    lead = create_lead(session, "Ada", "Lovelace", "ada@example.com", stored_resume())
+    session.commit()
+    after = data_version(session)
+    assert after > before
+
+    loader.value = ["first page", "ada"]
+    assert cache.get_list(("PENDING", 20), after, loader) == ["first page", "ada"]
+    assert loader.calls == 2
+
+    # Editing the lead drops its entry and moves the version again
+    cache.get_lead(lead.id, lead.change_seq, Loader({"id": lead.id}))
+    lead.notes = "Called back"
+    invalidate_leads(session, lead.id)
+    session.commit()
+    assert cache.backend.get(f"lead:{lead.id}") is None
+    assert data_version(session) > after
+    assert session.get(Lead, lead.id).change_seq == data_version(session)
@@ -0,0 +1,72 @@
+from models import Lead, LeadState, LeadTombstone
+from lead_changes import get_changes, current_watermark, data_version
+from test_api import _token
+
+def _lead(i):
+    return Lead(first_name="Lead", last_name=str(i), email=f"lead{i}@example.com",
+                resume_path="ab/cd/abcd.pdf", state=LeadState.PENDING)
+
+def test_writes_stamp_increasing_values(session):
+    start = current_watermark(session)
+    lead = _lead(1)
+    session.add(lead)
+    session.commit()
+    created = lead.change_seq
+
+    lead.notes = "Called"
+    session.commit()
+    updated = lead.change_seq
+
+    # A flush without changes to the lead does not move it
+    lead.notes = "Called"
+    session.commit()
+
+    assert start < created < updated == lead.change_seq == current_watermark(session)
+    assert data_version(session) == updated
+
+def test_changes_since_a_watermark(session):
+    first = _lead(1)
+    session.add(first)
+    session.commit()
+    since = current_watermark(session)
+    second = _lead(2)
+    session.add(second)
+    first.notes = "Called"
+    session.add(LeadTombstone(lead_id=99, merged_into=first.id))
+    session.commit()
+
+    leads, removed, watermark, has_more = get_changes(session, since)
+
+    assert {lead.id for lead in leads} == {first.id, second.id}
+    assert [(t.lead_id, t.merged_into) for t in removed] == [(99, first.id)]
+    assert watermark == current_watermark(session)
+    assert not has_more
+    assert get_changes(session, watermark) == ([], [], watermark, False)
+
+def test_pages_never_split_a_change(session):
+    since = current_watermark(session)
+    # Three leads written in one transaction share one value
+    session.add_all([_lead(1), _lead(2), _lead(3)])
+    session.commit()
+    session.add(_lead(4))
+    session.commit()
+
+    first, _, watermark, has_more = get_changes(session, since, limit=2)
+    assert (len(first), has_more) == (3, True)
+
+    second, _, watermark, has_more = get_changes(session, watermark, limit=2)
+    assert ([lead.last_name for lead in second], has_more) == (["4"], False)
+
+def test_api_feed(client, session):
+    headers = {"Authorization": f"Bearer {_token(client, session)}"}
+    since = client.get("/leads/", headers=headers).headers["x-change-watermark"]
+    lead = _lead(1)
+    session.add(lead)
+    session.commit()
+
+    feed = client.get("/leads/changes", params={"since": since}, headers=headers).json()
+
+    assert [change["id"] for change in feed["changes"]] == [lead.id]
+    assert feed["deleted"] == []
+    assert feed["watermark"] == lead.change_seq
+    assert feed["has_more"] is False
@@ -0,0 +1,36 @@
+import csv
+import io
+
+import pytest
+
+from lead_export import iter_export
+from models import Lead, LeadState
+
+def _export(session):
+    return list(csv.DictReader(io.StringIO("".join(iter_export(session, "csv")))))
+
+@pytest.mark.parametrize("name", [
+    "=HYPERLINK(\"http://example.com\")", "+1+1", "-2+3", "@SUM(A1)", "\tName", "\rName",
+])
+def test_formula_cells_are_quoted(session, name):
+    session.add(Lead(first_name=name, last_name="Smith", email="a@example.com",
+                     resume_path="ab/cd/abcd.pdf", state=LeadState.PENDING))
+    session.commit()
+
+    [row] = _export(session)
+
+    assert row["first_name"] == "'" + name
+
+def test_plain_values_are_unchanged(session):
+    lead = Lead(first_name="Ada", last_name="O'Hara-Smith", email="a@example.com",
+                resume_path="ab/cd/abcd.pdf", state=LeadState.PENDING, notes=None)
+    session.add(lead)
+    session.commit()
+
+    [row] = _export(session)
+
+    assert row["first_name"] == "Ada"
+    assert row["last_name"] == "O'Hara-Smith"
+    assert row["id"] == str(lead.id)
+    assert row["state"] == LeadState.PENDING.value
+    assert row["notes"] == ""
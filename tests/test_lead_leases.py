@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from lead_bulk import bulk_update_leads
+from lead_changes import current_watermark
+from lead_intake import create_lead
+from lead_leases import claim_next_lead, lease_holder, release_lease, renew_lease
+from models import Lead, LeadState
+from conftest import stored_resume
+
+@pytest.fixture
+def leads(session):
+    """Three pending leads, oldest first."""
+    start = datetime.utcnow() - timedelta(hours=1)
+    created = [
+        create_lead(
+            session, f"Applicant{i}", "Test", f"applicant{i}@example.com",
+            stored_resume(f"resume {i}"), created_at=start + timedelta(minutes=i)
+        )
+        for i in range(3)
+    ]
+    session.commit()
+    return [lead.id for lead in created]
+
+def test_claims_hand_out_different_leads_oldest_first(session, users, leads):
+    first, second = users
+
+    claimed = claim_next_lead(session, first)
+    session.commit()
+    other = claim_next_lead(session, second)
+    session.commit()
+
+    assert [claimed.id, other.id] == leads[:2]
+    assert lease_holder(claimed) == first
+    assert lease_holder(other) == second
+
+def test_no_lead_left_to_claim(session, users, leads):
+    for _ in leads:
+        assert claim_next_lead(session, users[0]) is not None
+        session.commit()
+    watermark = current_watermark(session)
+
+    assert claim_next_lead(session, users[1]) is None
+    session.commit()
+    # A claim that found nothing wrote nothing
+    assert current_watermark(session) == watermark
+
+def test_expired_lease_returns_the_lead_to_the_queue(session, users, leads):
+    first, second = users
+    claimed = claim_next_lead(session, first, lease_seconds=60)
+    session.commit()
+    session.query(Lead).filter(Lead.id == claimed.id).update(
+        {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    session.commit()
+
+    assert lease_holder(session.get(Lead, claimed.id, populate_existing=True)) is None
+    assert claim_next_lead(session, second).id == claimed.id
+    session.commit()
+    # The first holder lost it and cannot renew any more
+    assert renew_lease(session, claimed.id, first) is None
+
+def test_renew_and_release_move_the_change_feed(session, users, leads):
+    first, second = users
+    claimed = claim_next_lead(session, first, lease_seconds=60)
+    session.commit()
+    seq, updated_at, expires = claimed.change_seq, claimed.updated_at, claimed.lease_expires_at
+
+    renewed = renew_lease(session, claimed.id, first, lease_seconds=600)
+    session.commit()
+    assert renewed.lease_expires_at > expires
+    assert renewed.change_seq > seq
+    # A renewal is a heartbeat, not an edit
+    assert renewed.updated_at == updated_at
+    seq = renewed.change_seq
+
+    assert renew_lease(session, claimed.id, second) is None
+    assert not release_lease(session, claimed.id, second)
+    assert release_lease(session, claimed.id, first)
+    session.commit()
+    released = session.get(Lead, claimed.id, populate_existing=True)
+    assert released.lease_expires_at is None
+    assert released.change_seq > seq
+
+def test_bulk_update_skips_leads_leased_to_others(session, users, leads):
+    first, second = users
+    held = claim_next_lead(session, first)
+    session.commit()
+
+    rows, previous, leased = bulk_update_leads(session, second, lead_ids=leads, state=LeadState.REACHED_OUT)
+    session.commit()
+
+    assert leased == [held.id]
+    assert sorted(row.id for row in rows) == leads[1:]
+    assert session.get(Lead, held.id, populate_existing=True).state == LeadState.PENDING
+
+    # The holder can move their own lead, which ends its lease
+    rows, _, leased = bulk_update_leads(session, first, lead_ids=[held.id], state=LeadState.REACHED_OUT)
+    session.commit()
+    assert leased == [] and [row.id for row in rows] == [held.id]
+    assert session.get(Lead, held.id, populate_existing=True).lease_expires_at is None
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from conftest import stored_resume
+from models import Lead, LeadResume, LeadState, LeadTombstone, EmailOutbox
+from lead_changes import get_changes
+from lead_counters import get_counts, record_transition
+from lead_intake import create_lead, add_submission, find_submission
+from lead_merge import merge_duplicates, resume_versions
+
+def _create(session, email, content, created_at, submission_id=None, **fields):
+    lead = create_lead(session, "Ada", "Lovelace", email, stored_resume(content),
+                       submission_id=submission_id, created_at=created_at)
+    if "state" in fields:
+        record_transition(session, lead.state, fields["state"])
+    for name, value in fields.items():
+        setattr(lead, name, value)
+    session.commit()
+    return lead
+
+def test_repeat_submission_adds_a_version(session):
+    lead = _create(session, "ada@example.com", "first", datetime.utcnow() - timedelta(days=1))
+
+    merged = add_submission(session, "Ada", "L.", " ADA@example.com ", stored_resume("second"), "sub-2")
+    session.commit()
+
+    assert merged.id == lead.id
+    assert session.query(Lead).count() == 1
+    assert [v.resume_path for v in resume_versions(session, lead.id)] == [
+        stored_resume("first").key, stored_resume("second").key
+    ]
+    assert lead.resume_path == stored_resume("first").key
+    assert find_submission(session, "sub-2").id == lead.id
+    # Only the prospect is confirmed again
+    kinds = [m.kind for m in session.query(EmailOutbox).filter(EmailOutbox.lead_id == lead.id)]
+    assert sorted(kinds) == ["attorney_notification", "prospect_confirmation", "prospect_confirmation"]
+
+def test_submission_outside_the_window_creates_a_lead(session):
+    _create(session, "ada@example.com", "first", datetime.utcnow() - timedelta(days=365))
+
+    add_submission(session, "Ada", "Lovelace", "ada@example.com", stored_resume("second"))
+    session.commit()
+
+    assert session.query(Lead).count() == 2
+
+def test_merge_duplicates_folds_leads_and_leaves_tombstones(session):
+    # Leads created directly, as before submissions were merged
+    start = datetime(2026, 1, 1)
+    survivor = _create(session, "ada@example.com", "first", start, "sub-1", notes="First call")
+    duplicate = _create(session, "Ada@Example.com", "second", start + timedelta(days=3), "sub-2",
+                        state=LeadState.REACHED_OUT, notes="Second call")
+    separate = _create(session, "ada@example.com", "third", start + timedelta(days=90))
+    other = _create(session, "bob@example.com", "bob", start)
+    survivor_id, duplicate_id = survivor.id, duplicate.id
+    since = get_changes(session, 0)[2]
+
+    assert merge_duplicates(session, timedelta(days=30), dry_run=True) == (1, 1)
+    assert session.query(Lead).count() == 4
+
+    assert merge_duplicates(session, timedelta(days=30)) == (1, 1)
+    session.expire_all()
+
+    assert {lead.id for lead in session.query(Lead)} == {survivor_id, separate.id, other.id}
+    survivor = session.get(Lead, survivor_id)
+    assert survivor.state == LeadState.REACHED_OUT
+    assert survivor.notes == "First call\n\nSecond call"
+    assert [(v.version, v.resume_path) for v in resume_versions(session, survivor_id)] == [
+        (1, stored_resume("first").key), (2, stored_resume("second").key)
+    ]
+    assert find_submission(session, "sub-2").id == survivor_id
+    assert session.query(EmailOutbox).filter(EmailOutbox.lead_id == duplicate_id).count() == 0
+    assert get_counts(session)[LeadState.PENDING] == 2
+    assert get_counts(session)[LeadState.REACHED_OUT] == 1
+
+    tombstone = session.query(LeadTombstone).one()
+    assert (tombstone.lead_id, tombstone.merged_into) == (duplicate_id, survivor_id)
+    leads, removed, _, _ = get_changes(session, since)
+    assert [t.lead_id for t in removed] == [duplicate_id]
+    assert survivor_id in {lead.id for lead in leads}
+
+    # Running it again finds nothing left to merge
+    assert merge_duplicates(session, timedelta(days=30)) == (0, 0)
+    assert session.query(LeadResume).filter(LeadResume.lead_id == survivor_id).count() == 2
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+
+import lead_search
+from models import Lead, LeadState, ResumeText, ExtractionStatus
+from lead_search import search_leads
+
+@pytest.fixture
+def leads(session):
+    """Three leads named Ada, created in January, February and March."""
+    created = {}
+    for month, state in ((1, LeadState.PENDING), (2, LeadState.REACHED_OUT), (3, LeadState.PENDING)):
+        lead = Lead(first_name="Ada", last_name=f"Month{month}", email=f"ada{month}@example.com",
+                    resume_path=f"ab/cd/resume{month}.pdf", state=state,
+                    created_at=datetime(2026, month, 15))
+        session.add(lead)
+        session.add(ResumeText(resume_key=lead.resume_path, status=ExtractionStatus.DONE,
+                               text="experienced engineer"))
+        session.commit()
+        created[month] = lead.id
+    return created
+
+def _ids(found):
+    return {lead.id for lead in found[0]}
+
+@pytest.mark.parametrize("resumes", [False, True])
+def test_search_honours_creation_bounds(session, leads, resumes):
+    query = "engineer" if resumes else "ada"
+    search = lambda **bounds: _ids(search_leads(session, query, resumes=resumes, **bounds))
+
+    assert search() == set(leads.values())
+    assert search(created_after=datetime(2026, 2, 1)) == {leads[2], leads[3]}
+    assert search(created_before=datetime(2026, 2, 15)) == {leads[1]}
+    assert search(created_after=datetime(2026, 2, 1), created_before=datetime(2026, 3, 1)) == {leads[2]}
+
+def test_search_combines_state_and_bounds(session, leads):
+    found = search_leads(session, "ada", LeadState.PENDING, created_after=datetime(2026, 2, 1))
+
+    assert _ids(found) == {leads[3]}
+
+@pytest.mark.parametrize("search", [lead_search._fallback_ids, lead_search._fallback_resume_ids])
+def test_fallback_search_honours_bounds(session, leads, search):
+    filters = lead_search._SearchFilters(LeadState.PENDING, None, datetime(2026, 3, 1))
+    query = "engineer" if search is lead_search._fallback_resume_ids else "ada"
+
+    assert search(session, query, filters, 10, 0) == [leads[1]]
+
+def test_api_search_honours_bounds(client, session, leads):
+    from test_api import _token
+    headers = {"Authorization": f"Bearer {_token(client, session)}"}
+
+    response = client.get("/leads/search", params={"q": "ada", "created_after": "2026-02-01T00:00:00"},
+                          headers=headers)
+
+    assert response.status_code == 200
+    assert {lead["id"] for lead in response.json()} == {leads[2], leads[3]}
@@ -0,0 +1,27 @@
+import pytest
+
+from login_throttle import client_address, ip_limiter, LOGIN_BURST_PER_IP
+
+@pytest.mark.parametrize("forwarded_for, hops, expected", [
+    (None, 1, "10.0.0.1"),
+    ("203.0.113.7", 0, "10.0.0.1"),
+    ("203.0.113.7", 1, "203.0.113.7"),
+    ("1.2.3.4, 203.0.113.7", 1, "203.0.113.7"),
+    ("1.2.3.4, 203.0.113.7, 10.0.0.9", 2, "203.0.113.7"),
+    ("203.0.113.7", 2, "10.0.0.1"),
+    (" , ", 1, "10.0.0.1"),
+])
+def test_client_address(forwarded_for, hops, expected):
+    assert client_address("10.0.0.1", forwarded_for, hops) == expected
+
+def test_forged_forwarded_for_does_not_escape_the_limit(client):
+    # No proxy is trusted by default, so every attempt counts against the peer
+    statuses = [
+        client.post("/auth/token", data={"username": f"user{i}@example.com", "password": "x"},
+                    headers={"X-Forwarded-For": f"198.51.100.{i}"}).status_code
+        for i in range(LOGIN_BURST_PER_IP + 1)
+    ]
+
+    assert 429 not in statuses[:LOGIN_BURST_PER_IP]
+    assert statuses[-1] == 429
+    assert len(ip_limiter._buckets) == 1
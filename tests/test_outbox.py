@@ -0,0 +1,114 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbox
+from email_service import FakeTransport, set_transport
+from models import Lead, LeadState, EmailOutbox, OutboxStatus
+from resume_storage import resolve_path
+
+@pytest.fixture
+def transport():
+    """A fake transport installed for the test, restoring the previous one after."""
+    fake = FakeTransport()
+    previous = set_transport(fake)
+    yield fake
+    set_transport(previous)
+
+def _queue(session, key="ab/cd/abcd.pdf"):
+    lead = Lead(first_name="Ada", last_name="Lovelace", email="ada@example.com",
+                resume_path=key, state=LeadState.PENDING)
+    session.add(lead)
+    outbox.enqueue_lead_emails(session, lead, key)
+    session.commit()
+    return lead
+
+def _make_due(session):
+    session.query(EmailOutbox).update({EmailOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    session.commit()
+
+def test_delivers_queued_emails_with_the_resolved_resume(session, transport):
+    _queue(session)
+
+    assert outbox.drain_once(session) == 2
+
+    assert {m.status for m in session.query(EmailOutbox)} == {OutboxStatus.SENT}
+    attachments = [email["attachment_path"] for email in transport.sent]
+    assert resolve_path("ab/cd/abcd.pdf") in attachments
+
+def test_payload_stores_the_storage_key(session):
+    _queue(session)
+
+    message = session.query(EmailOutbox).filter(EmailOutbox.kind == outbox.ATTORNEY_NOTIFICATION).one()
+    assert json.loads(message.payload)["resume_key"] == "ab/cd/abcd.pdf"
+
+def test_legacy_absolute_path_payload_still_delivers(session, transport):
+    outbox.enqueue_email(session, outbox.ATTORNEY_NOTIFICATION, first_name="Ada", last_name="Lovelace",
+                         prospect_email="ada@example.com", resume_path="/srv/uploads/old.pdf")
+    session.commit()
+
+    outbox.drain_once(session)
+
+    assert transport.sent[0]["attachment_path"] == "/srv/uploads/old.pdf"
+
+def test_failures_back_off_exponentially_then_dead_letter(session, transport, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: 1.0)
+    transport.fail_count = 100
+    outbox.enqueue_email(session, outbox.PROSPECT_CONFIRMATION, prospect_email="ada@example.com",
+                         first_name="Ada", last_name="Lovelace")
+    session.commit()
+
+    delays = []
+    for _ in range(2):
+        before = datetime.utcnow()
+        assert outbox.drain_once(session) == 1
+        message = session.query(EmailOutbox).one()
+        assert message.status == OutboxStatus.PENDING
+        delays.append((message.next_attempt_at - before).total_seconds())
+        # Not due yet, so nothing is claimed
+        assert outbox.drain_once(session) == 0
+        _make_due(session)
+
+    assert delays[0] == pytest.approx(outbox.OUTBOX_BASE_BACKOFF, abs=1)
+    assert delays[1] == pytest.approx(2 * outbox.OUTBOX_BASE_BACKOFF, abs=1)
+
+    assert outbox.drain_once(session) == 1
+    message = session.query(EmailOutbox).one()
+    assert message.status == OutboxStatus.DEAD
+    assert message.attempts == 3
+    assert message.last_error == "Transport reported failure"
+    assert transport.sent == []
+
+    # Requeued, the message is retried and delivered
+    transport.fail_count = 0
+    assert outbox.requeue_dead(session) == 1
+    assert outbox.drain_once(session) == 1
+    session.refresh(message)
+    assert message.status == OutboxStatus.SENT
+    assert len(transport.sent) == 1
+
+def test_backoff_is_capped():
+    assert outbox._backoff_seconds(50) <= outbox.OUTBOX_MAX_BACKOFF * 1.2
+
+def test_purge_sent_keeps_recent_and_undelivered_messages(session, transport):
+    _queue(session)
+    outbox.drain_once(session)
+    old, recent = session.query(EmailOutbox).order_by(EmailOutbox.id).all()
+    old.sent_at = datetime.utcnow() - timedelta(days=30)
+    outbox.enqueue_email(session, outbox.PROSPECT_CONFIRMATION, prospect_email="bob@example.com",
+                         first_name="Bob", last_name="Smith")
+    dead = outbox.enqueue_email(session, outbox.PROSPECT_CONFIRMATION, prospect_email="eve@example.com",
+                                first_name="Eve", last_name="Jones")
+    dead.status = OutboxStatus.DEAD
+    dead.created_at = datetime.utcnow() - timedelta(days=30)
+    session.commit()
+    recent_id = recent.id
+
+    assert outbox.purge_sent(session, retention_days=7) == 1
+
+    remaining = session.query(EmailOutbox).all()
+    assert len(remaining) == 3
+    assert recent_id in {m.id for m in remaining}
+    assert {m.status for m in remaining} == {OutboxStatus.SENT, OutboxStatus.PENDING, OutboxStatus.DEAD}
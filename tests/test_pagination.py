@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Lead, LeadState
+from pagination import keyset_page, encode_cursor, decode_cursor, InvalidCursor
+from test_api import _token
+
+@pytest.fixture
+def leads(session):
+    """Ids of seven leads, newest first; several share a created_at."""
+    base = datetime(2026, 1, 1)
+    for i, minutes in enumerate((0, 0, 1, 1, 1, 2, 3)):
+        session.add(Lead(first_name="Lead", last_name=str(i), email=f"lead{i}@example.com",
+                         resume_path="ab/cd/abcd.pdf", state=LeadState.PENDING,
+                         created_at=base + timedelta(minutes=minutes)))
+    session.commit()
+    ordered = session.query(Lead).order_by(Lead.created_at.desc(), Lead.id.desc())
+    return [lead.id for lead in ordered]
+
+def _walk(session, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = keyset_page(session.query(Lead), cursor, limit)
+        ids.extend(lead.id for lead in page)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+def test_pages_cover_every_lead_once_in_order(session, leads, limit):
+    ids, pages = _walk(session, limit)
+
+    assert ids == leads
+    assert pages == max(1, -(-len(leads) // limit))
+
+def test_new_leads_do_not_shift_later_pages(session, leads):
+    first, cursor = keyset_page(session.query(Lead), None, 3)
+    session.add(Lead(first_name="Newer", last_name="Lead", email="new@example.com",
+                     resume_path="ab/cd/abcd.pdf", state=LeadState.PENDING, created_at=datetime(2026, 2, 1)))
+    session.commit()
+
+    second, _ = keyset_page(session.query(Lead), cursor, 3)
+
+    assert [lead.id for lead in first + second] == leads[:6]
+
+def test_cursor_round_trip(session, leads):
+    lead = session.get(Lead, leads[0])
+
+    assert decode_cursor(encode_cursor(lead)) == (lead.created_at, lead.id)
+
+@pytest.mark.parametrize("cursor", ["garbage", "W10", "WyJub3QgYSBkYXRlIiwgMV0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def test_api_follows_next_cursor(client, session, leads):
+    headers = {"Authorization": f"Bearer {_token(client, session)}"}
+    ids, params = [], {"limit": 3}
+    while True:
+        response = client.get("/leads/", params=params, headers=headers)
+        assert response.status_code == 200
+        ids.extend(lead["id"] for lead in response.json())
+        if "x-next-cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["x-next-cursor"]
+
+    assert ids == leads
+    assert client.get("/leads/", params={"cursor": "garbage"}, headers=headers).status_code == 400
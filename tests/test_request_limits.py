@@ -0,0 +1,77 @@
+import asyncio
+import io
+import os
+
+import pytest
+
+import resume_storage
+from request_limits import RequestSizeLimit
+from resume_storage import store_stream, UploadTooLarge
+
+async def _echo_body(scope, receive, send):
+    """App reading the whole body, then answering with its length."""
+    size = 0
+    while True:
+        message = await receive()
+        size += len(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(size).encode()})
+
+def _call(app, chunks, headers=()):
+    """Send a body in chunks through an ASGI app; returns (status, chunks read by the app)."""
+    read = []
+    sent = []
+
+    async def receive():
+        chunk = chunks[len(read)]
+        read.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": len(read) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], len(read)
+
+def test_declared_length_over_the_limit_is_refused_unread():
+    app = RequestSizeLimit(_echo_body, max_body_size=100)
+
+    status, read = _call(app, [b"x" * 50] * 4, [(b"content-length", b"200")])
+
+    assert (status, read) == (413, 0)
+
+def test_chunked_body_is_cut_off_at_the_limit():
+    app = RequestSizeLimit(_echo_body, max_body_size=100)
+
+    status, read = _call(app, [b"x" * 40] * 10)
+
+    assert (status, read) == (413, 3)
+
+def test_body_within_the_limit_passes():
+    app = RequestSizeLimit(_echo_body, max_body_size=100)
+
+    status, _ = _call(app, [b"x" * 50, b"x" * 50], [(b"content-length", b"100")])
+
+    assert status == 200
+
+def test_upload_over_the_cap_leaves_nothing_behind():
+    with pytest.raises(UploadTooLarge):
+        store_stream(io.BytesIO(b"x" * 2048), ".pdf", max_size=1024)
+
+    leftovers = [name for name in os.listdir(resume_storage._TMP_DIRECTORY)
+                 if name.endswith((".upload", ".part"))]
+    assert leftovers == []
+
+def test_api_refuses_an_oversized_resume(client, monkeypatch):
+    monkeypatch.setattr("routers.leads.MAX_UPLOAD_SIZE", 1024)
+
+    response = client.post(
+        "/leads/",
+        data={"first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com"},
+        files={"resume": ("resume.pdf", b"x" * 2048, "application/pdf")}
+    )
+
+    assert response.status_code == 413
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+from lead_intake import create_lead
+from resume_storage import store_stream, parse_range, RangeNotSatisfiable
+from test_api import _token
+
+CONTENT = bytes(range(256)) * 4
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=1000-", (1000, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=-0", "bytes=10-5"])
+def test_parse_range_outside_the_file(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, len(CONTENT))
+
+@pytest.fixture
+def download(client, session):
+    """GET the resume of a new lead with extra headers; the lead stores CONTENT."""
+    lead = create_lead(session, "Ada", "Lovelace", "ada@example.com", store_stream(io.BytesIO(CONTENT), ".pdf"))
+    session.commit()
+    auth = {"Authorization": f"Bearer {_token(client, session)}"}
+    return lambda **headers: client.get(f"/leads/{lead.id}/resume", headers={**auth, **headers})
+
+def test_full_download(download):
+    response = download()
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"]
+
+def test_range_download(download):
+    response = download(range="bytes=100-199")
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+def test_unsatisfiable_range(download):
+    response = download(range="bytes=5000-")
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_conditional_requests(download):
+    etag = download().headers["etag"]
+
+    assert download(**{"if-none-match": etag}).status_code == 304
+    # A range for another version of the file is answered with all of it
+    stale = download(range="bytes=0-9", **{"if-range": '"stale"'})
+    assert (stale.status_code, stale.content) == (200, CONTENT)
+    current = download(range="bytes=0-9", **{"if-range": etag})
+    assert (current.status_code, current.content) == (206, CONTENT[:10])
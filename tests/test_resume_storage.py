@@ -0,0 +1,111 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import resume_storage
+from models import Lead, LeadResume, LeadState, ResumeBlob
+from resume_storage import store_stream, register_blob, resolve_path, collect_garbage, storage_report
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    """Start every test with no stored files."""
+    if os.path.isdir(resume_storage.UPLOAD_DIRECTORY):
+        for _, path in list(resume_storage._iter_stored_files()):
+            os.remove(path)
+
+def _store(session, content):
+    stored = store_stream(io.BytesIO(content), ".pdf")
+    register_blob(session, stored)
+    session.commit()
+    return stored
+
+def _age(session, stored, seconds=7200):
+    """Make a stored file and its blob row look older than the GC grace period."""
+    then = time.time() - seconds
+    os.utime(resolve_path(stored.key), (then, then))
+    session.query(ResumeBlob).filter(ResumeBlob.key == stored.key).update(
+        {ResumeBlob.created_at: datetime.utcnow() - timedelta(seconds=seconds)})
+    session.commit()
+
+def _lead(session, key, email="ada@example.com"):
+    lead = Lead(first_name="Ada", last_name="Lovelace", email=email, resume_path=key, state=LeadState.PENDING)
+    session.add(lead)
+    session.commit()
+    return lead
+
+def test_identical_uploads_share_one_file(session):
+    first = _store(session, b"same resume")
+    second = _store(session, b"same resume")
+    _lead(session, first.key)
+    _lead(session, second.key, "bob@example.com")
+
+    assert first.key == second.key
+    assert (first.deduplicated, second.deduplicated) == (False, True)
+    assert session.query(ResumeBlob).count() == 1
+    report = storage_report(session)
+    assert report["logical_bytes"] == 2 * report["physical_bytes"]
+
+def test_gc_removes_only_old_unreferenced_files(session):
+    orphan = _store(session, b"orphan")
+    recent = _store(session, b"recent orphan")
+    current = _store(session, b"current resume")
+    earlier = _store(session, b"earlier version")
+    for stored in (orphan, current, earlier):
+        _age(session, stored)
+    lead = _lead(session, current.key)
+    session.add(LeadResume(lead_id=lead.id, version=1, resume_path=earlier.key))
+    session.commit()
+
+    removed, freed = collect_garbage(session)
+
+    assert (removed, freed) == (1, orphan.size)
+    assert not os.path.exists(resolve_path(orphan.key))
+    for stored in (recent, current, earlier):
+        assert os.path.exists(resolve_path(stored.key))
+    assert session.get(ResumeBlob, orphan.key) is None
+
+def test_gc_keeps_a_file_referenced_after_it_was_listed(session, monkeypatch):
+    stored = _store(session, b"attached late")
+    _age(session, stored)
+    remove_orphan = resume_storage._remove_orphan
+
+    def attach_then_remove(session, key, path, cutoff):
+        # A merge commits its reference between the listing and the removal
+        _lead(session, key)
+        return remove_orphan(session, key, path, cutoff)
+
+    monkeypatch.setattr(resume_storage, "_remove_orphan", attach_then_remove)
+
+    assert collect_garbage(session) == (0, 0)
+    assert os.path.exists(resolve_path(stored.key))
+    assert session.get(ResumeBlob, stored.key) is not None
+
+def test_gc_keeps_a_file_reused_after_it_was_listed(session, monkeypatch):
+    stored = _store(session, b"reused late")
+    _age(session, stored)
+    remove_orphan = resume_storage._remove_orphan
+
+    def reuse_then_remove(session, key, path, cutoff):
+        # A submission deduplicates against the file, refreshing its mtime
+        assert store_stream(io.BytesIO(b"reused late"), ".pdf").deduplicated
+        return remove_orphan(session, key, path, cutoff)
+
+    monkeypatch.setattr(resume_storage, "_remove_orphan", reuse_then_remove)
+
+    assert collect_garbage(session) == (0, 0)
+    assert os.path.exists(resolve_path(stored.key))
+
+def test_upload_during_collection_stores_its_own_copy(session):
+    stored = _store(session, b"collected")
+    path = resolve_path(stored.key)
+    # The collector has claimed the file but not deleted it yet
+    os.rename(path, path + ".gc")
+
+    again = store_stream(io.BytesIO(b"collected"), ".pdf")
+
+    assert not again.deduplicated
+    assert os.path.exists(path)
+    os.remove(path + ".gc")
@@ -0,0 +1,107 @@
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from models import ExtractionStatus, ResumeText
+from resume_storage import resolve_path
+from resume_text import ExtractionPool, extract_text, process_batch, queue_extraction
+
+def _pdf(text):
+    """A one-page PDF showing ``text``."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def _store(key, content):
+    """Write a resume into the store under ``key``."""
+    path = resolve_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return key
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(1)
+    yield pool
+    pool.shutdown()
+
+def test_pdf_text_is_extracted(tmp_path):
+    path = tmp_path / "resume.pdf"
+    path.write_bytes(_pdf("Ada Lovelace, analytical engines"))
+
+    assert extract_text(str(path)) == "Ada Lovelace, analytical engines"
+
+def test_batch_stores_each_result(session, pool):
+    queue_extraction(session, _store("aa/aa/resume.pdf", _pdf("Grace Hopper")))
+    queue_extraction(session, _store("aa/aa/resume.rtf", b"{\\rtf1}"))
+    session.commit()
+
+    assert process_batch(session, pool) == 2
+    texts = {row.resume_key: row for row in session.query(ResumeText)}
+    assert texts["aa/aa/resume.pdf"].status == ExtractionStatus.DONE
+    assert texts["aa/aa/resume.pdf"].text == "Grace Hopper"
+    assert texts["aa/aa/resume.rtf"].status == ExtractionStatus.UNSUPPORTED
+
+def test_recycling_frees_a_stuck_process(pool, tmp_path):
+    stuck = pool.submit(time.sleep, 60)
+    time.sleep(0.2)
+
+    pool.recycle()
+
+    assert isinstance(stuck.exception(timeout=10), BrokenProcessPool)
+    path = tmp_path / "resume.txt"
+    path.write_text("still working")
+    assert pool.submit(extract_text, str(path)).result(timeout=10) == "still working"
+
+class StuckPool:
+    """Pool whose extractions never finish until it is recycled."""
+
+    def __init__(self):
+        self.recycled = 0
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+    def recycle(self):
+        self.recycled += 1
+        for future in self.futures:
+            if not future.done():
+                future.set_exception(BrokenProcessPool("terminated"))
+
+def test_timeout_recycles_the_pool_and_requeues_the_rest(session):
+    for name in ("slow.txt", "queued.txt"):
+        queue_extraction(session, _store(f"bb/bb/{name}", b"text"))
+    session.commit()
+    pool = StuckPool()
+
+    process_batch(session, pool, timeout=0.1)
+
+    texts = {row.resume_key: row for row in session.query(ResumeText).populate_existing()}
+    assert pool.recycled == 1
+    assert texts["bb/bb/slow.txt"].status == ExtractionStatus.FAILED
+    assert "longer than" in texts["bb/bb/slow.txt"].error
+    # Lost with the recycled processes through no fault of its own
+    assert texts["bb/bb/queued.txt"].status == ExtractionStatus.PENDING
+    assert texts["bb/bb/queued.txt"].claimed_at is None
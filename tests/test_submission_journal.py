@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import submission_journal
+from models import Lead
+from submission_journal import SubmissionJournal, replay
+from conftest import stored_resume
+
+@pytest.fixture
+def journal(tmp_path):
+    return SubmissionJournal(str(tmp_path / "journal"))
+
+def _append(journal, email="applicant@example.com", content="resume"):
+    return journal.append(uuid.uuid4().hex, "Ada", "Lovelace", email, stored_resume(content))
+
+def test_replay_creates_each_lead_once(session, journal):
+    name = _append(journal)
+    entry = journal.read(name)
+
+    assert replay(session, journal) == (1, 0)
+    assert journal.entries() == []
+    lead = session.query(Lead).one()
+    assert lead.submission_id == entry["submission_id"]
+
+    # The same submission journaled again, as after a commit whose
+    # acknowledgement was lost
+    journal.append(entry["submission_id"], "Ada", "Lovelace", "applicant@example.com", stored_resume())
+    assert replay(session, journal) == (0, 1)
+    assert session.query(Lead).count() == 1
+
+def test_retryable_error_keeps_the_entry(session, journal, monkeypatch):
+    name = _append(journal)
+
+    def unavailable(session, entry):
+        raise OperationalError("INSERT", {}, Exception("could not connect"))
+    monkeypatch.setattr(submission_journal, "replay_entry", unavailable)
+
+    with pytest.raises(OperationalError):
+        replay(session, journal)
+    assert journal.entries() == [name]
+    assert journal.entries(journal.failed_directory) == []
+
+def test_failing_entry_is_quarantined_and_requeued(session, journal, monkeypatch):
+    bad = _append(journal, email="bad@example.com", content="bad")
+    good = _append(journal, email="good@example.com", content="good")
+    original = submission_journal.replay_entry
+
+    def refuse_bad(session, entry):
+        if entry["email"] == "bad@example.com":
+            raise ValueError("malformed entry")
+        return original(session, entry)
+    monkeypatch.setattr(submission_journal, "replay_entry", refuse_bad)
+
+    # The bad entry does not hold up the one after it
+    assert replay(session, journal) == (1, 0)
+    assert journal.entries() == []
+    assert journal.entries(journal.failed_directory) == [bad]
+
+    monkeypatch.setattr(submission_journal, "replay_entry", original)
+    assert journal.requeue() == [bad]
+    assert replay(session, journal) == (1, 0)
+    assert {lead.email for lead in session.query(Lead)} == {"bad@example.com", "good@example.com"}
+    assert good not in journal.entries(journal.failed_directory)
+
+def test_requeue_only_moves_names_from_the_failed_directory(journal, tmp_path):
+    outside = tmp_path / "outside.json"
+    outside.write_text("{}")
+
+    assert journal.requeue([str(outside)]) == []
+    assert outside.exists()
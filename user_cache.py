@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models import User
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds a user is trusted without going back to the database. Changes
+# made in this process, or announced over PostgreSQL, evict it sooner.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 1024))
+
+USER_EVENTS_CHANNEL = "user_changes"
+
+class Principal:
+    """
+    Immutable snapshot of an authenticated user, safe to share between requests.
+
+    Implements the attributes Flask-Login expects of a user, so it can stand
+    in for the User model as ``current_user``.
+    """
+    __slots__ = ("id", "email", "full_name", "is_active", "created_at")
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, email, full_name, is_active, created_at):
+        for name, value in zip(self.__slots__, (id, email, full_name, is_active, created_at)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is read-only")
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.full_name, bool(user.is_active), user.created_at)
+
+    def get_id(self):
+        return str(self.id)
+
+class PrincipalCache:
+    """
+    Bounded LRU of verified credentials (a token or a session's user id) to principals.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted
+        ttl: Longest time in seconds an entry is served
+    """
+
+    def __init__(self, max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, key):
+        """Cached principal for a credential, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    @property
+    def generation(self):
+        """Changes with every invalidation; read it before loading a user to pass to ``put``."""
+        return self._generation
+
+    def put(self, key, principal, expires_in=None, generation=None):
+        """
+        Cache a principal for a credential.
+
+        Args:
+            key: Credential key, from token_key or session_key
+            principal: The Principal
+            expires_in: Optional seconds until the credential itself expires
+            generation: ``generation`` read before the user was loaded; if a
+                user was invalidated since, the possibly stale principal is not cached
+        """
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = (principal, time.monotonic() + ttl)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate_user(self, user_id):
+        """Forget every cached credential of a user."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def handle_notification(self, payload):
+        """Apply a user change announced by another process."""
+        try:
+            user_id = json.loads(payload)["user_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed user change notification: {payload}")
+            return
+        self.invalidate_user(user_id)
+
+    def stats(self):
+        """Hit/miss counters and the current size of the cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[0].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[0].id]
+
+user_cache = PrincipalCache()
+
+def token_key(token):
+    """Cache key for a bearer token; the token itself is not kept in memory."""
+    return "token:" + hashlib.sha256(token.encode()).hexdigest()
+
+def session_key(user_id):
+    """Cache key for the user id stored in a Flask-Login session."""
+    return f"session:{user_id}"
+
+def invalidate_user(session, *user_ids):
+    """
+    Evict users from every process's cache once the caller's transaction commits.
+
+    Called automatically when a User is changed or deleted through the ORM;
+    call it directly after bulk UPDATEs of the users table. On PostgreSQL
+    the change is announced with pg_notify so other workers evict it too.
+    """
+    session.info.setdefault("user_cache_invalidations", set()).update(user_ids)
+    if session.get_bind().dialect.name == "postgresql":
+        conn = session.connection()
+        for user_id in user_ids:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": USER_EVENTS_CHANNEL, "payload": json.dumps({"user_id": user_id})}
+            )
+
+@event.listens_for(Session, "before_flush")
+def _track_user_changes(session, flush_context, instances):
+    changed = {
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and session.is_modified(obj, include_collections=False)
+    }
+    changed |= {obj.id for obj in session.deleted if isinstance(obj, User)}
+    if changed:
+        invalidate_user(session, *changed)
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_invalidations(session):
+    for user_id in session.info.pop("user_cache_invalidations", ()):
+        user_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_invalidations(session):
+    session.info.pop("user_cache_invalidations", None)